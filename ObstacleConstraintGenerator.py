@@ -4,13 +4,37 @@
 """
 
 import numpy as np
+import casadi
 import matplotlib.pyplot as plt
+from scipy.spatial import cKDTree
+from obstacle_table import ObstacleTable, CATEGORIES, WALL, DOOR, FURNITURE, KNOB
+
+SIDES = 4 # number of sides of every obstacle
+SIDE_NORMALS = np.array([[1., 0.], [-1., 0.], [0., -1.], [0., 1.]]) # unit normals of the left, right, top and bottom sides, pointing to the center
+SIDE_AXES = np.array([1, 1, 0, 0]) # axis of the half extent that gives the half length of the left, right, top and bottom sides
+SURFACE_RADIUS = 3.0 # distance within which the surfaces are returned by nearestSurfaces
+INACTIVE_OFFSET = 1e3 # offset of the inactive rows 0*p <= INACTIVE_OFFSET, as free_space.PAD_OFFSET
+CEILING_HEIGHT = 1.5 # height of the ceiling closing the space of getVertices
+SLAB_THICKNESS = 0.1 # thickness of the floor and of the ceiling
+GRID_RESOLUTION = 0.1 # side of the cells of the occupancy grid
+SDF_RESOLUTION = 0.1 # distance between the samples of the signed distance field
+SDF_MARGIN = 1.0 # the signed distance field extends this far beyond the given bounds
+
+def categoryProperty(category: int) -> property:
+    """
+        View of the obstacles of one category of the table, assigning a list of dicts or a table replaces them.
+    """
+    return property(lambda self: self.table.select(category),
+                    lambda self, obstacles: self.setObstacles(category, obstacles))
 
 class ObstacleConstraintsGenerator:
+    walls = categoryProperty(WALL)
+    doors = categoryProperty(DOOR)
+    furnitures = categoryProperty(FURNITURE)
+    knobs = categoryProperty(KNOB)
+
     def __init__(self, robot_dim: list, scale: float) -> None:
-        self.walls = []
-        self.doors = []
-        self.furnitures = []
+        self.table = ObstacleTable() # columns of all the obstacles, filled by house.py
         self.constraints = []
         self.vectors = {}
         self.points = {}
@@ -21,25 +45,41 @@ class ObstacleConstraintsGenerator:
         self.vertices = []
         self.sides = []
         self.surfaces = []
+        self.surface_lengths = [] # half lengths of the surfaces
+        self.surface_index = None # KD-tree over the center points of the surfaces
         self.vertices_open = []
+        self.surface_offsets = None # first obstacle of each category in the rows of the constraints, None if not computed
+        self.vertex_offsets = None # first obstacle of each category in the rows of self.vertices, None if not computed
+        self.vertices_key = None # (vertex_version, number of obstacles) of the cached vertices
+        self.version = 0 # incremented at every change of the obstacles
+        self.vertex_version = 0 # incremented at every change of the walls, doors and furnitures, the knobs have no vertices
+        self.changes = [] # (version, category, index) of every change, index None if the whole category changed
 
     def generateConstraintsCylinder(self) -> np.ndarray:
         """
             Generate constraints for obstacles, output is the an array of offsets of each side of each obstacle
             and an array of normals for every side. 
         """
-        self.normals = []
-        self.vertices = []
-        self.constraints = []
         self.sides = []
 
-        self.generateConstraints(obstacles=self.walls, obstacles_name='walls')
-        self.generateConstraints(obstacles=self.doors, obstacles_name='doors')
-        self.generateConstraints(obstacles=self.furnitures, obstacles_name='furnitures')
+        walls, doors, furnitures = self.walls, self.doors, self.furnitures
+        self.surface_offsets = self.categoryOffsets()
+
+        # Preallocate one row for every side of every obstacle
+        n_sides = SIDES*(len(walls) + len(doors) + len(furnitures))
+        self.constraints = np.empty(n_sides)
+        self.normals = np.empty((n_sides, 2))
+        self.surfaces = np.empty((n_sides, 2, 2))
+        self.surface_lengths = np.empty(n_sides)
 
-        self.constraints = np.array(self.constraints)
-        self.normals = np.array(self.normals).reshape(-1, 2)
-        self.surfaces = np.array(self.surfaces).reshape(-1, 2, 2)
+        self.surface_vectors = np.empty((n_sides, 2))
+
+        for obstacles, obstacles_name in ((walls, 'walls'), (doors, 'doors'), (furnitures, 'furnitures')):
+            start = SIDES*self.surface_offsets[CATEGORIES[obstacles_name]]
+            end = self.generateConstraints(obstacles=obstacles, obstacles_name=obstacles_name, start=start)
+            self.points[obstacles_name] = self.surfaces[start:end, 0]
+            self.vectors[obstacles_name] = self.surface_vectors[start:end]
+        self.surface_index = cKDTree(self.surfaces[:, 0]) if n_sides > 0 else None
 
         return self.constraints, self.normals
 
@@ -52,149 +92,272 @@ class ObstacleConstraintsGenerator:
 
         return [dy, -dx], [-dy, dx] # [dy, -dx] -> left and top side of obstacle, [-dy, dx] -> right and lower side of the obstacle
     
-    def getVertices(self):
+    def getVertices(self) -> np.ndarray:
         """
             Get vertices of all the obstacles, and append floor and ceiling vertices to close the space. This is used for
-            ellipsoid.
+            ellipsoid. The result is a read-only contiguous (n, 8, 3) array, cached until the obstacles change, so it
+            can be shared with FreeSpace without copying.
         """
-        self.vertices = []
-        self.computeVertices(obstacles=self.walls, obstacles_name='walls')
-        self.computeVertices(obstacles=self.doors, obstacles_name='doors')
-        self.computeVertices(obstacles=self.furnitures, obstacles_name='furnitures')
-        self.vertices = np.array(self.vertices)
-        self.vertices_open = self.vertices
-        ceiling_height = 1.5
-        floor_trt = [np.max(self.vertices[:, :, 0]), np.max(self.vertices[:, :, 1]), -0.1]
-        floor_tlt = [np.min(self.vertices[:, :, 0]), np.max(self.vertices[:, :, 1]), -0.1]
-        floor_blt = [np.min(self.vertices[:, :, 0]), np.min(self.vertices[:, :, 1]), -0.1]
-        floor_brt = [np.max(self.vertices[:, :, 0]), np.min(self.vertices[:, :, 1]), -0.1]
-
-        floor_trb = [np.max(self.vertices[:, :, 0]), np.max(self.vertices[:, :, 1]), 0]
-        floor_tlb = [np.min(self.vertices[:, :, 0]), np.max(self.vertices[:, :, 1]), 0]
-        floor_blb = [np.min(self.vertices[:, :, 0]), np.min(self.vertices[:, :, 1]), 0]
-        floor_brb = [np.max(self.vertices[:, :, 0]), np.min(self.vertices[:, :, 1]), 0]
-
-        ceiling_trt = [np.max(self.vertices[:, :, 0]), np.max(self.vertices[:, :, 1]), ceiling_height+0.1]
-        ceiling_tlt = [np.min(self.vertices[:, :, 0]), np.max(self.vertices[:, :, 1]), ceiling_height+0.1]
-        ceiling_blt = [np.min(self.vertices[:, :, 0]), np.min(self.vertices[:, :, 1]), ceiling_height+0.1]
-        ceiling_brt = [np.max(self.vertices[:, :, 0]), np.min(self.vertices[:, :, 1]), ceiling_height+0.1]
-
-        ceiling_trb = [np.max(self.vertices[:, :, 0]), np.max(self.vertices[:, :, 1]), ceiling_height]
-        ceiling_tlb = [np.min(self.vertices[:, :, 0]), np.max(self.vertices[:, :, 1]), ceiling_height]
-        ceiling_blb = [np.min(self.vertices[:, :, 0]), np.min(self.vertices[:, :, 1]), ceiling_height]
-        ceiling_brb = [np.max(self.vertices[:, :, 0]), np.min(self.vertices[:, :, 1]), ceiling_height]
-
-        floor_vertices = [floor_trb, floor_tlb, floor_blb, floor_brb, floor_trt, floor_tlt, floor_blt, floor_brt]
-        ceiling_vertices = [ceiling_trb, ceiling_tlb, ceiling_blb, ceiling_brb, ceiling_trt, ceiling_tlt, ceiling_blt, ceiling_brt]
-        self.vertices = list(self.vertices)
-        self.vertices.append(floor_vertices)
-        self.vertices.append(ceiling_vertices)
-        self.vertices = np.array(self.vertices)
-        return np.array(self.vertices)
-
-    def computeVertices(self, obstacles, obstacles_name: str):
-        """
-            Compute the vertices of a given set of obstacles, accounting for their orientations.
-        """
-        # Compute all vertices
-        for obstacle in obstacles:
-            if obstacles_name=='furnitures' or np.abs(obstacle['theta']) != np.pi/2:
-                # Compute the corner locations and center of each side
-                tl = [obstacle['x'] - obstacle['width']/2, obstacle['y'] + obstacle['length']/2, 0]
-                tr = [obstacle['x'] + obstacle['width']/2, obstacle['y'] + obstacle['length']/2, 0]
-                br = [obstacle['x'] + obstacle['width']/2, obstacle['y'] - obstacle['length']/2, 0]
-                bl = [obstacle['x'] - obstacle['width']/2, obstacle['y'] - obstacle['length']/2, 0]
-
-                tlt = [obstacle['x'] - obstacle['width']/2, obstacle['y'] + obstacle['length']/2, obstacle['height']]
-                trt = [obstacle['x'] + obstacle['width']/2, obstacle['y'] + obstacle['length']/2, obstacle['height']]
-                brt = [obstacle['x'] + obstacle['width']/2, obstacle['y'] - obstacle['length']/2, obstacle['height']]
-                blt = [obstacle['x'] - obstacle['width']/2, obstacle['y'] - obstacle['length']/2, obstacle['height']]
-
-                if obstacles_name == 'furnitures':
-                    tl = [obstacle['x'] - obstacle['width']/2, obstacle['y'] + obstacle['length']/2, obstacle['z']]
-                    tr = [obstacle['x'] + obstacle['width']/2, obstacle['y'] + obstacle['length']/2, obstacle['z']]
-                    br = [obstacle['x'] + obstacle['width']/2, obstacle['y'] - obstacle['length']/2, obstacle['z']]
-                    bl = [obstacle['x'] - obstacle['width']/2, obstacle['y'] - obstacle['length']/2, obstacle['z']]
-
-                    tlt = [obstacle['x'] - obstacle['width']/2, obstacle['y'] + obstacle['length']/2, obstacle['z']+obstacle['height']]
-                    trt = [obstacle['x'] + obstacle['width']/2, obstacle['y'] + obstacle['length']/2, obstacle['z']+obstacle['height']]
-                    brt = [obstacle['x'] + obstacle['width']/2, obstacle['y'] - obstacle['length']/2, obstacle['z']+obstacle['height']]
-                    blt = [obstacle['x'] - obstacle['width']/2, obstacle['y'] - obstacle['length']/2, obstacle['z']+obstacle['height']]
-            else:
-                tl = [obstacle['x'] - obstacle['length']/2, obstacle['y'] + obstacle['width']/2, 0]
-                tr = [obstacle['x'] + obstacle['length']/2, obstacle['y'] + obstacle['width']/2, 0] 
-                br = [obstacle['x'] + obstacle['length']/2, obstacle['y'] - obstacle['width']/2, 0] 
-                bl = [obstacle['x'] - obstacle['length']/2, obstacle['y'] - obstacle['width']/2, 0] 
-
-                tlt = [obstacle['x'] - obstacle['length']/2, obstacle['y'] + obstacle['width']/2, obstacle['height']]
-                trt = [obstacle['x'] + obstacle['length']/2, obstacle['y'] + obstacle['width']/2, obstacle['height']]
-                brt = [obstacle['x'] + obstacle['length']/2, obstacle['y'] - obstacle['width']/2, obstacle['height']]
-                blt = [obstacle['x'] - obstacle['length']/2, obstacle['y'] - obstacle['width']/2, obstacle['height']]
-            
-            # Append vertices
-            vertices = [tl, tr, br, bl, tlt, trt, brt, blt]
-            self.vertices.append(vertices)
+        if self.vertices_key != (self.vertex_version, len(self.table)):
+            rows = np.flatnonzero(np.isin(self.table.category, (WALL, DOOR, FURNITURE)))
+            rows = rows[np.argsort(self.table.category[rows], kind='stable')] # walls, doors, furnitures
+            vertices = np.empty((len(rows) + 2, 8, 3))
+            vertices[:-2] = self.table.take(rows).vertices()
+            vertices[-2:] = self.closingVertices(vertices[:-2])
+            self.setVertices(vertices, self.categoryOffsets())
+        return self.vertices
+
+    def setVertices(self, vertices: np.ndarray, offsets: dict):
+        """
+            Store a new array of vertices as the cached one, making it read-only.
+        """
+        vertices.setflags(write=False)
+        self.vertices = vertices
+        self.vertices_open = vertices[:-2]
+        self.vertex_offsets = offsets
+        self.vertices_key = (self.vertex_version, len(self.table))
+
+    def closingVertices(self, vertices: np.ndarray) -> np.ndarray:
+        """
+            Compute the vertices (2, 8, 3) of the floor and of the ceiling slabs that cover the bounding box of the given
+            vertices, in the order trb, tlb, blb, brb, trt, tlt, blt, brt.
+        """
+        lower = vertices[:, :, :2].min(axis=(0, 1))
+        upper = vertices[:, :, :2].max(axis=(0, 1))
+        corners = np.array([[upper[0], upper[1]], [lower[0], upper[1]], [lower[0], lower[1]], [upper[0], lower[1]]])
+        slabs = np.empty((2, 8, 3))
+        slabs[:, :4, :2] = corners
+        slabs[:, 4:, :2] = corners
+        slabs[0, :4, 2], slabs[0, 4:, 2] = 0.0, -SLAB_THICKNESS
+        slabs[1, :4, 2], slabs[1, 4:, 2] = CEILING_HEIGHT, CEILING_HEIGHT + SLAB_THICKNESS
+        return slabs
+
+    def getVertices2D(self, height: float = 0.0) -> np.ndarray:
+        """
+            Get the footprints on the floor of the obstacles whose bottom is not above `height`. This is used for the 2D
+            free space of the base.
+        """
+        vertices = self.getVertices()[:-2]
+        on_floor = vertices[:, 0, 2] <= height
+        return vertices[on_floor, :4, :2]
 
-    def generateConstraints(self, obstacles, obstacles_name: str) -> np.ndarray:
+    def setObstacles(self, category: int, obstacles):
         """
-            Compute the offsets and normals of each surface for a given set of obstacles.
+            Replace the obstacles of a category with the given ones, either a table or a list of dicts with the keys
+            'x', 'y', 'width', 'length', 'height' and optionally 'theta' and 'z'.
         """
-        vectors = []
-        points = []
+        self.removeObstacles(category)
         for obstacle in obstacles:
-            # Set center of the obstacle
-            center = np.array([obstacle['x'], obstacle['y']])
-
-            # Compute the center points of the sides of each obstacle, accounting for their orientation
-            # Unless the obstacle is a furniture, then it does not have orientation
-            if obstacles_name=='furnitures' or np.abs(obstacle['theta']) != np.pi/2:
-                # Compute the corner locations and center of each side
-                tl = [obstacle['x'] - obstacle['width']/2, obstacle['y'] + obstacle['length']/2, 0]
-                tr = [obstacle['x'] + obstacle['width']/2, obstacle['y'] + obstacle['length']/2, 0]
-                br = [obstacle['x'] + obstacle['width']/2, obstacle['y'] - obstacle['length']/2, 0]
-                bl = [obstacle['x'] - obstacle['width']/2, obstacle['y'] - obstacle['length']/2, 0]
-
-                left_point = [center[0] - obstacle['width']/2, center[1]]
-                top_point = [center[0], center[1] + obstacle['length']/2]
-                right_point = [center[0] + obstacle['width']/2, center[1]]
-                bot_point = [center[0], center[1] - obstacle['length']/2]
-            else:
-                tl = [obstacle['x'] - obstacle['length']/2, obstacle['y'] + obstacle['width']/2, 0]
-                tr = [obstacle['x'] + obstacle['length']/2, obstacle['y'] + obstacle['width']/2, 0]
-                br = [obstacle['x'] + obstacle['length']/2, obstacle['y'] - obstacle['width']/2, 0]
-                bl = [obstacle['x'] - obstacle['length']/2, obstacle['y'] - obstacle['width']/2, 0]
-
-                left_point = [center[0] - obstacle['length']/2, center[1]]
-                top_point = [center[0], center[1] + obstacle['width']/2]
-                right_point = [center[0] + obstacle['length']/2, center[1]]
-                bot_point = [center[0], center[1] - obstacle['width']/2]
-
-            # Compute the normal vectors on each side
-            left_norm = np.array(self.computeNormalVector(bl, tl)[0])
-            top_norm = np.array(self.computeNormalVector(tl, tr)[0])
-            right_norm = np.array(self.computeNormalVector(br, tr)[1])
-            bot_norm = np.array(self.computeNormalVector(bl, br)[1])
-
-            # Transform to unit vectors
-            left_norm = left_norm / np.linalg.norm(left_norm)
-            top_norm = top_norm / np.linalg.norm(top_norm)
-            right_norm = right_norm / np.linalg.norm(right_norm)
-            bot_norm = bot_norm / np.linalg.norm(bot_norm)
-
-            self.normals = np.append(self.normals, [left_norm, right_norm, top_norm, bot_norm])
-            self.constraints = np.append(self.constraints, [left_norm@left_point, right_norm@right_point, top_norm@top_point, bot_norm@bot_point])
-            self.surfaces.append([[left_point, left_norm], [right_point, right_norm], [top_point, top_norm], [bot_point, bot_norm]])
-            vectors.append(center-left_point)
-            vectors.append(center-right_point)
-            vectors.append(center-top_point)
-            vectors.append(center-bot_point)
-            points.append(left_point)
-            points.append(right_point)
-            points.append(top_point)
-            points.append(bot_point)
-
-            self.vectors[obstacles_name] = vectors
-            self.points[obstacles_name] = points        
+            self.addObstacle(category, x=obstacle['x'], y=obstacle['y'], width=obstacle['width'],
+                             length=obstacle['length'], height=obstacle['height'], theta=obstacle.get('theta', 0.0),
+                             z=obstacle.get('z', 0.0))
+
+    def copy(self) -> 'ObstacleConstraintsGenerator':
+        """
+            Return a generator with a copy of the obstacle table, whose constraints and vertices still have to be computed.
+        """
+        generator = ObstacleConstraintsGenerator(robot_dim=self.robot_dim, scale=1.0)
+        generator.table = self.table.take(np.arange(len(self.table)))
+        return generator
+
+    def occupancyGrid(self, lower: np.ndarray, upper: np.ndarray, resolution: float = GRID_RESOLUTION,
+                      height: float = 0.0) -> np.ndarray:
+        """
+            Rasterize the footprints of the walls, doors and furnitures whose bottom is not above `height` on a grid
+            covering the rectangle [lower, upper]. A cell is occupied if its center lies in a footprint.
+            Returns a boolean array indexed as grid[ix, iy].
+        """
+        lower = np.asarray(lower, dtype=float)
+        shape = np.ceil((np.asarray(upper, dtype=float) - lower) / resolution).astype(int)
+        grid = np.zeros(shape, dtype=bool)
+        obstacles = self.table.select([WALL, DOOR, FURNITURE])
+        centers, half = obstacles.extents()
+        on_floor = obstacles.z <= height
+
+        # Range of the cells whose centers lie in each footprint
+        first = np.ceil((centers - half - lower) / resolution - 0.5).astype(int)
+        last = np.floor((centers + half - lower) / resolution - 0.5).astype(int)
+        first, last = np.clip(first, 0, shape), np.clip(last + 1, 0, shape)
+        for (x0, y0), (x1, y1) in zip(first[on_floor], last[on_floor]):
+            grid[x0:x1, y0:y1] = True
+        return grid
+
+    def signedDistanceField(self, lower: np.ndarray, upper: np.ndarray, resolution: float = SDF_RESOLUTION,
+                            height: float = 0.0) -> tuple:
+        """
+            Sample on a grid over [lower, upper] the signed distance to the footprints of the walls, doors and furnitures
+            whose bottom is not above `height`: positive outside the obstacles, negative inside.
+            Returns the coordinates xs, ys of the grid and the distances indexed as sdf[ix, iy].
+        """
+        xs = np.arange(lower[0], upper[0] + resolution, resolution)
+        ys = np.arange(lower[1], upper[1] + resolution, resolution)
+        points = np.stack(np.meshgrid(xs, ys, indexing='ij'), axis=-1)
+        sdf = np.full(points.shape[:2], np.inf)
+        obstacles = self.table.select([WALL, DOOR, FURNITURE])
+        centers, half = obstacles.extents()
+        on_floor = obstacles.z <= height
+
+        # Signed distance to each box, the union of the boxes is the minimum
+        for center, half_size in zip(centers[on_floor], half[on_floor]):
+            q = np.abs(points - center) - half_size
+            outside = np.linalg.norm(np.maximum(q, 0.0), axis=-1)
+            inside = np.minimum(np.max(q, axis=-1), 0.0)
+            np.minimum(sdf, outside + inside, out=sdf)
+        return xs, ys, sdf
+
+    def sdfInterpolant(self, lower: np.ndarray, upper: np.ndarray, resolution: float = SDF_RESOLUTION,
+                       margin: float = SDF_MARGIN) -> casadi.Function:
+        """
+            Return the signed distance field of the footprints as a smooth CasADi function sdf(p) of the 2D position,
+            a bspline interpolant of the grid of signedDistanceField extended by `margin` around [lower, upper].
+        """
+        xs, ys, sdf = self.signedDistanceField(np.asarray(lower) - margin, np.asarray(upper) + margin, resolution)
+        return casadi.interpolant('sdf', 'bspline', [xs, ys], sdf.ravel(order='F'))
+
+    def addObstacle(self, category: int, **fields) -> int:
+        """
+            Append an obstacle of a category to the table, with the fields of ObstacleTable.append, and record the change.
+            The constraints and vertices have to be computed again. Returns the index of the obstacle in its category.
+        """
+        self.table.append(category, **fields)
+        self.surface_offsets = None # the rows of the constraints and vertices do not match the table anymore
+        self.vertex_offsets = None
+        index = np.count_nonzero(self.table.category == category) - 1
+        self.bumpVersion(category, index)
+        return index
+
+    def removeObstacles(self, category: int):
+        """
+            Remove all the obstacles of a category. The constraints and vertices have to be computed again.
+        """
+        self.table.remove(category)
+        self.surface_offsets = None # the rows of the constraints and vertices do not match the table anymore
+        self.vertex_offsets = None
+        self.bumpVersion(category)
+
+    def categoryOffsets(self) -> dict:
+        """
+            Return the index of the first obstacle of each category in the rows of the constraints and of the vertices,
+            which are ordered as walls, doors and furnitures.
+        """
+        counts = [np.count_nonzero(self.table.category == category) for category in (WALL, DOOR, FURNITURE)]
+        return {WALL: 0, DOOR: counts[0], FURNITURE: counts[0] + counts[1]}
+
+    def bumpVersion(self, category: int, index: int = None):
+        """
+            Record a change of the i-th obstacle of a category, or of the whole category if index is None.
+        """
+        self.version += 1
+        self.changes.append((self.version, category, index))
+        if category != KNOB:
+            self.vertex_version += 1
+
+    def changedSince(self, version: int) -> list:
+        """
+            Return the (category, index) of the obstacles changed after `version`, index None if the whole category
+            changed. Downstream caches compare the version they were built with against self.version.
+        """
+        return [(category, index) for change_version, category, index in self.changes if change_version > version]
+
+    def surfaceRows(self, category: int, index: int) -> slice:
+        """
+            Return the rows of self.constraints, self.normals and self.surfaces of the i-th obstacle of a category.
+        """
+        start = SIDES*(self.surface_offsets[category] + index)
+        return slice(start, start + SIDES)
+
+    def updateObstacle(self, category: int, index: int, **fields) -> bool:
+        """
+            Update the pose or dimensions of the i-th obstacle of a category, e.g. the i-th door after it has been
+            opened, and recompute only its rows of the constraints and of the vertices computed last.
+            Returns whether the obstacle changed, in which case the version is incremented.
+        """
+        row = self.table.row(category, index)
+        if not self.table.update(row, **fields):
+            return False
+        self.bumpVersion(category, index)
+        if category == KNOB:
+            return True
+
+        obstacle = self.table.take(row)
+        if self.surface_offsets is not None:
+            self.generateConstraints(obstacle, obstacles_name=None, start=self.surfaceRows(category, index).start)
+            self.surface_index = None # rebuilt by nearestSurfaces
+        if self.vertex_offsets is not None and self.vertices_key == (self.vertex_version - 1, len(self.table)):
+            # the arrays returned before are read-only snapshots, the updated vertices are a new array
+            vertices = self.vertices.copy()
+            vertices[self.vertex_offsets[category] + index] = obstacle.vertices()[0]
+            vertices[-2:] = self.closingVertices(vertices[:-2])
+            self.setVertices(vertices, self.vertex_offsets)
+        return True
+
+    def updateDoor(self, index: int, x: float, y: float, theta: float) -> bool:
+        """
+            Update the pose of the i-th door, see updateObstacle.
+        """
+        return self.updateObstacle(DOOR, index, x=x, y=y, theta=theta)
+
+    def generateConstraints(self, obstacles, obstacles_name: str, start: int = 0) -> int:
+        """
+            Compute the offsets and normals of each surface for a given set of obstacles, writing them in the preallocated
+            rows of self.constraints, self.normals and self.surfaces starting from `start`. Returns the next free row.
+        """
+        centers, half = obstacles.extents()
+        end = start + SIDES*len(centers)
+
+        # Center points of the sides, in the order left, right, top, bottom
+        points = centers[:, None, :] - half[:, None, :] * SIDE_NORMALS[None, :, :]
+        normals = np.broadcast_to(SIDE_NORMALS, points.shape)
+
+        self.normals[start:end] = normals.reshape(-1, 2)
+        self.constraints[start:end] = np.einsum('ijk,ijk->ij', normals, points).reshape(-1)
+        self.surfaces[start:end, 0] = points.reshape(-1, 2)
+        self.surfaces[start:end, 1] = normals.reshape(-1, 2)
+        self.surface_lengths[start:end] = half[:, SIDE_AXES].reshape(-1)
+        self.surface_vectors[start:end] = (centers[:, None, :] - points).reshape(-1, 2)
+
+        return end
+
+    def nearestSurfaces(self, pos: np.ndarray, K: int, radius: float = SURFACE_RADIUS) -> tuple:
+        """
+            Return the normals A (K, 2) and offsets b (K,) of the K surfaces nearest to the position that face it, at
+            most one per obstacle: the face whose plane is the farthest from the position, which separates the position
+            from the whole obstacle. Only the surfaces closer than `radius` are considered, the missing rows are padded
+            with the inactive constraint 0*p <= INACTIVE_OFFSET. generateConstraintsCylinder has to be called before.
+        """
+        A = np.zeros((K, 2))
+        b = np.full(K, INACTIVE_OFFSET)
+        if self.surface_index is None and len(self.surfaces) > 0:
+            self.surface_index = cKDTree(self.surfaces[:, 0])
+        if self.surface_index is None:
+            return A, b
+
+        # Candidates from the KD-tree: the center of a surface is at most its half length away from its closest point
+        pos = np.asarray(pos, dtype=float)[:2]
+        rows = np.array(self.surface_index.query_ball_point(pos, radius + np.max(self.surface_lengths)), dtype=int)
+        normals = self.normals[rows]
+        points = self.surfaces[rows, 0]
+        separation = self.constraints[rows] - normals @ pos # positive if the position is in front of the surface
+        rows, normals, points, separation = rows[separation >= 0], normals[separation >= 0], points[separation >= 0], separation[separation >= 0]
+
+        # Distance from the position to the surfaces, as segments of half length surface_lengths
+        tangents = np.stack((-normals[:, 1], normals[:, 0]), axis=1)
+        along = np.clip(np.einsum('ij,ij->i', pos - points, tangents), -self.surface_lengths[rows], self.surface_lengths[rows])
+        distance = np.linalg.norm(pos - points - along[:, None] * tangents, axis=1)
+        close = distance <= radius
+        rows, separation, distance = rows[close], separation[close], distance[close]
+
+        # Keep the most separating face of each obstacle, then the K closest obstacles
+        obstacles = rows // SIDES
+        order = np.lexsort((-separation, obstacles))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = obstacles[order][1:] != obstacles[order][:-1]
+        rows, distance = rows[order][first], distance[order][first]
+        rows = rows[np.argsort(distance)[:K]]
+
+        A[:len(rows)] = self.normals[rows]
+        b[:len(rows)] = self.constraints[rows]
+        return A, b
 
     def display(self, pos) -> None:
         """
@@ -1,6 +1,14 @@
+import time
 from casadi import *
 import numpy as np
 from model import Model
+from free_space import pad_hyperplanes
+from mpc_constraints import add_box_limits, add_integrator_dynamics, add_hyperplane_constraints, condensed_states
+from warm_start import WarmStart, WARM_START_OPTIONS
+from compiled_solver import CompiledSolver
+from rti import RTISolver
+from solve_statistics import SolveStatistics
+from solution_cache import SolutionCache, active_set
 
 # Default value for the cost function multipliers: these values are the same of the Max Spahn, 2021 paper
 weight_tracking_default_base = 5.0
@@ -23,13 +31,16 @@ d7 = 0.107
 a3 = 0.0825
 a4 = 0.0825
 a6 = 0.088
-# Sphere constraint clearance
+# Sphere constraint clearance, in meters: the hyperplanes are normalized by pad_hyperplanes, so these are the distances
+# kept between the centers of the spheres and the planes. The first sphere, at the height d1 + offset_z, covers the base
+# of radius 0.2 with a margin of 0.3 and still fits between the floor and the ceiling.
 CLEARANCE1 = 0.5
 CLEARANCE2 = 0.3
 CLEARANCE3 = 0.2
 # MPC parameters
 DT = 0.5
 STEPS = 5
+MAX_PLANES = 40 # number of rows of the hyperplane parameters, regions with fewer planes are padded with neutral rows
 
 
 
@@ -47,7 +58,9 @@ class ArmMPController:
     weight_terminal_base: float = weight_terminal_default_base,
     weight_terminal_theta: float = weight_terminal_default_theta,
     weight_terminal_arm: float = weight_terminal_default_arm,
-    dt: float = DT, N: int = STEPS):
+    dt: float = DT, N: int = STEPS, max_planes: int = MAX_PLANES, warm_start: bool = True,
+    compiled: bool = False, condensed: bool = False, condensing: str = None, rti: bool = False,
+    solution_cache: bool = False):
         """
         Constructor of the classe.
         Args:
@@ -63,7 +76,24 @@ class ArmMPController:
             weight_terminal_arm (float, optional): _description_. Defaults to weight_terminal_default_arm.
             dt (float, optional): _description_. Defaults to 0.01.
             N (int, optional): _description_. Defaults to 5.
+            max_planes (int, optional): maximum number of hyperplanes of the obstacle constraints. Defaults to MAX_PLANES.
+            warm_start (bool, optional): start every solve from the shifted previous solution and multipliers.
+                Defaults to True.
+            compiled (bool, optional): solve with the problem compiled to C and cached on disk, see CompiledSolver.
+                Defaults to False.
+            condensed (bool, optional): eliminate the states from the decision variables, they are computed from the
+                initial state and the inputs. Defaults to False.
+            condensing (str, optional): 'dense' or 'sparse' condensing, see condensed_states. Defaults to None, in which
+                case it is chosen from the horizon.
+            rti (bool, optional): real-time iteration, every step after the first one takes a single SQP iteration
+                from the shifted previous solution, see RTISolver and prepare. Requires the warm start.
+                Defaults to False.
+            solution_cache (bool, optional): keep the converged solutions in a SolutionCache and start the first solve
+                and the solves after a change of the goal from the nearest cached one. Requires the warm start.
+                Defaults to False.
         """
+        assert warm_start or not rti, f"The RTI mode requires the warm start."
+        assert warm_start or not solution_cache, f"The solution cache requires the warm start."
 
         self.model = model # Model of the robot
         self.dofs = self.model._dofs # Number of dof of the robot
@@ -84,6 +114,14 @@ class ArmMPController:
 
         self.dt = dt # Time step of each iteration
         self.N = N # Prediction horizon
+        self.max_planes = max_planes # Number of rows of the hyperplane parameters
+        self.use_warm_start = warm_start
+        self.compiled = compiled
+        self.condensed = condensed
+        self.condensing = condensing
+        self.rti = rti
+        self.use_solution_cache = solution_cache
+        self.sphere_centers = sphere_centers_function(len(self.dofs)) # Forward kinematics of the collision spheres
 
         # Limits on states and input variables
         self.lower_limit_state = self.model.get_observation_space()['joint_state']['position'].low[self.dofs]
@@ -97,18 +135,25 @@ class ArmMPController:
         """
         Methods to build the Finite Horizon Optimal Control Problem. Given the MPC structure, it declares the
         optimization varibles (future states and inputs), it defines the cost function, it adds the constraints
-        and it solves the optimization problem.
+        and it sets up the solver. The problem is built only once, the obstacles enter as the parameters A and b, which
+        are updated at every step.
         """
 
         self.opti = Opti()
         self.state0 = self.opti.parameter(len(self.dofs), 1) # Parameters for initial state
         self.goal = self.opti.parameter(len(self.dofs), 1) # Parameters for the goal state
-        self.x = self.opti.variable(len(self.dofs), self.N + 1) # Optimization varibles (states) over an horizon N
         self.u = self.opti.variable(len(self.dofs), self.N) # Optimization variables (inputs) over an horizon N
+        if self.condensed: # States as a function of the initial state and of the inputs
+            self.x = condensed_states(self.state0, self.u, self.dt, self.condensing)
+        else:
+            self.x = self.opti.variable(len(self.dofs), self.N + 1) # Optimization varibles (states) over an horizon N
+        self.A = self.opti.parameter(self.max_planes, 3) # Parameters for the normals of the hyperplanes
+        self.b = self.opti.parameter(self.max_planes) # Parameters for the offsets of the hyperplanes
         self.cost = 0. # Initialization of the cost function
         self.add_objective_function()
         self.opti.minimize(self.cost)
         self.add_constraints()
+        self.add_obstacle_avoidance_constraints()
         p_opts = dict(print_time=False, verbose=False)
         # s_opts = dict(print_level=0, tol=5e-1, acceptable_constr_viol_tol=0.01)
         s_opts = {"max_cpu_time": 5., 
@@ -124,28 +169,97 @@ class ArmMPController:
 				  "acceptable_obj_change_tol": 1e20,
 				  "diverging_iterates_tol": 1e20,
                   "nlp_scaling_method": "none"}
-        self.opti.solver('ipopt', p_opts, s_opts) # Set solver 'ipopt'
-        self.prev_solution_x = None # Initialization of previous solution (states)
-        self.prev_solution_u = None # Initialization of previous solution (actions)
+        # Solver 'ipopt', with the warm start options only on the warm solves, and initial guess from the previous solution
+        self.warm_start = WarmStart(self.opti, self.x, self.u, self.use_warm_start, (p_opts, s_opts))
+        self.compiled_solver = None
+        if self.compiled:
+            key = dict(N=self.N, dt=self.dt, dofs=self.dofs, max_planes=self.max_planes, condensed=self.condensed,
+                       condensing=self.condensing,
+                       weights=[self.weight_tracking.tolist(), self.weight_input.tolist(), self.weight_terminal.tolist()])
+            self.compiled_solver = CompiledSolver(self.opti, 'arm_mpc', key, p_opts, s_opts, WARM_START_OPTIONS)
+            self.compiled_solver.build() # Generate and compile the complete problem before the first step
+        self.rti_solver = RTISolver(self.opti, [self.state0, self.goal]) if self.rti else None # A change of A or b prepares again
+        self.statistics = SolveStatistics() # Wall time, iterations, status, etc. of every solve
+        self.solution_cache = SolutionCache() if self.use_solution_cache else None
+        self.last_goal = None # Goal of the previous solve
+        self.active = None # Active set of the last cached solution
+        self.inequality = None # Mask of the inequality constraints
+
+    def prepare(self):
+        """
+        Preparation phase of the RTI mode: set the shifted previous solution as initial guess and linearize the problem
+        around it, so that the next solve_MPC only has to solve one QP. It is meant to be called between two control
+        steps, e.g. right after applying the action; solve_MPC prepares itself if it was not called, or if the obstacle
+        hyperplanes changed in the meantime.
+        """
+
+        if self.rti_solver is not None and self.warm_start.apply():
+            self.rti_solver.prepare()
+
+    def initial_guess(self, state0: np.ndarray, goal: np.ndarray) -> bool:
+        """
+        Set the initial guess of the solve: the linearization point of the RTI mode if it is prepared, otherwise the
+        shifted previous solution, replaced by the nearest cached solution at the first solve and when the goal changes.
+        Returns whether a guess was set.
+        """
+
+        if self.rti_solver is not None and self.rti_solver.prepared:
+            return True
+        warm = self.warm_start.apply()
+        if self.solution_cache is None or warm and np.array_equal(goal, self.last_goal):
+            return warm
+        cached = self.solution_cache.lookup(state0, goal, self.active)
+        if cached is not None:
+            self.warm_start.load(*cached)
+        return warm or cached is not None
+
+    def cache_solution(self, state0: np.ndarray, goal: np.ndarray):
+        """
+        Store the solution just passed to the warm start in the solution cache, with its active set.
+        """
+
+        if self.inequality is None:
+            self.inequality = np.atleast_1d(self.opti.value(self.opti.lbg) != self.opti.value(self.opti.ubg))
+        self.active = active_set(self.warm_start.lam_g, self.inequality)
+        self.solution_cache.store(state0, goal, self.warm_start.prev_solution_x, self.warm_start.prev_solution_u,
+                                  self.warm_start.lam_g, self.active)
 
     def solve_MPC(self, state0: np.ndarray, goal: np.ndarray, A, b) -> np.ndarray:
+        """
+        Update the initial state, the goal and the obstacle hyperplanes and solve the optimization problem.
+        Args:
+            state0 (np.ndarray): current state of the robot
+            goal (np.ndarray): goal state
+            A (list): normals of the hyperplanes of the free space, {x | A*x <= b}
+            b (list): offsets of the hyperplanes of the free space
+
+        Returns:
+            np.ndarray: next action
+        """
 
-        # Re-initialize the solver
-        self.FHOCP()
         self.opti.set_value(self.state0, state0) # Set the initial state parameters
         self.opti.set_value(self.goal, goal) # Set the goal state parameters
-        self.add_obstacle_avoidance_constraints(A, b) # Static obstacles avoidance
+        self.set_obstacle_constraints(A, b, [state0[0], state0[1], d1 + offset_z]) # Static obstacles avoidance
 
         # At time t=0 no solution has been computed yet, so we don't have any initial guess
-        if self.prev_solution_u is None and self.prev_solution_x is None:
-            solution = self.opti.solve() # Solve the problem
-        else:
-            self.opti.set_initial(self.x, self.prev_solution_x)
-            self.opti.set_initial(self.u, self.prev_solution_u)
-            solution = self.opti.solve() # Solve the problem
-        
-        self.prev_solution_x = solution.value(self.x)
-        self.prev_solution_u = solution.value(self.u)
+        warm = self.initial_guess(state0, goal)
+        rti_step = self.rti_solver is not None and warm # The first step is solved to convergence
+        start = time.perf_counter()
+        try:
+            if rti_step: # One SQP iteration
+                solution = self.rti_solver.feedback()
+            elif self.compiled_solver is not None:
+                solution = self.compiled_solver.solve(warm)
+            else:
+                solution = self.opti.solve() # Solve the problem
+        except RuntimeError as error:
+            self.statistics.record_failure(error, time.perf_counter() - start, warm)
+            raise
+        self.statistics.record(solution.stats(), time.perf_counter() - start, warm)
+        self.warm_start.update(solution, warm)
+        if self.solution_cache is not None and not rti_step: # Only converged solutions
+            self.cache_solution(state0, goal)
+        self.last_goal = np.array(goal)
         # self.opti.debug.show_infeasibilities()
         return solution.value(self.u[:, 0])
 
@@ -171,73 +285,65 @@ class ArmMPController:
         """
 
         # Limit constraints
+        add_box_limits(self.opti, self.u, self.lower_limit_input, self.upper_limit_input)
+        if self.condensed: # The initial state and the dynamics are satisfied by construction
+            add_box_limits(self.opti, self.x[:, 1:], self.lower_limit_state, self.upper_limit_state)
+            return
         self.opti.subject_to(self.x[:, 0] == self.state0) # Initial state constraint
-        for k in range(self.N): # Iterate over all the steps of the prediction horizon
-            self.opti.subject_to(self.lower_limit_state <= self.x[:, k])
-            self.opti.subject_to(self.x[:, k] <= self.upper_limit_state)
-            self.opti.subject_to(self.lower_limit_input <= self.u[:, k])
-            self.opti.subject_to(self.u[:, k] <= self.upper_limit_input)
-
-        self.opti.subject_to(self.lower_limit_state <= self.x[:, self.N])
-        self.opti.subject_to(self.x[:, self.N] <= self.upper_limit_state)
+        add_box_limits(self.opti, self.x, self.lower_limit_state, self.upper_limit_state)
 
         # Robot model constraints
-        for k in range(self.N):
-            self.opti.subject_to(self.x[:, k+1] == self.x[:, k] + self.dt * self.u[:, k])
-
-
-    def add_obstacle_avoidance_constraints(self, A, b):
-
-        for k in range(self.N + 1):
-
-            # First sphere
-            p1 = [self.x[0, k], self.x[1, k], d1 + offset_z]
-            # self.opti.subject_to(A @ p1 <= b - CLEARANCE1)
-
-
-            for a_i, b_i in zip(A, b):
-                self.opti.subject_to(a_i[0]*p1[0] + a_i[1]*p1[1] + a_i[2]*p1[2] <= b_i - CLEARANCE1)
-
-            # Second sphere
-            p2 = [self.x[0, k] - d3 * sin(self.x[3, k]) * cos(self.x[2, k]) + a3 * cos(self.x[3, k]) * cos(self.x[2, k]), \
-                self.x[1, k] - d3 * sin(self.x[3, k]) * sin(self.x[2, k]) + a3 * cos(self.x[3, k])*sin(self.x[2, k]), \
-                d1 + offset_z + d3 * cos(self.x[3, k]) + a3 * sin(self.x[3, k])]
-            # self.opti.subject_to(A @ p2 <= b - CLEARANCE2)
-
-            for a_i, b_i in zip(A, b):
-                self.opti.subject_to(a_i[0]*p2[0] + a_i[1]*p2[1] + a_i[2]*p2[2] <= b_i - CLEARANCE2)
-
-            # Third sphere
-            p3 = [self.x[0, k] + cos(self.x[2, k]) * (d5 * (sin(self.x[4, k])*(-cos(self.x[3, k])) - cos(self.x[4, k])*sin(self.x[3, k])) \
-                - d7 * (cos(self.x[5, k])*sin(self.x[4, k])*(-cos(self.x[3, k]) - cos(self.x[4, k])*sin(self.x[3, k])) \
-                + sin(self.x[5, k])*(cos(self.x[4, k])*(-cos(self.x[3, k])) + sin(self.x[3, k])*sin(self.x[4, k]))) \
-                - d3 * sin(self.x[3, k]) + a6 * sin(self.x[5, k])*(sin(self.x[4, k])*(-cos(self.x[3, k])) \
-                - cos(self.x[4, k])*sin(self.x[3, k])) \
-                - a6 * cos(self.x[5, k])*(cos(self.x[4, k])*(-cos(self.x[3, k]) + sin(self.x[3, k])*sin(self.x[4, k]))) \
-                + a4 * cos(self.x[4, k])*(-cos(self.x[3, k])) \
-                + a3 * cos(self.x[3, k]) \
-                + a4 * sin(self.x[3, k])*sin(self.x[4, k])),
-                \
-                self.x[1, k] + sin(self.x[2, k]) * (d5 * (sin(self.x[4, k]) * (-cos(self.x[3, k])) \
-                - cos(self.x[4, k])*sin(self.x[3, k])) \
-                - d7 * (cos(self.x[5, k]) * (sin(self.x[4, k]) * (-cos(self.x[3, k])) \
-                - cos(self.x[4, k]) * sin(self.x[3, k])) + sin(self.x[5, k]) * ((cos(self.x[4, k]) * (-cos(self.x[3, k])) \
-                + sin(self.x[3, k]) * sin(self.x[4, k])))) \
-                - d3 * sin(self.x[3, k]) \
-                + a6 * sin(self.x[5, k]) * (sin(self.x[4, k]) * (-cos(self.x[3, k])) \
-                - cos(self.x[4, k]) * sin(self.x[3, k])) \
-                - a6 * cos(self.x[5, k]) * ((cos(self.x[4, k]) * (-cos(self.x[3, k])) \
-                + sin(self.x[3, k]) * sin(self.x[4, k]))) \
-                + a4 * cos(self.x[4, k]) * (-cos(self.x[3, k])) \
-                + a3*cos(self.x[3, k]) + a4 * sin(self.x[3, k]) * sin(self.x[4, k])),
-                \
-                d1+offset_z+d7*(sin(self.x[5, k])*(1*(cos(self.x[3, k])*sin(self.x[4, k])+1*cos(self.x[4, k])*\
-                sin(self.x[3, k])) - sin(self.x[3, k]) * 0 * 0) - cos(self.x[5, k]) * (cos(self.x[3, k]) * cos(self.x[4, k]) - 1 *\
-                sin(self.x[3, k]) * sin(self.x[4, k]))) + d5 * (cos(self.x[3, k]) * cos(self.x[4, k]) - 1 * sin(self.x[3, k]) * sin(self.x[4, k])) + d3 *\
-                cos(self.x[3, k])+a6*sin(self.x[5, k])*(cos(self.x[3, k])*cos(self.x[4, k])-1*sin(self.x[3, k])*sin(self.x[4, k]))+a3*1*\
-                sin(self.x[3, k])-a4*cos(self.x[3, k])*sin(self.x[4, k])+a6*cos(self.x[5, k])*(1*(cos(self.x[3, k])*sin(self.x[4, k])+1*\
-                cos(self.x[4, k]) * sin(self.x[3, k])) - sin(self.x[3, k]) * 0 * 0) - a4 * 1 * cos(self.x[4, k]) * sin(self.x[3, k])\
-                ]
-            
-            for a_i, b_i in zip(A, b):
-                self.opti.subject_to(a_i[0]*p3[0] + a_i[1]*p3[1] + a_i[2]*p3[2] <= b_i - CLEARANCE3)
\ No newline at end of file
+        add_integrator_dynamics(self.opti, self.x, self.u, self.dt)
+
+
+    def set_obstacle_constraints(self, A, b, pos: np.ndarray = None):
+        """
+        Set the hyperplanes of the obstacle avoidance constraints. They are normalized, so that the clearances are
+        distances, and padded with neutral rows to max_planes; if there are more, the ones closest to `pos` are kept.
+        """
+
+        A, b = pad_hyperplanes(A, b, self.max_planes, pos)
+        self.opti.set_value(self.A, A)
+        self.opti.set_value(self.b, b)
+
+    def add_obstacle_avoidance_constraints(self):
+        """
+        Add the constraints A*p <= b - clearance on the centers p of the three spheres covering the base and the arm,
+        A and b being the hyperplane parameters set by set_obstacle_constraints. The centers of all the steps of the
+        horizon are computed at once by the forward kinematics mapped over the columns of x.
+        """
+
+        p1, p2, p3 = self.sphere_centers.map(self.N + 1)(self.x)
+        for p, clearance in ((p1, CLEARANCE1), (p2, CLEARANCE2), (p3, CLEARANCE3)):
+            add_hyperplane_constraints(self.opti, self.A, self.b, p, clearance)
+
+
+def sphere_centers_function(n_dofs: int) -> Function:
+    """
+    Build the forward kinematics of the centers of the three spheres covering the robot from the Denavit-Hartenberg
+    parameters: the first one is on the base, the second one on the elbow and the third one on the wrist.
+    Args:
+        n_dofs (int): number of dofs of the state, [x, y, theta, q1, q2, q3, ...]
+
+    Returns:
+        Function: maps a state to the centers p1, p2, p3 (3x1 each), with common subexpressions eliminated
+    """
+
+    x = SX.sym('x', n_dofs)
+    s3, c3 = sin(x[3]), cos(x[3])
+    s5, c5 = sin(x[5]), cos(x[5])
+    s34, c34 = sin(x[3] + x[4]), cos(x[3] + x[4])
+    z0 = d1 + offset_z
+
+    # Distance of the spheres from the vertical axis of the base, along the heading theta
+    r2 = -d3 * s3 + a3 * c3
+    r3 = r2 - d5 * s34 + d7 * (c5 * s34 + s5 * c34) - a6 * s5 * s34 + a6 * c5 * c34 - a4 * c34
+    z2 = z0 + d3 * c3 + a3 * s3
+    z3 = z2 + d5 * c34 + d7 * (s5 * s34 - c5 * c34) + a6 * s5 * c34 + a6 * c5 * s34 - a4 * s34
+    heading = vertcat(cos(x[2]), sin(x[2]))
+
+    p1 = vertcat(x[0], x[1], z0)
+    p2 = vertcat(x[:2] + r2 * heading, z2)
+    p3 = vertcat(x[:2] + r3 * heading, z3)
+
+    return Function('sphere_centers', [x], [p1, p2, p3], ['x'], ['p1', 'p2', 'p3'], {'cse': True})
@@ -10,12 +10,14 @@ from planner import Planner
 import warnings
 from arm_MPC import ArmMPController
 from free_space import FreeSpace
+from region_library import RegionLibrary
 import time
 from drawing import draw_region
 
 TEST_MODE = True # Boolean to initialize test mode to test the MPC
 R_SCALE = 1.0 #how much to scale the robot's dimensions for collision check
 METHOD = ''
+REGION_LIBRARY = None # File of a precomputed RegionLibrary, e.g. 'resources/regions.npz'. Regions are computed online if None
 
 #Dimension of robot base, found in mobilePandaWithGripper.urdf
 R_RADIUS = 0.2
@@ -58,8 +60,9 @@ if __name__ == "__main__":
             goal = np.array([2, 0, 0, 0, 0, 0, 0])
             action = np.zeros(env.n())
             k = 0
-            vertices = np.array(house.Obstacles.getVertices())
+            vertices = house.Obstacles.getVertices()
             C_free = FreeSpace(vertices, [-2, 0, 0.4])
+            library = RegionLibrary.load(REGION_LIBRARY) if REGION_LIBRARY is not None else None
             while(1):
                 ob, _, _, _ = env.step(action)
                 state0 = ob['robot_0']['joint_state']['position'][robots[0]._dofs]
@@ -73,7 +76,10 @@ if __name__ == "__main__":
                 else:
                     if (k%1 == 0):
                         p0 = [state0[0], state0[1], 0.4]
-                        A, b = C_free.update_free_space(p0)
+                        if library is not None:
+                            A, b = library.find_region(p0) # Look up the precomputed region containing the robot
+                        if library is None or A is None:
+                            A, b = C_free.update_free_space(p0)
                         # C_free.show_elli(vertices, p0)
                 k += 1
                 #start_time = time.time()
@@ -0,0 +1,166 @@
+"""
+    Compiled solvers for the Opti problems of the MPC controllers. The NLP of the problem is exported to C with the
+    functions IPOPT needs (objective, constraints and their derivatives), compiled into a shared library with the local
+    C compiler and loaded back as an IPOPT solver. The libraries are cached on disk, so that a controller with the same
+    horizon, weights and constraint dimensions does not have to be compiled again at the next start.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import subprocess
+import numpy as np
+from casadi import *
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'build', 'solvers') # directory of the compiled solvers
+COMPILER = os.environ.get('CC', 'gcc') # C compiler used to build the shared libraries
+COMPILER_FLAGS = ['-O2', '-fPIC', '-shared'] # -O2 is a compromise between compilation time and speed of the code
+
+
+class SolverSolution:
+    """
+    Result of a solve that does not go through opti.solve (CompiledSolver, RTISolver), offering the subset of the
+    OptiSol interface used by the controllers. The solver has to provide the symbols x, p and lam_g of the problem.
+    """
+
+    def __init__(self, solver: 'CompiledSolver', x: np.ndarray, p: np.ndarray, lam_g: np.ndarray, stats: dict) -> None:
+        self.solver = solver
+        self.x = x
+        self.p = p
+        self.lam_g = lam_g
+        self._stats = stats
+
+        pass
+
+    def value(self, expr: MX):
+        """
+        Evaluate an expression of the variables, parameters and multipliers of the problem at the solution.
+        """
+
+        symbols = self.solver.symbols
+        value = Function('value', [symbols['x'], symbols['p'], symbols['lam_g']], [expr])(self.x, self.p, self.lam_g)
+        if value.is_scalar():
+            return float(value)
+
+        return value.full().squeeze() if min(value.shape) == 1 else value.full()
+
+    def value_variables(self) -> list:
+        """
+        Return the solution as a list of assignments variable == value, which can be passed to opti.set_initial.
+        """
+
+        x = self.solver.symbols['x']
+
+        return [var == value for var, value in zip(x.primitives(), x.split_primitives(DM(self.x)))]
+
+    def stats(self) -> dict:
+        return self._stats
+
+
+class CompiledSolver:
+    """
+    IPOPT solver of an Opti problem built from generated and compiled C code. The parameters, the initial guess and the
+    bounds are read from the Opti object at every solve, so the problem is still updated with opti.set_value and
+    opti.set_initial. The library has to be built explicitly with build once all the constraints are added, so that the
+    time spent generating and compiling the code does not end up in the first control step.
+    """
+
+    def __init__(self, opti: Opti, name: str, key: dict, p_opts: dict, s_opts: dict, warm_options: dict = None,
+                 cache_dir: str = CACHE_DIR) -> None:
+        """
+        Args:
+            opti (Opti): optimization problem
+            name (str): name of the solver, prefix of the file names
+            key (dict): settings the problem depends on, e.g. horizon, weights and constraint dimensions. The cached
+                library is also keyed by a digest of the expressions of the problem.
+            p_opts (dict): options of the solver, as passed to opti.solver
+            s_opts (dict): options of IPOPT, as passed to opti.solver
+            warm_options (dict, optional): options of IPOPT added on the warm solves, e.g. WARM_START_OPTIONS.
+                Defaults to None.
+            cache_dir (str, optional): directory of the compiled libraries. Defaults to CACHE_DIR.
+        """
+
+        self.opti = opti
+        self.name = name
+        self.key = key
+        self.options = dict(p_opts, ipopt=s_opts)
+        self.warm_options = dict(p_opts, ipopt=dict(s_opts, **(warm_options or {})))
+        self.cache_dir = cache_dir
+        self.solver = None
+        self.warm_solver = None # same library, with the warm start options
+        self.path = None
+        self.symbols = None # x, p and lam_g of the problem, reading them from Opti is slow
+        self.bounds = None # lbg and ubg as a function of the parameters
+
+        pass
+
+    def library_path(self, source: str) -> str:
+        """
+        Return the path of the library of the problem. The file name contains a digest of the key, of the version of
+        CasADi and of the generated code, so that any change of the problem gives a new library; the code does not
+        depend on the names of the Opti symbols, which change with the number of problems created before.
+        """
+
+        digest = hashlib.sha1()
+        digest.update(json.dumps(self.key, sort_keys=True, default=str).encode())
+        digest.update(CasadiMeta.version().encode())
+        with open(source, 'rb') as file:
+            digest.update(file.read())
+
+        return os.path.join(self.cache_dir, "{}_{}.so".format(self.name, digest.hexdigest()[:16]))
+
+    def build(self):
+        """
+        Generate the code of the problem and load the compiled solver from the cache, compiling it if it is not there.
+        """
+
+        self.symbols = {'x': self.opti.x, 'p': self.opti.p, 'lam_g': self.opti.lam_g}
+        nlp = {'x': self.symbols['x'], 'p': self.symbols['p'], 'f': self.opti.f, 'g': self.opti.g}
+        self.bounds = Function('bounds', [nlp['p']], [self.opti.lbg, self.opti.ubg])
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        build_dir = tempfile.mkdtemp(dir=self.cache_dir) # private to this process
+        try:
+            # Same code as nlpsol.generate_dependencies, which can only write in the working directory
+            solver = nlpsol(self.name, 'ipopt', nlp, self.options)
+            generator = CodeGenerator(self.name + '.c')
+            generator.add(solver.oracle())
+            for function in solver.get_function():
+                generator.add(solver.get_function(function))
+            generator.generate(build_dir + os.sep)
+            source = os.path.join(build_dir, self.name + '.c')
+            self.path = self.library_path(source)
+            if not os.path.exists(self.path):
+                library = os.path.join(build_dir, self.name + '.so')
+                subprocess.run([COMPILER] + COMPILER_FLAGS + [source, '-o', library], check=True)
+                os.replace(library, self.path) # other processes never load a partially written library
+        finally:
+            shutil.rmtree(build_dir, ignore_errors=True)
+        self.solver = nlpsol(self.name, 'ipopt', self.path, self.options)
+        self.warm_solver = nlpsol(self.name, 'ipopt', self.path, self.warm_options)
+
+        pass
+
+    def solve(self, warm: bool = False) -> SolverSolution:
+        """
+        Solve the problem with the current parameters and initial guess of the Opti object, with the warm start options
+        if `warm` is True.
+        Raises:
+            RuntimeError: if IPOPT does not succeed, like opti.solve
+        """
+
+        assert self.solver is not None, f"The compiled solver {self.name} has to be built before solving."
+        solver = self.warm_solver if warm else self.solver
+        initial = self.opti.initial()
+        p = self.opti.value(self.symbols['p'])
+        lbg, ubg = self.bounds(p)
+        result = solver(x0=self.opti.value(self.symbols['x'], initial), p=p,
+                        lam_g0=self.opti.value(self.symbols['lam_g'], initial), lbg=lbg, ubg=ubg)
+        stats = solver.stats()
+        if not stats['success']:
+            raise RuntimeError("Compiled solver {} failed, return_status is '{}'".format(self.name, stats['return_status']))
+
+        return SolverSolution(self, result['x'].full().ravel(), np.atleast_1d(p), result['lam_g'].full().ravel(),
+                              stats)
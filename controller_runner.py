@@ -0,0 +1,181 @@
+"""
+    Asynchronous execution of an MPC controller. The simulation loop publishes the latest state and keeps stepping with
+    the latest action, while a background thread solves the MPC on the most recent state snapshot. CasADi releases the
+    GIL while the solver runs, so simulation and control run in parallel.
+"""
+
+import time
+import threading
+import numpy as np
+
+CONTROL_PERIOD = 0.05 # deadline of a solve in seconds, a slower solve is counted as a deadline miss
+MAX_RECORDS = 10000 # maximum number of solve times and action ages kept for the statistics
+
+
+class ControllerRunner:
+    """
+    Run a solve function state, goal -> action in a background thread. Both directions use single reference
+    assignments, which are atomic in Python, instead of locks:
+    - the state snapshots are written to a single slot with a sequence number, the solver always takes the latest one
+      and skips the older ones
+    - the actions are written to the back slot of a double buffer and published by flipping the index of the front slot
+    An exception raised by the solve function stops the thread and is raised again by the next call of action, as it
+    would be by a synchronous solve.
+    """
+
+    def __init__(self, solve, period: float = CONTROL_PERIOD, n_dofs: int = None) -> None:
+        """
+        Args:
+            solve (callable): function (state, goal) -> action, e.g. a closure around MPController.solve_MPC. It is only
+                called from the background thread.
+            period (float, optional): deadline of a solve in seconds. Defaults to CONTROL_PERIOD.
+            n_dofs (int, optional): size of the action returned before the first solve, None to return None.
+                Defaults to None.
+        """
+
+        self.solve = solve
+        self.period = period
+        self._snapshot = None # (sequence, state, goal, tick, time) written by the simulation loop
+        self._sequence = 0 # sequence number of the last snapshot, only written by the simulation loop
+        self._solved = 0 # sequence number of the last snapshot taken by the solver, only written by the solver
+        self._buffer = [None, None] # double buffer of (action, tick, time) written by the solver
+        self._front = 0 # index of the published slot
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._default = None if n_dofs is None else np.zeros(n_dofs)
+
+        self.solve_times = [] # wall time of every solve
+        self.action_ages = [] # age in ticks of the actions read by the simulation loop
+        self.n_solves = 0
+        self.n_skipped = 0 # snapshots overwritten before the solver could take them
+        self.deadline_misses = 0
+        self.failures = 0
+        self.last_error = None
+
+        pass
+
+    def start(self) -> 'ControllerRunner':
+        """
+        Start the solver thread.
+        """
+
+        assert self._thread is None, f"The controller runner is already running."
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='mpc-runner', daemon=True)
+        self._thread.start()
+
+        return self
+
+    def stop(self, timeout: float = None):
+        """
+        Stop the solver thread, waiting for the running solve to finish.
+        """
+
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+        pass
+
+    def __enter__(self) -> 'ControllerRunner':
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def submit(self, state: np.ndarray, goal: np.ndarray, tick: int):
+        """
+        Publish the latest state of the simulation. Never blocks.
+        Args:
+            state (np.ndarray): current state of the robot
+            goal (np.ndarray): current goal
+            tick (int): step of the simulation the state belongs to
+        """
+
+        self._sequence += 1
+        self._snapshot = (self._sequence, np.array(state), np.array(goal), tick, time.perf_counter())
+        self._wake.set()
+
+        pass
+
+    def action(self, tick: int = None):
+        """
+        Return the latest published action. Never blocks.
+        Args:
+            tick (int, optional): current step of the simulation, to record the age of the action. Defaults to None.
+
+        Returns:
+            np.ndarray: latest action, the default action if no solve has finished yet
+
+        Raises:
+            Exception: the exception raised by the solve function in the background thread
+        """
+
+        if self.last_error is not None:
+            raise self.last_error
+        published = self._buffer[self._front]
+        if published is None:
+            return self._default
+        action, action_tick, _ = published
+        if tick is not None and len(self.action_ages) < MAX_RECORDS:
+            self.action_ages.append(tick - action_tick)
+
+        return action
+
+    def age(self) -> float:
+        """
+        Return the time in seconds since the state of the latest published action was taken, None if there is none.
+        """
+
+        published = self._buffer[self._front]
+
+        return None if published is None else time.perf_counter() - published[2]
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            snapshot = self._snapshot
+            if snapshot is None or snapshot[0] == self._solved:
+                continue
+            sequence, state, goal, tick, stamp = snapshot
+            self.n_skipped += sequence - self._solved - 1
+            self._solved = sequence
+
+            start = time.perf_counter()
+            try:
+                action = self.solve(state, goal)
+            except Exception as error: # hand the error to the simulation loop
+                self.failures += 1
+                self.last_error = error
+                break
+            elapsed = time.perf_counter() - start
+
+            # Write the back slot, then publish it
+            back = 1 - self._front
+            self._buffer[back] = (np.array(action), tick, stamp)
+            self._front = back
+
+            self.n_solves += 1
+            self.deadline_misses += elapsed > self.period
+            if len(self.solve_times) < MAX_RECORDS:
+                self.solve_times.append(elapsed)
+
+        pass
+
+    def summary(self) -> dict:
+        """
+        Return the number of solves, skipped snapshots, failures and deadline misses, and the median and maximum of the
+        solve times and of the action ages.
+        """
+
+        def describe(values):
+            return {'median': float(np.median(values)), 'max': float(np.max(values))} if len(values) > 0 else None
+
+        return {'solves': self.n_solves, 'skipped': self.n_skipped, 'failures': self.failures,
+                'deadline_misses': self.deadline_misses, 'solve_time': describe(self.solve_times),
+                'action_age': describe(self.action_ages)}
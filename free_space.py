@@ -2,19 +2,32 @@ import numpy as np
 from casadi import *
 import qpsolvers
 from scipy import sparse
+from scipy.optimize import linprog
 import cvxpy as cp
 import time
+import math
+import multiprocessing
+from multiprocessing import shared_memory
 import matplotlib.pyplot as plt
-from scipy.spatial import ConvexHull
+from scipy.spatial import ConvexHull, cKDTree
 import random
+from obstacle_table import ObstacleTable
 
 
 EPSILON_SPHERE = 0.1
-# SPACE_DIM = 2
-SPACE_DIM = 3
+SPACE_DIM = 3 # default dimension of the space, the dimension of a FreeSpace is given by its obstacles
 MAX_ITER = 3
 TOLLERANCE = 0.02
 CHECK_TOLLERANCE = 0.01
+CULL_RADIUS = 2.0 # minimum half-size of the box around the ellipsoid in which the obstacles are considered
+CULL_FACTOR = 2.0 # growth of the culling box with respect to the largest semi-axis of the ellipsoid
+PAD_OFFSET = 1e3 # offset of the neutral hyperplanes used to pad the regions to a fixed size
+N_RAYS = 20 # number of random rays shot from the center of the ellipsoid to find non-redundant hyperplanes
+REDUNDANCY_TOLLERANCE = 1e-6
+BARRIER_GAP = 1e-4 # duality gap of the barrier method of the inscribed ellipsoid, in units of log det(C)
+BARRIER_MU = 20. # increase of the barrier parameter at each outer iteration
+NEWTON_TOLLERANCE = 1e-8 # tolerance on the Newton decrement
+MAX_NEWTON_ITER = 200 # maximum total number of Newton steps of the inscribed ellipsoid
 
 
 class Ellipsoid:
@@ -32,13 +45,65 @@ class Ellipsoid:
             matrix_C (np.ndarray, optional): matrix of the ellipsoid axes. Defaults to np.eye(SPACE_DIM).
         """
 
-        self.d = center
+        self.d = np.asarray(center, dtype=float)
         self.C = matrix_C
         self.C_inv = np.linalg.inv(self.C)
+        self.dim = self.d.size # dimension of the space
 
         pass
 
 
+class ObstacleIndex:
+    """
+    Spatial index over the axis-aligned bounding boxes of the obstacles. It is used to select the obstacles that are
+    close to the ellipsoid, so that only those enter the computation of the separating hyperplanes.
+    """
+
+    def __init__(self, obstacles: list) -> None:
+        """
+        Build a KD-tree over the centers of the bounding boxes. Obstacles that are much larger than the others (walls
+        spanning the whole house, floor and ceiling) would force every query to cover the whole tree, hence they are
+        kept aside and always checked directly.
+        Args:
+            obstacles (list): list of obstacles, each element of the list contains the vertices on the related obstacle
+        """
+
+        self.lower = np.array([np.min(obs, axis=0) for obs in obstacles]) # lower corners of the bounding boxes
+        self.upper = np.array([np.max(obs, axis=0) for obs in obstacles]) # upper corners of the bounding boxes
+        half_diagonal = np.linalg.norm(self.upper - self.lower, axis=1) / 2
+
+        is_large = half_diagonal > 2 * np.median(half_diagonal)
+        self.large = np.flatnonzero(is_large)
+        self.small = np.flatnonzero(~is_large)
+        self.small_radius = np.max(half_diagonal[self.small]) if self.small.size > 0 else 0.
+        self.tree = cKDTree((self.lower[self.small] + self.upper[self.small]) / 2) if self.small.size > 0 else None
+
+        pass
+
+    def query_box(self, center: np.ndarray, half_size: float) -> list:
+        """
+        Find the obstacles whose bounding box intersects the axis-aligned box centered in `center`.
+        Args:
+            center (np.ndarray): center of the box
+            half_size (float): half of the length of the sides of the box
+
+        Returns:
+            list: sorted indices of the obstacles intersecting the box
+        """
+
+        center = np.asarray(center, dtype=float)
+        candidates = self.large
+        if self.tree is not None:
+            # any bounding box intersecting the box has its center within this distance from the center of the box
+            radius = half_size * np.sqrt(center.size) + self.small_radius
+            near = self.small[self.tree.query_ball_point(center, radius)]
+            candidates = np.concatenate((candidates, near))
+
+        overlap = np.all((self.lower[candidates] <= center + half_size) & (self.upper[candidates] >= center - half_size), axis=1)
+
+        return sorted(candidates[overlap].tolist())
+
+
 class FreeSpace:
     """
     This class implement an algorithm to find a large obstacle-free convex region.
@@ -46,27 +111,54 @@ class FreeSpace:
     Deits and Tedrake 2015, Computing Large Convex Regions of Obstacle-Free Space through Semidefinite Programming
     """
 
-    def __init__(self, obstacles: list, pos0: np.ndarray = np.zeros(SPACE_DIM)) -> None:
+    def __init__(self, obstacles: list, pos0: np.ndarray = None, cull: bool = True, remove_redundant: bool = True,
+                 max_planes: int = None, ellipsoid_solver: str = 'newton') -> None:
         """
-        Initialize the free space, described by the hyperplanes {x | A*x <= b} and the ellipsoid.
+        Initialize the free space, described by the hyperplanes {x | A*x <= b} and the ellipsoid. The dimension of the
+        space is the dimension of the vertices of the obstacles, in 2D cheaper specialized computations are used.
         Args:
-            obstacles (list): list of obstacles, each element of the list contains the vertices on the related obstacle
-            pos0 (np.ndarray, optional): initial position of the center of the ellipsoid. Defaults to np.zeros(SPACE_DIM).
+            obstacles (list): list of obstacles, each element of the list contains the vertices on the related obstacle,
+                or an ObstacleTable whose boxes are used
+            pos0 (np.ndarray, optional): initial position of the center of the ellipsoid. Defaults to the origin.
+            cull (bool, optional): consider only the obstacles inside a box around the ellipsoid. Defaults to True.
+            remove_redundant (bool, optional): return only the hyperplanes that are facets of the region.
+                Defaults to True.
+            max_planes (int, optional): return at most this number of hyperplanes, the closest to the initial position.
+                Dropping hyperplanes enlarges the region, which may then intersect the obstacles. Defaults to None.
+            ellipsoid_solver (str, optional): 'newton' solves the inscribed ellipsoid with the barrier method of
+                max_volume_inscribed_ellipsoid, warm-started from the current ellipsoid, 'cvxpy' with the generic conic
+                solvers. Defaults to 'newton'.
         """
+        assert ellipsoid_solver in ('newton', 'cvxpy'), f"Unknown ellipsoid solver {ellipsoid_solver}, expected 'newton' or 'cvxpy'."
 
-        self.ellipsoid = Ellipsoid(pos0, np.eye(SPACE_DIM)*EPSILON_SPHERE)
+        if isinstance(obstacles, ObstacleTable):
+            obstacles = obstacles.vertices()
+        if len(obstacles) > 0:
+            self.dim = np.shape(obstacles[0])[-1]
+        else:
+            self.dim = len(pos0) if pos0 is not None else SPACE_DIM
+        pos0 = np.zeros(self.dim) if pos0 is None else pos0
+        self.ellipsoid = Ellipsoid(pos0, np.eye(self.dim)*EPSILON_SPHERE)
         self.obstacles = obstacles
+        self.index = ObstacleIndex(obstacles) if cull and len(obstacles) > 0 else None
+        self.remove_redundant = remove_redundant
+        self.max_planes = max_planes
+        self.ellipsoid_solver = ellipsoid_solver
         self.A = []
         self.b = []
+        self.stats = {} # statistics of the last call of update_free_space
 
         pass
 
     def update_free_space(self, pos0) -> tuple:
 
         # re-initialize the ellipsoid to a ball and the hyperplanes
-        self.ellipsoid = Ellipsoid(pos0, np.eye(SPACE_DIM)*EPSILON_SPHERE)
+        self.ellipsoid = Ellipsoid(pos0, np.eye(self.dim)*EPSILON_SPHERE)
         self.A = []
         self.b = []
+        self.stats = {'iterations': 0, 'time_hyperplanes': 0., 'time_closest_point': 0., 'time_ellipsoid': 0.,
+                      'n_closest_point': 0}
+        solve_start = time.time()
 
         # keep iterating the algorithm
         for i in range(MAX_ITER):
@@ -79,12 +171,15 @@ class FreeSpace:
             start_time = time.time()
             self.separating_hyperplanes() # find hyperplanes that separates the obstacles from the ellipsoid
             end_time = time.time()
+            self.stats['time_hyperplanes'] += end_time - start_time
             #print("Time: ", (end_time - start_time))
 
             #print("Computing inscribed ellipsoid...")
             start_time = time.time()
             self.inscribed_ellipsoid() # find the maximum volume ellipsoid inscribed in the hyperplanes
             end_time = time.time()
+            self.stats['time_ellipsoid'] += end_time - start_time
+            self.stats['iterations'] += 1
             #print("Time: ", (end_time - start_time))
 
             det_C = np.linalg.det(self.ellipsoid.C)
@@ -95,6 +190,18 @@ class FreeSpace:
                 #print("Update succeeded!")
                 break
 
+        self.stats['n_planes_found'] = len(self.A)
+        if self.remove_redundant:
+            self.remove_redundant_hyperplanes()
+        if self.max_planes is not None:
+            self.closest_hyperplanes(pos0, self.max_planes)
+
+        # volume of the ellipsoid: volume of the unit ball scaled by det(C)
+        dim = len(self.ellipsoid.d)
+        self.stats['volume'] = float(np.pi**(dim/2) / math.gamma(dim/2 + 1) * abs(np.linalg.det(self.ellipsoid.C)))
+        self.stats['n_planes'] = len(self.A)
+        self.stats['time'] = time.time() - solve_start
+
         return self.A, self.b 
 
     def separating_hyperplanes(self):
@@ -105,6 +212,11 @@ class FreeSpace:
         self.A = []
         self.b = []
 
+        if self.index is not None:
+            # consider only the obstacles close to the ellipsoid: the culling box grows together with the ellipsoid
+            half_size = max(CULL_RADIUS, CULL_FACTOR * np.linalg.norm(self.ellipsoid.C, 2))
+            obs_remaining = self.index.query_box(self.ellipsoid.d, half_size)
+
         while len(obs_remaining) != 0:
 
             # find the closest obstacles to the ellipsoid
@@ -112,7 +224,10 @@ class FreeSpace:
             index_closest, closest_obs = self.closest_obstacle(obs_remaining)
             # find the closest point of the obstacle to the ellipsoid
             # print("Looking for closest point...")
+            start_time = time.time()
             x_closest = self.closest_point_on_obstacle(closest_obs)
+            self.stats['time_closest_point'] = self.stats.get('time_closest_point', 0.) + time.time() - start_time
+            self.stats['n_closest_point'] = self.stats.get('n_closest_point', 0) + 1
             # find the hyperplane tangent to the point that separates the obstacle from the ellipsoid
             # print("Computing separating hyperplane...")
             a_i, b_i = self.tangent_plane(x_closest)
@@ -137,19 +252,133 @@ class FreeSpace:
                     obs_remaining.remove(obs_i)
                     obs_excluded.append(obs_i)
 
+        if self.index is not None:
+            # the obstacles outside the culling box have been ignored, so the faces of the box close the polytope
+            self.bounding_box(half_size)
+
+        pass
+
+    def bounding_box(self, half_size: float):
+        """
+        Add the faces of the axis-aligned box centered in the ellipsoid to the hyperplanes. Every obstacle intersecting
+        the box has been separated from the ellipsoid, hence the resulting polytope is obstacle-free.
+        Args:
+            half_size (float): half of the length of the sides of the box
+        """
+
+        center = np.asarray(self.ellipsoid.d, dtype=float)
+        for i in range(center.size):
+            a_i = np.zeros(center.size)
+            a_i[i] = 1.
+            self.A.append(a_i)
+            self.b.append(center[i] + half_size)
+            self.A.append(-a_i)
+            self.b.append(-center[i] + half_size)
+
+        pass
+
+    def remove_redundant_hyperplanes(self):
+        """
+        Remove the hyperplanes that do not define a facet of the region {x | A*x <= b}, so that the minimal set of
+        constraints is returned. The center of the ellipsoid is strictly inside the region, hence:
+        - a ray shot from the center hits first a non-redundant hyperplane: rays along the normals and random rays
+          classify most of the hyperplanes with a few matrix products;
+        - the remaining hyperplanes are checked with a linear program, the hyperplane i is redundant if
+          max a_i*x subject to the other hyperplanes does not exceed b_i.
+        """
+
+        n_planes = len(self.b)
+        if n_planes <= self.dim + 1:
+            return
+
+        A = np.reshape(np.asarray(self.A, dtype=float), (n_planes, -1))
+        b = np.asarray(self.b, dtype=float)
+        norm = np.linalg.norm(A, axis=1)
+        A_n = A / norm[:, None]
+        slack = b / norm - A_n @ self.ellipsoid.d # distance of the center from each hyperplane
+
+        # duplicated hyperplanes: keep only the tightest one
+        index = np.arange(n_planes)
+        offset = b / norm
+        parallel = A_n @ A_n.T > 1 - REDUNDANCY_TOLLERANCE
+        tighter = (offset[None, :] < offset[:, None]) | ((offset[None, :] == offset[:, None]) & (index[None, :] < index[:, None]))
+        redundant = np.any(parallel & tighter, axis=1)
+
+        # ray shooting: the first hyperplane hit by each ray is a facet
+        rays = np.vstack((A_n, np.random.default_rng(0).normal(size=(N_RAYS, self.dim))))
+        projection = rays @ A_n[~redundant].T
+        with np.errstate(divide='ignore'):
+            distance = np.where(projection > REDUNDANCY_TOLLERANCE, slack[~redundant] / projection, np.inf)
+        hit = index[~redundant][np.argmin(distance, axis=1)]
+        essential = np.zeros(n_planes, dtype=bool)
+        essential[hit[np.isfinite(np.min(distance, axis=1))]] = True
+
+        # linear programs for the hyperplanes that are still unclassified
+        for i in np.flatnonzero(~redundant & ~essential):
+            others = ~redundant
+            others[i] = False
+            A_ub = np.vstack((A_n[others], A_n[i]))
+            b_ub = np.append(b[others] / norm[others], b[i] / norm[i] + 1) # bound the program in the direction a_i
+            result = linprog(-A_n[i], A_ub=A_ub, b_ub=b_ub, bounds=(None, None), method='highs')
+            if result.status == 0 and -result.fun <= b[i] / norm[i] + REDUNDANCY_TOLLERANCE:
+                redundant[i] = True
+
+        self.A = [self.A[i] for i in index[~redundant]]
+        self.b = [self.b[i] for i in index[~redundant]]
+
+        pass
+
+    def closest_hyperplanes(self, pos: np.ndarray, n_planes: int):
+        """
+        Keep only the n_planes hyperplanes closest to the position.
+        """
+
+        if len(self.b) <= n_planes:
+            return
+
+        A = np.reshape(np.asarray(self.A, dtype=float), (len(self.b), -1))
+        distance = (np.asarray(self.b, dtype=float) - A @ np.asarray(pos, dtype=float)) / np.linalg.norm(A, axis=1)
+        closest = np.sort(np.argsort(distance)[:n_planes])
+        self.A = [self.A[i] for i in closest]
+        self.b = [self.b[i] for i in closest]
+
         pass
 
     def inscribed_ellipsoid(self):
 
+        if self.ellipsoid_solver == 'newton':
+            solution = max_volume_inscribed_ellipsoid(self.A, self.b, self.ellipsoid.C, self.ellipsoid.d)
+            if solution is not None:
+                C, d, iterations = solution
+                self.ellipsoid = Ellipsoid(d, C)
+                self.stats['newton_iterations'] = self.stats.get('newton_iterations', 0) + iterations
+                return
+
+        # the current ellipsoid cannot be used as initial point, or the method did not converge
+        self.inscribed_ellipsoid_cvxpy()
+
+        pass
+
+    def inscribed_ellipsoid_cvxpy(self):
+
         # Largest volume inner ellipsoid problem formulation:
         # max               log det(C)
         # subject to        ||C*ai|| + ai^T * d <= bi for all i
         #                   C >> 0
         # print("Computing inscribed ellipsoid...")
-        C = cp.Variable((SPACE_DIM, SPACE_DIM), symmetric=True)
-        d = cp.Variable(SPACE_DIM)
-        objective = cp.Maximize(cp.log_det(C))
-        constraints = [C >> 0]
+        if self.dim == 2:
+            # In 2D maximizing sqrt(det(C)) needs neither the semidefinite nor the exponential cone:
+            # C >> 0 and det(C) >= t^2  <=>  ||(2*c12, 2*t, c11 - c22)|| <= c11 + c22
+            c = cp.Variable(3)
+            t = cp.Variable()
+            C = cp.bmat([[c[0], c[1]], [c[1], c[2]]])
+            objective = cp.Maximize(t)
+            constraints = [cp.norm(cp.hstack([2*c[1], 2*t, c[0] - c[2]])) <= c[0] + c[2]]
+        else:
+            C = cp.Variable((self.dim, self.dim), symmetric=True)
+            objective = cp.Maximize(cp.log_det(C))
+            constraints = [C >> 0]
+        d = cp.Variable(self.dim)
         for ai, bi in zip(self.A, self.b):
             constraints += [cp.norm(C @ ai) + ai @ d <= bi]
         prob = cp.Problem(objective, constraints)
@@ -191,6 +420,9 @@ class FreeSpace:
 
     def closest_point_on_obstacle(self, obstacle: np.ndarray) -> np.ndarray:
 
+        if self.dim == 2:
+            return self.closest_point_on_polygon(obstacle)
+
         num_vertices = obstacle.shape[0] # number of vertices in the obstacle
         vertices_j = self.ellipsoid.C_inv @ (obstacle - self.ellipsoid.d).T  # transformed vertices in ball space
 
@@ -199,23 +431,54 @@ class FreeSpace:
         # subject to    G*x <= h, A*x = b, lb <= x <= ub
         # https://pypi.org/project/qpsolvers/
 
-        num_var = SPACE_DIM + num_vertices # number of optimization variables
+        num_var = self.dim + num_vertices # number of optimization variables
         P = P = np.zeros((num_var, num_var))
-        P[0:SPACE_DIM, 0:SPACE_DIM] = np.eye(SPACE_DIM)
+        P[0:self.dim, 0:self.dim] = np.eye(self.dim)
         P = sparse.csc_matrix(P) # for best performance, build the matrix as a sparse matrix
         q = np.zeros(num_var)
-        G = np.block([np.zeros((num_vertices, 3)), np.diag(np.full(num_vertices, -1))])
+        G = np.block([np.zeros((num_vertices, self.dim)), np.diag(np.full(num_vertices, -1))])
         G = sparse.csc_matrix(G)
         h = np.zeros(num_vertices)
         A = np.block([
-            [np.diag(np.full(SPACE_DIM, -1)),                   vertices_j],
-            [np.zeros((1, SPACE_DIM)),          np.ones((1, num_vertices))]
+            [np.diag(np.full(self.dim, -1)),                   vertices_j],
+            [np.zeros((1, self.dim)),          np.ones((1, num_vertices))]
         ])
         A = sparse.csc_matrix(A)
-        b = np.block([np.zeros(SPACE_DIM), 1])
+        b = np.block([np.zeros(self.dim), 1])
 
         x_opt = qpsolvers.solve_qp(P, q, G, h, A, b, solver="osqp") # solve the problem
-        x_opt = x_opt[0:SPACE_DIM] # select only the position of the closest point among the optimization variables
+        x_opt = x_opt[0:self.dim] # select only the position of the closest point among the optimization variables
+        x_closest = self.ellipsoid.C @ x_opt + self.ellipsoid.d # apply inverse transformation to ellipsoide space
+
+        return x_closest
+
+    def closest_point_on_polygon(self, obstacle: np.ndarray) -> np.ndarray:
+        """
+        Analytic version of closest_point_on_obstacle for 2D convex obstacles: in ball space the closest point of the
+        polygon to the origin lies on one of its edges, unless the origin is inside the polygon.
+        Args:
+            obstacle (np.ndarray): vertices of the convex polygon
+
+        Returns:
+            np.ndarray: closest point of the obstacle to the ellipsoid
+        """
+
+        vertices = (self.ellipsoid.C_inv @ (obstacle - self.ellipsoid.d).T).T # transformed vertices in ball space
+
+        # sort the vertices counterclockwise to obtain the edges of the polygon
+        centroid = np.mean(vertices, axis=0)
+        start = vertices[np.argsort(np.arctan2(vertices[:, 1] - centroid[1], vertices[:, 0] - centroid[0]))]
+        edge = np.roll(start, -1, axis=0) - start
+
+        # the origin is inside the polygon if it is on the left of every edge
+        if np.all(edge[:, 1] * start[:, 0] - edge[:, 0] * start[:, 1] >= 0):
+            x_opt = np.zeros(2)
+        else:
+            # projection of the origin on each edge
+            length = np.maximum(np.einsum('ij,ij->i', edge, edge), 1e-12)
+            t = np.clip(-np.einsum('ij,ij->i', start, edge) / length, 0, 1)
+            points = start + t[:, None] * edge
+            x_opt = points[np.argmin(np.einsum('ij,ij->i', points, points))]
         x_closest = self.ellipsoid.C @ x_opt + self.ellipsoid.d # apply inverse transformation to ellipsoide space
 
         return x_closest
@@ -262,4 +525,257 @@ class FreeSpace:
             ax.scatter(ell_points[0], ell_points[1], ell_points[2], color='blue')
 
         ax.scatter(p0[0], p0[1], p0[2], color='red')
-        plt.show()
\ No newline at end of file
+        plt.show()
+
+# Free space of a worker process of FreeSpacePool, built once on the shared vertices of the obstacles
+_worker_memory = None
+_worker_free_space = None
+
+
+def _init_worker(name: str, shape: tuple, offsets: np.ndarray, kwargs: dict):
+
+    global _worker_memory, _worker_free_space
+    _worker_memory = shared_memory.SharedMemory(name=name)
+    vertices = np.ndarray(shape, dtype=np.float64, buffer=_worker_memory.buf)
+    obstacles = [vertices[offsets[i]:offsets[i+1]] for i in range(len(offsets) - 1)]
+    _worker_free_space = FreeSpace(obstacles, **kwargs)
+    multiprocessing.util.Finalize(None, _close_worker, exitpriority=0) # run when the worker exits
+
+
+def _close_worker():
+
+    global _worker_memory, _worker_free_space
+    _worker_free_space = None # drop the views of the shared memory before closing it, the parent unlinks it
+    _worker_memory.close()
+    _worker_memory = None
+
+
+def _solve_worker(pos0: np.ndarray) -> tuple:
+
+    A, b = _worker_free_space.update_free_space(pos0)
+
+    return np.array(A), np.array(b), _worker_free_space.ellipsoid, _worker_free_space.stats
+
+
+class FreeSpacePool:
+    """
+    Pool of worker processes that compute the free space regions of many seeds in parallel. The vertices of the obstacles
+    are copied once into shared memory, so only the seeds and the resulting regions are sent between the processes.
+    """
+
+    def __init__(self, obstacles: list, processes: int = None, **kwargs) -> None:
+        """
+        Args:
+            obstacles (list): list of obstacles, each element of the list contains the vertices on the related obstacle,
+                or an ObstacleTable
+            processes (int, optional): number of worker processes. Defaults to the number of CPUs.
+            kwargs: keyword arguments of the FreeSpace of each worker, e.g. `cull` or `max_planes`
+        """
+
+        if isinstance(obstacles, ObstacleTable):
+            obstacles = obstacles.vertices()
+        self.offsets = np.concatenate(([0], np.cumsum([len(obs) for obs in obstacles]))).astype(int)
+        vertices = np.concatenate([np.asarray(obs, dtype=np.float64) for obs in obstacles])
+        self.memory = shared_memory.SharedMemory(create=True, size=vertices.nbytes)
+        np.ndarray(vertices.shape, dtype=np.float64, buffer=self.memory.buf)[:] = vertices
+        self.pool = multiprocessing.Pool(processes, initializer=_init_worker,
+                                         initargs=(self.memory.name, vertices.shape, self.offsets, kwargs))
+
+        pass
+
+    def update_free_space(self, seeds: list) -> list:
+        """
+        Compute the free space region around each seed.
+        Args:
+            seeds (list): initial positions of the center of the ellipsoids
+
+        Returns:
+            list: for each seed, in the same order, a tuple (A, b, ellipsoid, stats) with the hyperplanes {x | A*x <= b},
+                the inscribed ellipsoid and the statistics of the computation
+        """
+
+        return self.pool.map(_solve_worker, [np.asarray(seed, dtype=float) for seed in seeds], chunksize=1)
+
+    def close(self):
+        """
+        Stop the workers and release the shared memory.
+        """
+
+        self.pool.close()
+        self.pool.join()
+        self.memory.close()
+        self.memory.unlink()
+
+        pass
+
+    def __enter__(self) -> 'FreeSpacePool':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def max_volume_inscribed_ellipsoid(A: list, b: list, C0: np.ndarray, d0: np.ndarray) -> tuple:
+    """
+    Compute the maximum volume ellipsoid {C*y + d | ||y|| <= 1} inscribed in the polytope {x | A*x <= b} with a barrier
+    method. The problem is small (C symmetric and d, 9 variables in 3D), hence every Newton step is a handful of dense
+    NumPy operations instead of a call to a conic solver:
+    min         - t * log det(C) - sum_i log(b_i - a_i^T * d - ||C*a_i||)
+    with t increased until the duality gap m/t is below BARRIER_GAP, starting from the t that best fits the initial
+    ellipsoid (see initial_barrier_parameter), so that a start from a previous solution is a warm start.
+    Args:
+        A (list): normals of the hyperplanes
+        b (list): offsets of the hyperplanes
+        C0 (np.ndarray): matrix of the initial ellipsoid, it is shrunk until it is strictly inside the polytope
+        d0 (np.ndarray): center of the initial ellipsoid, it has to be strictly inside the polytope
+
+    Returns:
+        tuple: matrix C, center d and number of Newton steps, None if the initial ellipsoid is not usable or the method
+            does not converge
+    """
+
+    d = np.array(d0, dtype=float)
+    dim = d.size
+    A = np.reshape(np.asarray(A, dtype=float), (len(b), dim))
+    b = np.asarray(b, dtype=float)
+    m = len(b)
+    if m == 0 or np.any(b - A @ d <= 0):
+        return None
+
+    # basis of the symmetric matrices, C = sum_k c_k * E_k
+    rows, cols = np.triu_indices(dim)
+    E = np.zeros((rows.size, dim, dim))
+    E[np.arange(rows.size), rows, cols] = 1.
+    E[np.arange(rows.size), cols, rows] = 1.
+    M = np.einsum('kjl,il->ijk', E, A) # C*a_i = M_i*c
+    MtM = np.einsum('ijk,ijl->ikl', M, M)
+    n_c = rows.size
+
+    def barrier(c, d, t):
+        C = np.einsum('k,kij->ij', c, E)
+        try:
+            np.linalg.cholesky(C)
+        except np.linalg.LinAlgError:
+            return np.inf
+        s = b - A @ d - np.linalg.norm(M @ c, axis=1)
+        if np.any(s <= 0):
+            return np.inf
+        return -t * np.linalg.slogdet(C)[1] - np.sum(np.log(s))
+
+    # shrink the initial ellipsoid until it is strictly inside the polytope
+    c = np.asarray(C0, dtype=float)[rows, cols] * 0.99
+    for _ in range(30):
+        if np.isfinite(barrier(c, d, 1.)):
+            break
+        c = c / 2
+    else:
+        return None
+
+    t = None
+    iterations = 0
+    while t is None or m / t > BARRIER_GAP:
+        while True:
+            C_inv = np.linalg.inv(np.einsum('k,kij->ij', c, E))
+            v = M @ c
+            r = np.linalg.norm(v, axis=1)
+            s = b - A @ d - r
+            u = v / r[:, None]
+
+            # gradient and Hessian of the slacks s_i with respect to (c, d)
+            Mtu = np.einsum('ijk,ij->ik', M, u)
+            J = np.hstack((-Mtu, -A))
+            w = 1 / (s * r) # weights of the Hessians of the slacks, -(M_i^T*M_i - Mtu_i*Mtu_i^T) / r_i
+
+            # gradient and Hessian of log det(C) with respect to c
+            CE = np.einsum('ij,kjl->kil', C_inv, E)
+            g_logdet = np.einsum('kii->k', CE)
+            H_logdet = -np.einsum('kij,lji->kl', CE, CE)
+
+            grad = -J.T @ (1 / s)
+            if t is None:
+                t = initial_barrier_parameter(grad[:n_c], g_logdet, m)
+            grad[:n_c] -= t * g_logdet
+            hess = (J.T / s**2) @ J
+            hess[:n_c, :n_c] += np.tensordot(w, MtM, axes=1) - (Mtu.T * w) @ Mtu - t * H_logdet
+
+            try:
+                step = -np.linalg.solve(hess, grad)
+            except np.linalg.LinAlgError:
+                return None
+            decrement = -grad @ step
+            iterations += 1
+            if decrement / 2 <= NEWTON_TOLLERANCE:
+                break
+            if iterations > MAX_NEWTON_ITER:
+                return None
+
+            # backtracking line search, staying inside the domain of the barrier
+            value = barrier(c, d, t)
+            alpha = 1.
+            while barrier(c + alpha * step[:n_c], d + alpha * step[n_c:], t) > value - 0.25 * alpha * decrement:
+                alpha /= 2
+                if alpha < 1e-10:
+                    break
+            c = c + alpha * step[:n_c]
+            d = d + alpha * step[n_c:]
+        t *= BARRIER_MU
+
+    return np.einsum('k,kij->ij', c, E), d, iterations
+
+
+def initial_barrier_parameter(grad_barrier: np.ndarray, grad_logdet: np.ndarray, m: int) -> float:
+    """
+    Barrier parameter t for which the initial ellipsoid is the closest to the central path, i.e. the least squares
+    solution of grad_barrier - t * grad_logdet = 0 over the entries of C. A small ball far from the optimum gives t = 1,
+    the optimum of a previous call gives the t it was computed with, so a warm start skips the first centering steps.
+    The result is limited to the last barrier parameter of the continuation, which is always run.
+    """
+
+    t = (grad_barrier @ grad_logdet) / (grad_logdet @ grad_logdet)
+
+    return float(np.clip(t, 1., max(1., m / (BARRIER_GAP * BARRIER_MU))))
+
+
+def pad_hyperplanes(A: list, b: list, n_planes: int, pos: np.ndarray = None) -> tuple:
+    """
+    Normalize the hyperplanes {x | A*x <= b} to unit normals, so that the offsets are distances and a clearance can be
+    subtracted from them, and pad them to a fixed number of rows with neutral rows 0*x <= PAD_OFFSET. This allows to
+    pass regions with a varying number of hyperplanes as parameters of fixed size.
+    Args:
+        A (list): normals of the hyperplanes
+        b (list): offsets of the hyperplanes
+        n_planes (int): number of rows of the output
+        pos (np.ndarray, optional): position of the robot. If there are more than n_planes hyperplanes, the closest to
+            this position are kept. Defaults to None.
+
+    Returns:
+        tuple: normals and offsets with exactly n_planes rows
+    """
+
+    A = np.reshape(np.asarray(A, dtype=float), (len(b), -1))
+    b = np.asarray(b, dtype=float)
+    norm = np.linalg.norm(A, axis=1)
+    norm[norm == 0] = 1. # rows that are already neutral
+    A = A / norm[:, None]
+    b = b / norm
+
+    if len(b) > n_planes:
+        assert pos is not None, f"{len(b)} hyperplanes do not fit in {n_planes} rows, a position is needed to select them."
+        closest = np.argsort(b - A @ np.asarray(pos, dtype=float))[:n_planes]
+        A, b = A[closest], b[closest]
+
+    A_padded = np.zeros((n_planes, A.shape[1]))
+    b_padded = np.full(n_planes, PAD_OFFSET)
+    A_padded[:len(b)] = A
+    b_padded[:len(b)] = b
+
+    return A_padded, b_padded
+
+
+def update_free_space_batch(obstacles: list, seeds: list, processes: int = None, **kwargs) -> list:
+    """
+    Compute the free space regions of a list of seeds in parallel, see FreeSpacePool.update_free_space.
+    """
+
+    with FreeSpacePool(obstacles, processes, **kwargs) as pool:
+        return pool.update_free_space(seeds)
@@ -2,12 +2,15 @@ import gym
 import numpy as np
 from MotionPlanningEnv.urdfObstacle import UrdfObstacle
 from ObstacleConstraintGenerator import ObstacleConstraintsGenerator
+from obstacle_table import WALL, DOOR, FURNITURE, KNOB
 import os
+from collections import OrderedDict
 
 HEIGHT = 2.0 # TODO
 WIDTH = 0.1
 SCALE = 1.5
 HEIGHT_KNOB = 1.0
+DOOR_CACHE_SIZE = 32 # Number of door configurations kept by the DoorStateCache, 2^5 for the five doors of the house.
 
 DIMS = {
         'wall': {'width': 0.1, 'length': None, 'height': 1.5},
@@ -44,6 +47,7 @@ class House:
         self._furniture = []
         self._dims = DIMS                                                               # Store the values describing the dimensions describing the environment.
         self.Obstacles = ObstacleConstraintsGenerator(robot_dim=robot_dim, scale=scale) # Create obstacle generating object for MPC.
+        self.door_cache = DoorStateCache(self)                                          # Obstacle sets precomputed per door configuration.
 
         # Set scale to default during test mode
         # if test_mode:
@@ -207,8 +211,7 @@ class House:
             dim = np.array([self._dims['wall']['width'], np.linalg.norm(vec), self._dims['wall']['height']])    # Obtain the dimension of the wall.
             pos = [[avg[0], avg[1], theta]]                         # Describe the position of the wall with average position and angle.
             self._walls.append({'pos': pos, 'dim': dim})
-            self.Obstacles.walls.append({'x': pos[0][0], 'y': pos[0][1], 'theta': pos[0][2], 'width': dim[0], 'length': dim[1], 'height': dim[2]}) # Add new obstacle pos to list
-        self.Obstacles.walls = np.array(self.Obstacles.walls)
+            self.Obstacles.addObstacle(WALL, x=pos[0][0], y=pos[0][1], theta=pos[0][2], width=dim[0], length=dim[1], height=dim[2]) # Add new obstacle pos to the table
 
     def draw_walls(self):
         """
@@ -239,7 +242,7 @@ class House:
             'place_height': None,
         }
         self._furniture.append(furniture)
-        self.Obstacles.furnitures.append({'x': pos_x, 'y': pos_y, 'width': dim[0], 'length': dim[1], 'height': dim[2]})
+        self.Obstacles.addObstacle(FURNITURE, x=pos_x, y=pos_y, width=dim[0], length=dim[1], height=dim[2])
         # self.Obstacles[urdf].append(self._furniture[urdf]) # TODO
 
     def add_furniture_box(self, name, pos, dim, place_height=None):
@@ -258,7 +261,7 @@ class House:
         self._furniture.append(furniture)
         if place_height is None:
             place_height = 0.0
-        self.Obstacles.furnitures.append({'x': pos[0], 'y': pos[1], 'z': place_height, 'width': dim[0], 'length': dim[1], 'height': dim[2]})
+        self.Obstacles.addObstacle(FURNITURE, x=pos[0], y=pos[1], z=place_height, width=dim[0], length=dim[1], height=dim[2])
 
     def generate_furniture(self):
         """
@@ -583,19 +586,32 @@ class House:
         """
         # assert self._test_mode is False
 
-        self.Obstacles.doors = []
-        self.Obstacles.knobs = []
         for room in self._doors:
             self._doors[room].draw_door(is_open[room])
-            self.Obstacles.doors.append({'x': self._doors[room].pos_door[0][0], 'y': self._doors[room].pos_door[0][1], 
-                                        'theta': self._doors[room].pos_door[0][2], 'width': self._doors[room].dim_door[0], 
-                                        'length': self._doors[room].dim_door[1], 'height': self._doors[room].dim_door[2]})
-            self.Obstacles.knobs.append({'x': self._doors[room].pos_knob[0][0], 'y': self._doors[room].pos_knob[0][1], 
-                                        'theta': self._doors[room].pos_knob[0][2], 'width': self._doors[room].dim_knob[0], 
-                                        'length': self._doors[room].dim_knob[1], 'height': self._doors[room].dim_knob[2]})
-        # Append the door into list of Obstacles' `doors`.
-        self.Obstacles.doors = np.array(self.Obstacles.doors)
-        self.Obstacles.knobs = np.array(self.Obstacles.knobs)
+        # Doors that have been drawn open stay open.
+        self.set_door_obstacles(self.Obstacles, {room: self._doors[room].open != 0 for room in self._doors})
+
+    def set_door_obstacles(self, obstacles, is_open):
+        """
+        Write the poses of the doors and doorknobs for the given door states into the table of `obstacles`, an
+        ObstacleConstraintsGenerator. If the doors are already in the table, only the rows of the doors that moved are updated.
+        """
+        incremental = len(obstacles.doors) == len(self._doors)
+        if not incremental:
+            obstacles.removeObstacles(DOOR)
+            obstacles.removeObstacles(KNOB)
+        for i, room in enumerate(self._doors):
+            pos_door, pos_knob = self._doors[room].get_pose(is_open.get(room, False))
+            pos_door, pos_knob = pos_door[0], pos_knob[0]
+            if incremental:
+                obstacles.updateDoor(i, x=pos_door[0], y=pos_door[1], theta=pos_door[2])
+                obstacles.updateObstacle(KNOB, i, x=pos_knob[0], y=pos_knob[1], theta=pos_knob[2])
+                continue
+            # Append the door and its knob into the Obstacles' table.
+            obstacles.addObstacle(DOOR, x=pos_door[0], y=pos_door[1], theta=pos_door[2], width=self._doors[room].dim_door[0], 
+                                 length=self._doors[room].dim_door[1], height=self._doors[room].dim_door[2])
+            obstacles.addObstacle(KNOB, x=pos_knob[0], y=pos_knob[1], theta=pos_knob[2], width=self._doors[room].dim_knob[0], 
+                                 length=self._doors[room].dim_knob[1], height=self._doors[room].dim_knob[2])
 
     def get_room(self, x, y):
         """
@@ -656,6 +672,89 @@ class House:
         return lines, points, boxes
 
 
+class DoorStateCache:
+    """
+    This class memoizes the obstacle data that depend on which doors are open, keyed by the bitmask of the open doors
+    (bit i is set if the i-th door of `house._doors` is open), so that switching the door states is a dictionary lookup.
+    The data of a configuration are computed lazily on its own copy of the house obstacles, without drawing, and the
+    least recently used configurations are evicted.
+    All the configurations are dropped when walls or furniture change, as recorded by the version of the house obstacles.
+    """
+
+    OUTPUTS = ('obstacles', 'constraints', 'vertices', 'footprints', 'segments', 'occupancy')
+
+    def __init__(self, house, max_size=DOOR_CACHE_SIZE):
+        """
+        @param house    - pointer to the House object, its walls, furniture and doors have to be generated before querying.
+        @param max_size - maximum number of door configurations that are stored.
+        """
+        self._house = house
+        self.max_size = max_size
+        self._entries = OrderedDict()   # Bitmask -> dictionary of the computed outputs.
+        self._version = 0               # Version of the house obstacles the entries were computed with.
+        self.hits = 0
+        self.misses = 0
+
+    def mask(self, is_open):
+        """
+        Return the bitmask of the dictionary `is_open` of door states; rooms missing from `is_open` are closed.
+        """
+        return sum(1 << i for i, room in enumerate(self._house._doors) if is_open.get(room, False))
+
+    def get(self, is_open, output):
+        """
+        Return one of the outputs in `OUTPUTS` for the door states `is_open`, computing it if it is not cached yet:
+         - 'obstacles'      - ObstacleConstraintsGenerator of the configuration, e.g. for nearestSurfaces; it must not be modified.
+         - 'constraints'    - (offsets, normals) of the surfaces, as ObstacleConstraintsGenerator.generateConstraintsCylinder.
+         - 'vertices'       - vertices of the obstacles closed by floor and ceiling, as ObstacleConstraintsGenerator.getVertices.
+         - 'footprints'     - footprints on the floor of the obstacles, as ObstacleConstraintsGenerator.getVertices2D.
+         - 'segments'       - line segments of walls, doors and furniture for the planner, as ObstacleTable.segments.
+         - 'occupancy'      - occupancy grid of the footprints on the floor over the corners of the house.
+        """
+        assert output in self.OUTPUTS, f"Unknown output {output}, expected one of {self.OUTPUTS}."
+        changes = self._house.Obstacles.changedSince(self._version)
+        if any(category in (WALL, FURNITURE) for category, _ in changes):
+            self.clear()
+        self._version = self._house.Obstacles.version
+
+        mask = self.mask(is_open)
+        entry = self._entries.get(mask)
+        if entry is None:
+            entry = self._entries[mask] = {}
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        self._entries.move_to_end(mask)
+
+        if output in entry:
+            self.hits += 1
+            return entry[output]
+        self.misses += 1
+
+        if 'obstacles' not in entry:
+            entry['obstacles'] = self._house.Obstacles.copy()
+            self._house.set_door_obstacles(entry['obstacles'], is_open)
+        obstacles = entry['obstacles']
+        if output == 'constraints':
+            entry[output] = obstacles.generateConstraintsCylinder()
+        elif output == 'vertices':
+            entry[output] = obstacles.getVertices()
+        elif output == 'footprints':
+            entry[output] = obstacles.getVertices2D()
+        elif output == 'segments':
+            entry[output] = obstacles.table.segments(doors=True)
+        elif output == 'occupancy':
+            entry[output] = obstacles.occupancyGrid(*self._house._corners)
+        return entry[output]
+
+    def clear(self):
+        """
+        Remove all the stored configurations.
+        """
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
 class Door:
     """
     This class contains the useful information describing a door. It also contains the goal object `Knob`
@@ -691,17 +790,7 @@ class Door:
         # If the door is open, an additive angle is added to rotate the door by additional 90 deg.
         if is_open:
             self.open = DIMS['door']['offset']*np.pi
-
-        offset_x = DIMS['door']['offset']*self.scale*np.cos(self.theta+self.open*self.flipped)*self.flipped
-        offset_y = DIMS['door']['offset']*self.scale*np.sin(self.theta+self.open*self.flipped)*self.flipped
-
-        # Poses of 2D offset away from the center of the door to draw the doorknob. This is due to `env` drawing the shapes centered.
-        offset_x_knob = DIMS['knob']['offset']*self.scale*np.cos(self.theta+self.open*self.flipped)*self.flipped
-        offset_y_knob = DIMS['knob']['offset']*self.scale*np.sin(self.theta+self.open*self.flipped)*self.flipped
-        
-        # Absolute 2D poses describing the centered positions of the door and the doorknob, respectively.
-        self.pos_door = [[self.pos[0]+offset_x, self.pos[1]+offset_y, self.theta+self.open*self.flipped]]
-        self.pos_knob = [[self.pos[0]+offset_x+offset_x_knob, self.pos[1]+offset_y+offset_y_knob, self.theta+self.open*self.flipped]]
+        self.pos_door, self.pos_knob = self.get_pose(self.open != 0)
 
         # Draw the door and doorknob.
         self.env.add_shapes(shape_type="GEOM_BOX", dim=self.dim_door, mass=0, poses_2d=self.pos_door)
@@ -718,6 +807,24 @@ class Door:
             knob.draw_knob()
             self.knobs.append(knob)
 
+    def get_pose(self, is_open):
+        """
+        Return the centered 2D poses [[x, y, theta]] of the door and of the doorknob when the door is open or closed,
+        without drawing them.
+        """
+        angle = DIMS['door']['offset']*np.pi if is_open else 0.0 # Additive angle of the open door.
+        offset_x = DIMS['door']['offset']*self.scale*np.cos(self.theta+angle*self.flipped)*self.flipped
+        offset_y = DIMS['door']['offset']*self.scale*np.sin(self.theta+angle*self.flipped)*self.flipped
+
+        # Poses of 2D offset away from the center of the door to draw the doorknob. This is due to `env` drawing the shapes centered.
+        offset_x_knob = DIMS['knob']['offset']*self.scale*np.cos(self.theta+angle*self.flipped)*self.flipped
+        offset_y_knob = DIMS['knob']['offset']*self.scale*np.sin(self.theta+angle*self.flipped)*self.flipped
+
+        # Absolute 2D poses describing the centered positions of the door and the doorknob, respectively.
+        pos_door = [[self.pos[0]+offset_x, self.pos[1]+offset_y, self.theta+angle*self.flipped]]
+        pos_knob = [[self.pos[0]+offset_x+offset_x_knob, self.pos[1]+offset_y+offset_y_knob, self.theta+angle*self.flipped]]
+        return pos_door, pos_knob
+
     def get_line(self):
         """
         Return the line coordinates describing the door on XY-plane.
@@ -0,0 +1,112 @@
+"""
+    Constraints of the MPC controllers written as a few block constraints over the whole state and input trajectories,
+    instead of one constraint per step of the horizon and per hyperplane. The problems are built faster and the Jacobian
+    of the constraints is assembled from a handful of structured blocks. The condensed formulation, where the states are
+    not variables but a function of the initial state and of the inputs, is also built here.
+"""
+
+from casadi import *
+import numpy as np
+
+CONDENSING_METHODS = ('dense', 'sparse')
+DENSE_CONDENSING_HORIZON = 20 # longest horizon condensed with the dense prediction matrix when the method is not given
+
+
+def add_box_limits(opti: Opti, var: MX, lower: np.ndarray, upper: np.ndarray):
+    """
+    Bound every column of a trajectory, lower <= var[:, k] <= upper.
+    Args:
+        opti (Opti): optimization problem
+        var (MX): trajectory, one column per step
+        lower (np.ndarray): lower limits, one per row of var
+        upper (np.ndarray): upper limits, one per row of var
+    """
+
+    n_steps = var.shape[1]
+    lower = np.repeat(np.reshape(lower, (-1, 1)), n_steps, axis=1)
+    upper = np.repeat(np.reshape(upper, (-1, 1)), n_steps, axis=1)
+    opti.subject_to(opti.bounded(vec(lower), vec(var), vec(upper)))
+
+    pass
+
+
+def add_integrator_dynamics(opti: Opti, x: MX, u: MX, dt: float):
+    """
+    Impose the single integrator model x[:, k+1] = x[:, k] + dt * u[:, k] over the whole horizon.
+    Args:
+        opti (Opti): optimization problem
+        x (MX): states, shape (n_dofs, N + 1)
+        u (MX): inputs, shape (n_dofs, N)
+        dt (float): time step
+    """
+
+    opti.subject_to(vec(x[:, 1:]) == vec(x[:, :-1] + dt * u))
+
+    pass
+
+
+def add_hyperplane_constraints(opti: Opti, A: MX, b: MX, P: MX, clearance: float, relaxation: MX = None):
+    """
+    Keep the points P[:, k] inside the hyperplanes A*p <= b - clearance at every step, optionally relaxed by
+    relaxation[:, k] (one entry per hyperplane and step).
+    Args:
+        opti (Opti): optimization problem
+        A (MX): normals of the hyperplanes, shape (n_planes, dim)
+        b (MX): offsets of the hyperplanes, shape (n_planes, 1)
+        P (MX): points, shape (dim, n_steps)
+        clearance (float): distance kept from the hyperplanes if the normals are unit vectors
+        relaxation (MX, optional): added to the right hand side, shape (n_planes, n_steps). Defaults to None.
+    """
+
+    rhs = repmat(b - clearance, 1, P.shape[1])
+    if relaxation is not None:
+        rhs = rhs + relaxation
+    opti.subject_to(vec(A @ P) <= vec(rhs))
+
+    pass
+
+
+def prediction_matrix(N: int, dt: float) -> np.ndarray:
+    """
+    Matrix T of the single integrator such that x = state0 * 1' + u @ T, i.e. T[j, k] = dt for every input j applied
+    before the step k.
+    Args:
+        N (int): horizon
+        dt (float): time step
+
+    Returns:
+        np.ndarray: prediction matrix, shape (N, N + 1)
+    """
+
+    return dt * np.triu(np.ones((N, N + 1)), k=1)
+
+
+def condensed_states(state0: MX, u: MX, dt: float, method: str = None) -> MX:
+    """
+    Express the states of the single integrator over the horizon as a function of the initial state and of the inputs,
+    so that they do not have to be decision variables. The dense method multiplies the inputs by the precomputed
+    prediction matrix, the sparse one accumulates them step by step, which gives an expression graph linear in the
+    horizon instead of quadratic.
+    Args:
+        state0 (MX): initial state, shape (n_dofs, 1)
+        u (MX): inputs, shape (n_dofs, N)
+        dt (float): time step
+        method (str, optional): 'dense' or 'sparse'. Defaults to None, in which case horizons up to
+            DENSE_CONDENSING_HORIZON are condensed densely.
+
+    Returns:
+        MX: states, shape (n_dofs, N + 1)
+    """
+
+    N = u.shape[1]
+    if method is None:
+        method = 'dense' if N <= DENSE_CONDENSING_HORIZON else 'sparse'
+    assert method in CONDENSING_METHODS, f"Unknown condensing method {method}, expected one of {CONDENSING_METHODS}."
+
+    if method == 'dense':
+        return repmat(state0, 1, N + 1) + u @ DM(prediction_matrix(N, dt))
+    states = [state0]
+    for k in range(N):
+        states.append(states[-1] + dt * u[:, k])
+
+    return hcat(states)
@@ -1,6 +1,14 @@
+import time
 from casadi import *
 import numpy as np
 from model import Model
+from free_space import pad_hyperplanes
+from mpc_constraints import add_box_limits, add_integrator_dynamics, add_hyperplane_constraints, condensed_states
+from warm_start import WarmStart, WARM_START_OPTIONS
+from compiled_solver import CompiledSolver
+from rti import RTISolver
+from solve_statistics import SolveStatistics
+from solution_cache import SolutionCache, active_set
 
 # Default value for the cost function multipliers: these values are the same of the Max Spahn, 2021 paper
 weight_tracking_default_base = 5.0
@@ -25,7 +33,8 @@ a3 = 0.0825
 a4 = 0.0825
 a6 = 0.088
 
-# Sphere constraint clearance
+# Sphere constraint clearance, in meters: the normals of the surfaces and of the hyperplanes normalized by
+# pad_hyperplanes are unit vectors. CLEARANCE1 covers the base of radius 0.2 with a margin of 0.1.
 CLEARANCE1 = 0.3
 CLEARANCE2 = 0.3
 
@@ -33,6 +42,13 @@ CLEARANCE2 = 0.3
 DT = 1
 STEPS = 5
 M = 1e6
+OBSTACLE_MODES = ('big_m', 'linear', 'sdf')
+SOLVERS = ('ipopt', 'osqp') # osqp solves the problem as a QP, only in 'linear' mode
+OSQP_OPTIONS = {"verbose": False,
+                "eps_abs": 1e-4,
+                "eps_rel": 1e-4,
+                "max_iter": 4000, # bounds the solve time
+                "polish": False} # polishing prints a message at every solve
 
 
 class MPController:
@@ -50,13 +66,16 @@ class MPController:
     weight_terminal_base: float = weight_terminal_default_base,
     weight_terminal_theta: float = weight_terminal_default_theta,
     weight_terminal_arm: float = weight_terminal_default_arm,
-    dt: float = DT, N: int = STEPS):
+    dt: float = DT, N: int = STEPS, obstacle_mode: str = 'big_m', sdf: Function = None,
+    warm_start: bool = True, compiled: bool = False, solver: str = 'ipopt', condensed: bool = False,
+    condensing: str = None, rti: bool = False, solution_cache: bool = False):
         """
         Constructor of the class.
 
         Args:
             model (Model): gym model of the mobile manipulator
-            surface_dim: number of surfaces in the environment
+            surface_dim: shape of the normals of the obstacle constraints, (number of surfaces in the environment, 2),
+                not used in 'sdf' mode
             weight_tracking_base (float, optional): _description_. Defaults to weight_tracking_default_base.
             weight_tracking_theta (float, optional): _description_. Defaults to weight_tracking_default_theta.
             weight_tracking_arm (float, optional): _description_. Defaults to weight_tracking_default_arm.
@@ -68,7 +87,36 @@ class MPController:
             weight_terminal_arm (float, optional): _description_. Defaults to weight_terminal_default_arm.
             dt (float, optional): _description_. Defaults to 0.01.
             N (int, optional): _description_. Defaults to 5.
+            obstacle_mode (str, optional): 'big_m' relaxes the surface constraints with the activation variables,
+                'linear' imposes all the constraints, e.g. the hyperplanes of a 2D FreeSpace, 'sdf' keeps the base at a
+                clearance from the obstacles given by the signed distance field. Defaults to 'big_m'.
+            sdf (Function, optional): signed distance field of the obstacles as a function of the position of the base,
+                e.g. ObstacleConstraintsGenerator.sdfInterpolant, required in 'sdf' mode. Defaults to None.
+            warm_start (bool, optional): start every solve from the shifted previous solution and multipliers.
+                Defaults to True.
+            compiled (bool, optional): solve with the problem compiled to C and cached on disk, see CompiledSolver.
+                Defaults to False.
+            solver (str, optional): 'ipopt' solves the general NLP, 'osqp' the QP of the 'linear' mode, whose dynamics,
+                limits and obstacle constraints are linear and whose cost is quadratic. Defaults to 'ipopt'.
+            condensed (bool, optional): eliminate the states from the decision variables, they are computed from the
+                initial state and the inputs. Defaults to False.
+            condensing (str, optional): 'dense' or 'sparse' condensing, see condensed_states. Defaults to None, in which
+                case it is chosen from the horizon.
+            rti (bool, optional): real-time iteration, every step after the first one takes a single SQP iteration
+                from the shifted previous solution, see RTISolver and prepare. Requires the warm start.
+                Defaults to False.
+            solution_cache (bool, optional): keep the converged solutions in a SolutionCache and start the first solve
+                and the solves after a change of the goal from the nearest cached one. Requires the warm start.
+                Defaults to False.
         """
+        assert obstacle_mode in OBSTACLE_MODES, f"Unknown obstacle mode {obstacle_mode}, expected one of {OBSTACLE_MODES}."
+        assert obstacle_mode != 'sdf' or sdf is not None, f"The 'sdf' obstacle mode requires a signed distance field."
+        assert solver in SOLVERS, f"Unknown solver {solver}, expected one of {SOLVERS}."
+        assert solver == 'ipopt' or obstacle_mode == 'linear', f"The {solver} solver requires the 'linear' obstacle mode."
+        assert solver == 'ipopt' or not compiled, f"Only the 'ipopt' solver can be compiled."
+        assert solver == 'ipopt' or not rti, f"The RTI mode linearizes the problem of the 'ipopt' solver."
+        assert warm_start or not rti, f"The RTI mode requires the warm start."
+        assert warm_start or not solution_cache, f"The solution cache requires the warm start."
 
         self.model = model # Model of the robot
         self.dofs = self.model._dofs # Number of dof of the robot
@@ -97,6 +145,15 @@ class MPController:
         self.lower_limit_input = self.model.get_observation_space()['joint_state']['velocity'].low[self.dofs]
         self.upper_limit_input = self.model.get_observation_space()['joint_state']['velocity'].high[self.dofs]
         self.surface_dim = surface_dim
+        self.obstacle_mode = obstacle_mode
+        self.sdf = sdf
+        self.use_warm_start = warm_start
+        self.compiled = compiled
+        self.solver = solver
+        self.condensed = condensed
+        self.condensing = condensing
+        self.rti = rti
+        self.use_solution_cache = solution_cache
         self.FHOCP()
 
     def FHOCP(self):
@@ -105,14 +162,19 @@ class MPController:
             optimization varibles (future states and inputs), defines the cost function, and adds the control constraints.
         """
 
-        self.opti = Opti()
+        self.opti = Opti('conic') if self.solver == 'osqp' else Opti()
         self.state0 = self.opti.parameter(len(self.dofs), 1) # Parameters for initial state
         self.goal = self.opti.parameter(len(self.dofs), 1) # Parameters for the goal state
-        self.x = self.opti.variable(len(self.dofs), self.N + 1) # Optimization varibles (states) over an horizon N
         self.u = self.opti.variable(len(self.dofs), self.N) # Optimization variables (inputs) over an horizon N
-        self.A = self.opti.parameter(self.surface_dim[0], self.surface_dim[1])
-        self.b = self.opti.parameter(self.surface_dim[0])
-        self.act = self.opti.variable(self.surface_dim[0], self.N+1)
+        if self.condensed: # States as a function of the initial state and of the inputs
+            self.x = condensed_states(self.state0, self.u, self.dt, self.condensing)
+        else:
+            self.x = self.opti.variable(len(self.dofs), self.N + 1) # Optimization varibles (states) over an horizon N
+        if self.obstacle_mode != 'sdf':
+            self.A = self.opti.parameter(self.surface_dim[0], self.surface_dim[1])
+            self.b = self.opti.parameter(self.surface_dim[0])
+        if self.obstacle_mode == 'big_m':
+            self.act = self.opti.variable(self.surface_dim[0], self.N+1)
         self.cost = 0. # Initialization of the cost function
         self.add_objective_function()
         self.opti.minimize(self.cost)
@@ -131,17 +193,101 @@ class MPController:
 				  "acceptable_obj_change_tol": 1e20,
 				  "diverging_iterates_tol": 1e20,
                   "nlp_scaling_method": "none"}
-        self.opti.solver('ipopt', p_opts, s_opts) # Set solver 'ipopt'
+        if self.solver == 'osqp':
+            p_opts = dict(print_time=False, warm_start_primal=self.use_warm_start, warm_start_dual=self.use_warm_start)
+            self.opti.solver('osqp', p_opts, OSQP_OPTIONS) # Set the QP solver 'osqp'
+            ipopt_options = None
+        else:
+            ipopt_options = (p_opts, s_opts) # Solver 'ipopt' set by WarmStart, with its options only on the warm solves
+        self.warm_start = WarmStart(self.opti, self.x, self.u, self.use_warm_start, ipopt_options)
+        self.compiled_solver = None
+        if self.compiled:
+            key = dict(N=self.N, dt=self.dt, dofs=self.dofs, surface_dim=self.surface_dim, obstacle_mode=self.obstacle_mode,
+                       condensed=self.condensed, condensing=self.condensing,
+                       weights=[self.weight_tracking.tolist(), self.weight_input.tolist(), self.weight_terminal.tolist()])
+            self.compiled_solver = CompiledSolver(self.opti, 'nav_mpc', key, p_opts, s_opts, WARM_START_OPTIONS)
+        self.rti_solver = RTISolver(self.opti, [self.state0, self.goal]) if self.rti else None
+        self.statistics = SolveStatistics() # Wall time, iterations, status, etc. of every solve
+        self.solution_cache = SolutionCache() if self.use_solution_cache else None
+        self.last_goal = None # Goal of the previous solve
+        self.active = None # Active set of the last cached solution
+        self.inequality = None # Mask of the inequality constraints
+
+    def prepare(self):
+        """
+            Preparation phase of the RTI mode: set the shifted previous solution as initial guess and linearize the
+            problem around it, so that the next solve_MPC only has to solve one QP. It is meant to be called between two
+            control steps, e.g. right after applying the action; solve_MPC prepares itself if it was not called.
+        """
+        if self.rti_solver is not None and self.warm_start.apply():
+            self.rti_solver.prepare()
+
+    def initial_guess(self, state0: np.ndarray, goal: np.ndarray) -> bool:
+        """
+            Set the initial guess of the solve: the linearization point of the RTI mode if it is prepared, otherwise the
+            shifted previous solution, replaced by the nearest cached solution at the first solve and when the goal
+            changes. Returns whether a guess was set.
+        """
+        if self.rti_solver is not None and self.rti_solver.prepared:
+            return True
+        warm = self.warm_start.apply()
+        if self.solution_cache is None or warm and np.array_equal(goal, self.last_goal):
+            return warm
+        cached = self.solution_cache.lookup(state0, goal, self.active)
+        if cached is not None:
+            self.warm_start.load(*cached)
+        return warm or cached is not None
+
+    def cache_solution(self, state0: np.ndarray, goal: np.ndarray):
+        """
+            Store the solution just passed to the warm start in the solution cache, with its active set.
+        """
+        if self.inequality is None:
+            self.inequality = np.atleast_1d(self.opti.value(self.opti.lbg) != self.opti.value(self.opti.ubg))
+        self.active = active_set(self.warm_start.lam_g, self.inequality)
+        self.solution_cache.store(state0, goal, self.warm_start.prev_solution_x, self.warm_start.prev_solution_u,
+                                  self.warm_start.lam_g, self.active)
 
     def solve_MPC(self, goal: np.ndarray) -> np.ndarray:
         """
-            Updates the goal and solves the optimization problem, returns the next action.
+            Updates the goal and solves the optimization problem, returns the next action. If the solver fails, the
+            failure is recorded in the statistics and the fallback action is returned instead, see fallback_action.
         """
         self.opti.set_value(self.goal, goal) # Set the goal state parameters
-        solution = self.opti.solve()
-        self.final_cost += self.opti.value(self.cost)
+        state0 = self.opti.value(self.state0) if self.solution_cache is not None else None
+        warm = self.initial_guess(state0, goal)
+        rti_step = self.rti_solver is not None and warm # The first step is solved to convergence
+        start = time.perf_counter()
+        try:
+            if rti_step:
+                solution = self.rti_solver.feedback()
+            elif self.compiled_solver is not None:
+                solution = self.compiled_solver.solve(warm)
+            else:
+                solution = self.opti.solve()
+        except RuntimeError as error:
+            self.statistics.record_failure(error, time.perf_counter() - start, warm)
+            return self.fallback_action()
+        wall_time = time.perf_counter() - start
+        self.warm_start.update(solution, warm)
+        if self.solution_cache is not None and not rti_step: # Only converged solutions
+            self.cache_solution(state0, goal)
+        self.last_goal = np.array(goal)
+        cost = solution.value(self.cost)
+        self.statistics.record(solution.stats(), wall_time, warm, cost)
+        self.final_cost += cost
         return solution.value(self.u[:, 0])
 
+    def fallback_action(self) -> np.ndarray:
+        """
+            Action applied when a solve fails: the input of the last successful solution for the current step, i.e. its
+            inputs shifted by one step at every failed solve since then, or no motion if nothing was solved yet.
+        """
+        if self.warm_start.prev_solution_u is None:
+            return np.zeros(self.u.shape[0])
+        self.warm_start.advance()
+        return self.warm_start.prev_solution_u[:, 0]
+
     def add_objective_function(self):
         """
             Methods to build the objective function, made of three terms
@@ -163,23 +309,18 @@ class MPController:
             - robot model kinematics/dynamics
         """
 
-        # Limit constraints
-        self.opti.subject_to(self.x[:, 0] == self.state0) # Initial state constraint
-        for k in range(1, self.N): # Iterate over all the steps of the prediction horizon
-            self.opti.subject_to(self.lower_limit_state <= self.x[:, k])
-            self.opti.subject_to(self.x[:, k] <= self.upper_limit_state)
-            self.opti.subject_to(self.lower_limit_input <= self.u[:, k])
-            self.opti.subject_to(self.u[:, k] <= self.upper_limit_input)
-
-        self.opti.subject_to(self.lower_limit_state <= self.x[:, self.N])
-        self.opti.subject_to(self.x[:, self.N] <= self.upper_limit_state)
+        # Limit constraints, the first input is not bounded
+        add_box_limits(self.opti, self.x[:, 1:], self.lower_limit_state, self.upper_limit_state)
+        add_box_limits(self.opti, self.u[:, 1:], self.lower_limit_input, self.upper_limit_input)
+        if self.condensed: # The initial state and the dynamics are satisfied by construction
+            return
 
         # Robot model constraints
-        for k in range(self.N):
-            self.opti.subject_to(self.x[:, k+1] == self.x[:, k] + self.dt * self.u[:, k])
+        self.opti.subject_to(self.x[:, 0] == self.state0) # Initial state constraint
+        add_integrator_dynamics(self.opti, self.x, self.u, self.dt)
 
 
-    def add_obstacle_avoidance_constraints(self, A, b):
+    def add_obstacle_avoidance_constraints(self, A=None, b=None, pos: np.ndarray = None):
         """
             Adds the obstacle avoidance constraints formulated as
                 n dot p <= n dot q + M * b
@@ -195,12 +336,40 @@ class MPController:
                        the constraint is active because the M is removed.
 
                 Only at most 3 constraints should be active at once, so as to not block the robot in a box.
+
+            In 'linear' mode all the constraints n dot p <= n dot q are imposed, the rows of A and b are padded with neutral
+            rows up to the size given in the constructor, see set_obstacle_constraints.
+
+            In 'sdf' mode A and b are not used, the predicted positions have to satisfy sdf(p) >= CLEARANCE1.
+
+            In the 'linear' and 'sdf' modes the initial state is fixed, so the constraints start from the first predicted
+            step: a base starting closer than CLEARANCE1 to an obstacle has to move away instead of making the problem
+            infeasible.
+
+            These are the last constraints of the problem, so the compiled solver is built here.
         """
-        for k in range(self.N + 1):
-            p1 = self.x[:2, k]
-            self.opti.subject_to(self.A@p1 <= (self.b - CLEARANCE1 + M * self.act[:, k]))
-            self.opti.subject_to(self.opti.bounded(0, self.act[:, k], 1))
-            self.opti.subject_to(sum1(1-self.act[:, k]) <= 3)
+        if self.obstacle_mode == 'sdf':
+            self.opti.subject_to(vec(self.sdf.map(self.N)(self.x[:2, 1:])) >= CLEARANCE1)
+        elif self.obstacle_mode == 'linear':
+            add_hyperplane_constraints(self.opti, self.A, self.b, self.x[:2, 1:], CLEARANCE1)
+        else:
+            add_hyperplane_constraints(self.opti, self.A, self.b, self.x[:2, :], CLEARANCE1, M * self.act)
+            self.opti.subject_to(self.opti.bounded(0, vec(self.act), 1))
+            self.opti.subject_to(vec(sum1(1 - self.act)) <= 3)
+
+        self.set_obstacle_constraints(A, b, pos)
+        if self.compiled_solver is not None: # Generate and compile the complete problem before the first step
+            self.compiled_solver.build()
 
+    def set_obstacle_constraints(self, A, b, pos: np.ndarray = None):
+        """
+            Update the normals and offsets of the obstacle avoidance constraints. In 'linear' mode the hyperplanes are
+            normalized and padded to the size of the parameters, keeping the ones closest to `pos` if there are too many.
+            The signed distance field of the 'sdf' mode does not depend on parameters, so nothing is updated.
+        """
+        if self.obstacle_mode == 'sdf':
+            return
+        if self.obstacle_mode == 'linear':
+            A, b = pad_hyperplanes(A, b, self.surface_dim[0], pos)
         self.opti.set_value(self.A, A)
         self.opti.set_value(self.b, b)
\ No newline at end of file
@@ -7,6 +7,8 @@ from house import House
 from planner import Planner
 import warnings
 from nav_MPC import MPController
+from free_space import FreeSpace
+from controller_runner import ControllerRunner
 import time
 
 TEST_MODE = False # Boolean to initialize test mode to test the MPC in test mode, take care that valid start and end positions are set
@@ -16,6 +18,16 @@ NUM_RUNS = 5 # NUmber of simulations to run
 STEP_SIZE = 10 # How often to compute new actions
 R_SCALE = 1.0 #how much to scale the robot's dimensions for collision check
 TOL = 2e-1 # Tolerance of reaching the waypoints
+FREE_SPACE = False # Avoid obstacles with the 2D convex free space around the base instead of the surface normals
+MAX_PLANES = 20 # Number of hyperplanes passed to the MPC when FREE_SPACE is True
+NEAREST_SURFACES = None # Number of surfaces nearest to the base passed to the MPC, None to pass all the surfaces with big-M constraints
+SOLVER = 'ipopt' # 'osqp' solves the MPC as a QP when FREE_SPACE is True or NEAREST_SURFACES is set
+CONDENSED = False # Eliminate the states from the variables of the MPC
+STATISTICS_FILE = None # JSON file where the statistics of the MPC solves are written, e.g. 'mpc_statistics.json'
+SOLUTION_CACHE = False # Start the MPC from the nearest cached solution after every waypoint switch
+RTI = False # Take a single SQP iteration per MPC step after the first one, instead of solving it to convergence
+ASYNC_MPC = False # Solve the MPC in a background thread on the latest state while the simulation keeps stepping
+SDF = False # Keep the base at a clearance from the obstacles with a signed distance field instead of the surface normals
 
 #Dimension of robot base, found in mobilePandaWithGripper.urdf
 R_RADIUS = 0.2
@@ -69,10 +81,25 @@ def main():
         house.draw_furniture()
         if not TEST_MODE:
             house.draw_doors(is_open)
+        obstacles = house.door_cache.get(is_open, 'obstacles') # Obstacles of the door configuration, computed once per configuration
 
         # Initialize MPC controller
-        b, A = house.Obstacles.generateConstraintsCylinder() # Compute the normals and offsets of the walls
-        MPC = MPController(robots[0], A.shape)
+        if SDF:
+            sdf = obstacles.sdfInterpolant(*house._corners) # Signed distance to the footprints on the floor
+            MPC = MPController(robots[0], None, obstacle_mode='sdf', sdf=sdf, condensed=CONDENSED, rti=RTI,
+                                solution_cache=SOLUTION_CACHE)
+            A, b = None, None
+        elif FREE_SPACE:
+            C_free = FreeSpace(house.door_cache.get(is_open, 'footprints')) # Footprints of the obstacles on the floor
+            MPC = MPController(robots[0], (MAX_PLANES, 2), obstacle_mode='linear', solver=SOLVER, condensed=CONDENSED,
+                                rti=RTI, solution_cache=SOLUTION_CACHE)
+        elif NEAREST_SURFACES is not None:
+            house.door_cache.get(is_open, 'constraints') # Compute the surfaces and their spatial index
+            MPC = MPController(robots[0], (NEAREST_SURFACES, 2), obstacle_mode='linear', solver=SOLVER,
+                                condensed=CONDENSED, rti=RTI, solution_cache=SOLUTION_CACHE)
+        else:
+            b, A = house.door_cache.get(is_open, 'constraints') # Compute the normals and offsets of the walls
+            MPC = MPController(robots[0], A.shape, condensed=CONDENSED, rti=RTI, solution_cache=SOLUTION_CACHE)
         action = np.zeros(env.n())
 
         # Combine the routes
@@ -93,10 +120,33 @@ def main():
         p0 = [state0[0], state0[1], 0.4]
 
         # Set initial MPC variables and constraint parameters
-        MPC.opti.set_initial(MPC.x[:, 0], state0)
-        MPC.add_obstacle_avoidance_constraints(A, b)
+        if not CONDENSED:
+            MPC.opti.set_initial(MPC.x[:, 0], state0)
+        if SDF:
+            pass
+        elif FREE_SPACE:
+            A, b = C_free.update_free_space(state0[:2])
+        elif NEAREST_SURFACES is not None:
+            A, b = obstacles.nearestSurfaces(state0[:2], NEAREST_SURFACES)
+        MPC.add_obstacle_avoidance_constraints(A, b, state0[:2])
         MPC.opti.set_value(MPC.state0, state0)
 
+        def solve(state0, goal):
+            MPC.opti.set_value(MPC.state0, state0)
+            if SDF: # The signed distance field does not change
+                pass
+            elif FREE_SPACE: # Update the convex region around the base
+                A, b = C_free.update_free_space(state0[:2])
+                MPC.set_obstacle_constraints(A, b, state0[:2])
+            elif NEAREST_SURFACES is not None: # Update the surfaces around the base
+                A, b = obstacles.nearestSurfaces(state0[:2], NEAREST_SURFACES)
+                MPC.set_obstacle_constraints(A, b, state0[:2])
+
+            # Compute the next action
+            return MPC.solve_MPC(goal)
+
+        runner = ControllerRunner(solve, n_dofs=len(robots[0]._dofs)).start() if ASYNC_MPC else None
+
         t = 0
         start_time = time.time()
         for waypoint in route:
@@ -105,17 +155,18 @@ def main():
             while (1):
                 ob, _, _, _ = env.step(action)
                 state0 = ob['robot_0']['joint_state']['position'][robots[0]._dofs]
-                MPC.opti.set_value(MPC.state0, state0)
                 p0 = [state0[0], state0[1], 0.4]
                 
                 if (np.allclose(p0, waypoint, rtol=TOL, atol=TOL)):
                     print("Point reached")
-                    MPC.opti.set_value(MPC.state0, state0)
                     break
 
-                if (t%STEP_SIZE == 0):
-                    # Compute the next action
-                    actionMPC = MPC.solve_MPC(goal)
+                if runner is not None: # The solver thread works on the latest state, use the latest action
+                    runner.submit(state0, goal, t)
+                    actionMPC = runner.action(t)
+                elif (t%STEP_SIZE == 0):
+                    actionMPC = solve(state0, goal)
+                    MPC.prepare() # Linearize the next RTI step before the next state is known
 
                 action = np.zeros(env.n())
                 for i, j in enumerate(robots[0]._dofs):
@@ -123,7 +174,13 @@ def main():
 
                 t += 1
         end_time = time.time()
+        if runner is not None:
+            runner.stop()
+            print("Controller runner: {}".format(runner.summary()))
         print("Elapsed time: {}\nCost: {}\nSteps: {}".format(end_time - start_time, MPC.final_cost, t))
+        print("MPC solves: {}".format(MPC.statistics.summary()))
+        if STATISTICS_FILE is not None:
+            MPC.statistics.to_json(STATISTICS_FILE)
         global_time.append(end_time - start_time)
         global_steps.append(t)
         global_cost.append(MPC.final_cost)
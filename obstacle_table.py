@@ -0,0 +1,218 @@
+"""
+    Columnar storage of the obstacles of the house. Every obstacle is a box described by the position of its center, its
+    orientation, its dimensions and its category; each of these fields is stored in its own NumPy array so that the
+    consumers (constraint generator, planner, free space) work on whole columns instead of looking up dicts.
+"""
+
+import numpy as np
+
+WALL = 0
+DOOR = 1
+FURNITURE = 2
+KNOB = 3
+CATEGORIES = {'walls': WALL, 'doors': DOOR, 'furnitures': FURNITURE, 'knobs': KNOB} # names used by ObstacleConstraintsGenerator
+COLUMNS = ('x', 'y', 'z', 'theta', 'width', 'length', 'height') # float columns, z is the height of the bottom of the box
+INITIAL_CAPACITY = 16
+
+
+class ObstacleTable:
+    """
+    Struct of arrays of box obstacles. The columns have a spare capacity, so that obstacles can be appended one at a time
+    without copying the whole table every time; the attributes only expose the rows in use.
+    """
+
+    __slots__ = ('_x', '_y', '_z', '_theta', '_width', '_length', '_height', '_category', '_size')
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY) -> None:
+        """
+        Args:
+            capacity (int, optional): number of preallocated rows. Defaults to INITIAL_CAPACITY.
+        """
+
+        for column in COLUMNS:
+            setattr(self, '_' + column, np.zeros(capacity))
+        self._category = np.zeros(capacity, dtype=np.int8)
+        self._size = 0
+
+        pass
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, i: int) -> dict:
+        """
+        Return the i-th obstacle as a dict with the keys 'x', 'y', 'z', 'theta', 'width', 'length', 'height' and
+        'category', for the code that handles single obstacles.
+        """
+
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError(f"Obstacle {i} out of range for a table of {self._size} obstacles.")
+        obstacle = {column: float(getattr(self, '_' + column)[i]) for column in COLUMNS}
+        obstacle['category'] = int(self._category[i])
+
+        return obstacle
+
+    def __iter__(self):
+        return (self[i] for i in range(self._size))
+
+    x = property(lambda self: self._x[:self._size])
+    y = property(lambda self: self._y[:self._size])
+    z = property(lambda self: self._z[:self._size])
+    theta = property(lambda self: self._theta[:self._size])
+    width = property(lambda self: self._width[:self._size])
+    length = property(lambda self: self._length[:self._size])
+    height = property(lambda self: self._height[:self._size])
+    category = property(lambda self: self._category[:self._size])
+
+    def append(self, category: int, x: float, y: float, width: float, length: float, height: float, theta: float = 0.0,
+               z: float = 0.0) -> int:
+        """
+        Append an obstacle to the table, doubling the capacity of the columns when they are full.
+        Returns:
+            int: row of the new obstacle
+        """
+
+        if self._size == len(self._x):
+            self.reserve(max(2 * len(self._x), INITIAL_CAPACITY))
+        i = self._size
+        self._x[i], self._y[i], self._z[i], self._theta[i] = x, y, z, theta
+        self._width[i], self._length[i], self._height[i] = width, length, height
+        self._category[i] = category
+        self._size += 1
+
+        return i
+
+    def reserve(self, capacity: int):
+        """
+        Grow the columns to hold at least `capacity` obstacles.
+        """
+
+        if capacity <= len(self._x):
+            return
+        for column in COLUMNS + ('category',):
+            old = getattr(self, '_' + column)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, '_' + column, new)
+
+        pass
+
+    def row(self, category: int, i: int) -> int:
+        """
+        Return the row of the i-th obstacle of a category.
+        """
+
+        return int(np.flatnonzero(self.category == category)[i])
+
+    def update(self, row: int, **fields) -> bool:
+        """
+        Overwrite some of the columns of a row, e.g. update(row, x=1.0, theta=0.0).
+        Returns:
+            bool: whether any value changed
+        """
+
+        changed = False
+        for column, value in fields.items():
+            assert column in COLUMNS, f"Unknown column {column}, expected one of {COLUMNS}."
+            values = getattr(self, '_' + column)
+            changed |= bool(values[row] != value)
+            values[row] = value
+
+        return changed
+
+    def remove(self, category: int):
+        """
+        Remove all the obstacles of a category, keeping the order of the other obstacles.
+        """
+
+        keep = np.flatnonzero(self.category != category)
+        for column in COLUMNS + ('category',):
+            values = getattr(self, '_' + column)
+            values[:len(keep)] = values[keep]
+        self._size = len(keep)
+
+        pass
+
+    def select(self, category) -> 'ObstacleTable':
+        """
+        Return a new table with the obstacles of one or more categories, in the order in which they were appended.
+        """
+
+        return self.take(np.flatnonzero(np.isin(self.category, category)))
+
+    def take(self, rows) -> 'ObstacleTable':
+        """
+        Return a new table with the given rows.
+        """
+
+        rows = np.atleast_1d(rows)
+        table = ObstacleTable(len(rows))
+        for column in COLUMNS + ('category',):
+            getattr(table, '_' + column)[:] = getattr(self, '_' + column)[rows]
+        table._size = len(rows)
+
+        return table
+
+    def extents(self) -> tuple:
+        """
+        Return the centers (n, 2) and the half extents along x and y (n, 2) of the obstacles. Walls and doors rotated
+        by 90 degrees have their width along y and their length along x, furnitures do not have an orientation.
+        """
+
+        centers = np.stack((self.x, self.y), axis=1)
+        half = np.stack((self.width, self.length), axis=1) / 2
+        rotated = (self.category != FURNITURE) & (np.abs(self.theta) == np.pi/2)
+        half[rotated] = half[rotated, ::-1]
+
+        return centers, half
+
+    def vertices(self) -> np.ndarray:
+        """
+        Return the vertices of the boxes, shape (n, 8, 3), in the order tl, tr, br, bl of the bottom face followed by the
+        same corners of the top face.
+        """
+
+        centers, half = self.extents()
+        corners = np.array([[-1., 1.], [1., 1.], [1., -1.], [-1., -1.]]) # tl, tr, br, bl
+        vertices = np.empty((len(self), 8, 3))
+        vertices[:, :, :2] = centers[:, None, :] + np.tile(corners, (2, 1))[None] * half[:, None, :]
+        vertices[:, :4, 2] = self.z[:, None]
+        vertices[:, 4:, 2] = (self.z + self.height)[:, None]
+
+        return vertices
+
+    def segments(self, doors: bool = False) -> np.ndarray:
+        """
+        Return the obstacles as 2D line segments, shape (n_segments, 2, 2), as used by the planner: every wall is the
+        segment between its two end points, every furniture standing on the floor gives the four sides of its footprint.
+        Knobs and floating furnitures are ignored, doors are included only if `doors` is True; a door spans its width
+        along the direction theta from its center.
+        """
+
+        walls = self.category == WALL
+        direction = np.stack((np.sin(self.theta[walls]), np.cos(self.theta[walls])), axis=1) * self.length[walls, None] / 2
+        centers = np.stack((self.x[walls], self.y[walls]), axis=1)
+        wall_segments = np.stack((centers - direction, centers + direction), axis=1)
+
+        furnitures = (self.category == FURNITURE) & (self.z <= 0.0)
+        low = np.stack((self.x - self.width/2, self.y - self.length/2), axis=1)[furnitures]
+        high = np.stack((self.x + self.width/2, self.y + self.length/2), axis=1)[furnitures]
+        x1, y1, x2, y2 = low[:, 0], low[:, 1], high[:, 0], high[:, 1]
+        box_segments = np.stack((
+            np.stack((np.stack((x1, y1), 1), np.stack((x1, y2), 1)), 1), # left
+            np.stack((np.stack((x2, y1), 1), np.stack((x2, y2), 1)), 1), # right
+            np.stack((np.stack((x1, y1), 1), np.stack((x2, y1), 1)), 1), # bottom
+            np.stack((np.stack((x1, y2), 1), np.stack((x2, y2), 1)), 1), # top
+        ), axis=1).reshape(-1, 2, 2)
+
+        if not doors:
+            return np.concatenate((wall_segments, box_segments))
+
+        doors = self.category == DOOR
+        direction = np.stack((np.cos(self.theta[doors]), np.sin(self.theta[doors])), axis=1) * self.width[doors, None] / 2
+        centers = np.stack((self.x[doors], self.y[doors]), axis=1)
+        door_segments = np.stack((centers - direction, centers + direction), axis=1)
+
+        return np.concatenate((wall_segments, door_segments, box_segments))
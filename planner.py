@@ -1,4 +1,3 @@
-import random
 import time
 import numpy as np
 import matplotlib.pyplot as plt
@@ -49,36 +48,9 @@ class Planner:
 
         # Obtain the lines (walls), points and boxes.
         self._lines, self._points, self._boxes = self._house.generate_plot_obstacles(door_generated=False)
-        obstacle_list = [] # Create a list of Obstacle objects.
-
-        # Generate an Obstacle object and append into list for every line segment
-        for line in self._lines:
-            if line['type'] == 'door':
-                continue
-            obstacle = Obstacle(line['coord'][0], line['coord'][1])
-            obstacle_list.append(obstacle)
-
-        # Generate four Obstacle objects and append into list for every line segment in a box
-        for box in self._boxes:
-            # Ignore furniture that are suspended in the air.
-            if box['floating']:
-                continue
-
-            # Obtain the coordinates of the box in XY-plane.
-            x1 = box['x']
-            y1 = box['y']
-            x2 = x1 + box['w']
-            y2 = y1 + box['h']
-
-            # Create an Obstacle object and append into list
-            obstacle_left = Obstacle([x1,y1], [x1,y2])
-            obstacle_right = Obstacle([x2,y1], [x2,y2])
-            obstacle_up = Obstacle([x1,y1], [x2,y1])
-            obstacle_down = Obstacle([x1,y2], [x2,y2])
-            obstacle_list.append(obstacle_left)
-            obstacle_list.append(obstacle_right)
-            obstacle_list.append(obstacle_up)
-            obstacle_list.append(obstacle_down)
+        # Obtain the walls and the sides of the furniture standing on the floor as line segments from the obstacle table.
+        # Doors are ignored, since they can be opened.
+        obstacle_list = self._house.Obstacles.table.segments()
     
         # Start measuring the RRT* computation time
         if self._debug_mode:
@@ -217,7 +189,7 @@ class RRT:
         @param start            - set the starting position
         @param end              - set the final position
         @param dim              - store the minimal and maximal XY-coordinate values of the house.
-        @param obstacle_list    - list of Obstacle objects
+        @param obstacle_list    - array of line segments of shape (n, 2, 2), or list of Obstacle objects
         @step_size              - set the maximum size between two vertices interval
         @max_iter               - set the maximal number of random samples
         @param debug_mode   - let this object print data of motion planning in terminal. 
@@ -226,6 +198,9 @@ class RRT:
         self.goal = goal
         self.dim = dim
         self.obstacle_list = obstacle_list
+        if len(obstacle_list) > 0 and isinstance(obstacle_list[0], Obstacle):
+            obstacle_list = [[obstacle.vertex_1, obstacle.vertex_2] for obstacle in obstacle_list]
+        self.segments = np.asarray(obstacle_list, dtype=float).reshape(-1, 2, 2)    # Segments of all obstacles, checked at once.
         self.step_size = step_size
         self.max_iter = max_iter
         self.vertices = []
@@ -249,11 +224,7 @@ class RRT:
         """
         Return boolean if a line segment between `point_1` and `point_2` is in collision
         """
-        random.shuffle(self.obstacle_list)  # Shuffle the list of Obstacle objects.
-        for obstacle in self.obstacle_list:
-            if obstacle.check_collision(point_1, point_2):
-                return True
-        return False
+        return bool(np.any(segments_intersect(point_1, point_2, self.segments)))
 
     def find_nearest(self, point):
         """
@@ -405,6 +376,25 @@ class RRT:
         # No path is found
         return None, 0
 
+def segments_intersect(point_1, point_2, segments):
+    """
+    Vectorized version of Obstacle.check_collision: returns for each of the `segments` of shape (n, 2, 2) whether
+    the line segment from `point_1` to `point_2` intersects with it.
+    """
+    x1, y1 = point_1
+    x2, y2 = point_2
+    x3, y3 = segments[:, 0, 0], segments[:, 0, 1]
+    x4, y4 = segments[:, 1, 0], segments[:, 1, 1]
+
+    denominator = ((x1-x2)*(y3-y4) - (y1-y2)*(x3-x4))
+    parallel = denominator == 0
+    denominator = np.where(parallel, 1.0, denominator)
+
+    t = ((x1-x3)*(y3-y4)-(y1-y3)*(x3-x4))/denominator
+    u = -((x1-x2)*(y1-y3)-(y1-y2)*(x1-x3))/denominator
+
+    return ~parallel & (0 <= t) & (t <= 1) & (0 <= u) & (u <= 1)
+
 class Obstacle:
     """
     This class creates an object representing a line obstacle given the two 2D vertices. This object is then used for RRT*.
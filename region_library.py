@@ -0,0 +1,212 @@
+"""
+    Offline decomposition of the free space of the house into convex regions. The regions are computed once with FreeSpace,
+    stored on disk, and at runtime the controllers look up the region containing the robot instead of running IRIS inside
+    the control loop.
+"""
+
+import numpy as np
+from free_space import FreeSpace, FreeSpacePool, ObstacleIndex
+
+COVERAGE = 0.9 # fraction of the free space that has to be covered by the regions
+MAX_REGIONS = 100 # maximum number of regions in the library
+N_SAMPLES = 5000 # number of random points used to estimate the coverage
+GRID_SPACING = 1.0 # distance between the seeds placed on a grid
+LIBRARY_FILE = 'resources/regions.npz'
+
+
+class RegionLibrary:
+    """
+    Collection of convex obstacle-free regions {x | A*x <= b} and of their inscribed ellipsoids. The hyperplanes of all the
+    regions are stacked in a single array, the rows of region i being A[offsets[i]:offsets[i+1]].
+    """
+
+    def __init__(self, A: np.ndarray, b: np.ndarray, offsets: np.ndarray, C: np.ndarray, d: np.ndarray) -> None:
+        """
+        Args:
+            A (np.ndarray): stacked normals of the hyperplanes of all the regions, shape (n_planes, dim)
+            b (np.ndarray): stacked offsets of the hyperplanes of all the regions, shape (n_planes,)
+            offsets (np.ndarray): index of the first hyperplane of each region, shape (n_regions + 1,)
+            C (np.ndarray): matrices of the inscribed ellipsoids, shape (n_regions, dim, dim)
+            d (np.ndarray): centers of the inscribed ellipsoids, shape (n_regions, dim)
+        """
+
+        self.A = A
+        self.b = b
+        self.offsets = offsets
+        self.C = C
+        self.d = d
+
+        pass
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def region(self, i: int) -> tuple:
+        """
+        Return the hyperplanes (A, b) of the i-th region.
+        """
+
+        return self.A[self.offsets[i]:self.offsets[i+1]], self.b[self.offsets[i]:self.offsets[i+1]]
+
+    def violation(self, points: np.ndarray) -> np.ndarray:
+        """
+        Compute for every point and every region the largest violation of the hyperplanes of the region, a point is
+        inside a region if the violation is not positive.
+        Args:
+            points (np.ndarray): points to check, shape (n_points, dim)
+
+        Returns:
+            np.ndarray: largest violation, shape (n_points, n_regions)
+        """
+
+        slack = np.atleast_2d(points) @ self.A.T - self.b
+
+        return np.maximum.reduceat(slack, self.offsets[:-1], axis=1)
+
+    def find_region(self, pos: np.ndarray) -> tuple:
+        """
+        Look up the region that contains the position with the largest margin.
+        Args:
+            pos (np.ndarray): position of the robot
+
+        Returns:
+            tuple: hyperplanes (A, b) of the region, (None, None) if no region contains the position
+        """
+
+        if len(self) == 0:
+            return None, None
+        violation = self.violation(np.asarray(pos, dtype=float))[0]
+        i = np.argmin(violation)
+        if violation[i] > 0:
+            return None, None
+
+        return self.region(i)
+
+    def save(self, path: str = LIBRARY_FILE):
+        """
+        Store the library in an uncompressed .npz file.
+        """
+
+        np.savez(path, A=self.A, b=self.b, offsets=self.offsets, C=self.C, d=self.d)
+
+        pass
+
+    @classmethod
+    def load(cls, path: str = LIBRARY_FILE) -> 'RegionLibrary':
+        """
+        Load a library stored with `save`.
+        """
+
+        with np.load(path) as data:
+            return cls(data['A'], data['b'], data['offsets'], data['C'], data['d'])
+
+    @classmethod
+    def from_regions(cls, regions: list) -> 'RegionLibrary':
+        """
+        Stack a list of regions, each one given as (A, b, C, d), into a library.
+        """
+
+        dim = len(regions[0][3]) if len(regions) > 0 else 3
+        A = [np.reshape(region[0], (-1, dim)) for region in regions]
+        b = [np.reshape(region[1], -1) for region in regions]
+        offsets = np.concatenate(([0], np.cumsum([len(b_i) for b_i in b]))).astype(int)
+
+        return cls(np.concatenate(A) if len(A) > 0 else np.zeros((0, dim)),
+                   np.concatenate(b) if len(b) > 0 else np.zeros(0),
+                   offsets,
+                   np.array([region[2] for region in regions]).reshape(-1, dim, dim),
+                   np.array([region[3] for region in regions]).reshape(-1, dim))
+
+    @classmethod
+    def build(cls, obstacles: list, bounds: np.ndarray = None, method: str = 'greedy', coverage: float = COVERAGE,
+              max_regions: int = MAX_REGIONS, n_samples: int = N_SAMPLES, spacing: float = GRID_SPACING,
+              seed: int = None, processes: int = None) -> 'RegionLibrary':
+        """
+        Seed IRIS regions across the whole environment until the target coverage of the free space is met. The coverage
+        is estimated on random points sampled in the bounds and outside the bounding boxes of the obstacles.
+        Args:
+            obstacles (list): list of obstacles, each element of the list contains the vertices on the related obstacle
+            bounds (np.ndarray, optional): lower and upper corner of the sampled space. Defaults to the bounding box of
+                the obstacles.
+            method (str, optional): 'greedy' seeds at random uncovered points, 'grid' seeds on a regular grid.
+                Defaults to 'greedy'.
+            coverage (float, optional): target fraction of covered samples. Defaults to COVERAGE.
+            max_regions (int, optional): maximum number of regions. Defaults to MAX_REGIONS.
+            n_samples (int, optional): number of samples used to estimate the coverage. Defaults to N_SAMPLES.
+            spacing (float, optional): distance between the seeds of the grid. Defaults to GRID_SPACING.
+            seed (int, optional): seed of the random generator. Defaults to None.
+            processes (int, optional): compute this many regions at once on a FreeSpacePool. Defaults to None, in which
+                case the regions are computed one after another in this process.
+
+        Returns:
+            RegionLibrary: the computed library
+        """
+
+        assert method in ('greedy', 'grid'), f"Unknown seeding method {method}, expected 'greedy' or 'grid'."
+        rng = np.random.default_rng(seed)
+        index = ObstacleIndex(obstacles)
+        if bounds is None:
+            bounds = np.array([np.min(index.lower, axis=0), np.max(index.upper, axis=0)])
+
+        # Free samples used to estimate the coverage
+        samples = rng.uniform(bounds[0], bounds[1], size=(n_samples, len(bounds[0])))
+        samples = samples[~cls.occupied(index, samples)]
+
+        if method == 'grid':
+            axes = [np.arange(low + spacing / 2, high, spacing) for low, high in zip(*bounds)]
+            seeds = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, len(axes))
+            seeds = seeds[~cls.occupied(index, seeds)]
+        else:
+            seeds = samples[rng.permutation(len(samples))]
+
+        pool = FreeSpacePool(obstacles, processes) if processes is not None else None
+        free_space = FreeSpace(obstacles)
+        regions = []
+        covered = np.zeros(len(samples), dtype=bool)
+        seed_covered = np.zeros(len(seeds), dtype=bool)
+        try:
+            while len(regions) < max_regions and len(samples) > 0 and np.mean(covered) < coverage:
+                # next seeds that are not inside a region yet
+                batch = np.flatnonzero(~seed_covered)[:min(processes or 1, max_regions - len(regions))]
+                if batch.size == 0:
+                    break
+
+                if pool is not None:
+                    results = pool.update_free_space(seeds[batch])
+                else:
+                    A, b = free_space.update_free_space(seeds[batch[0]])
+                    results = [(A, b, free_space.ellipsoid, free_space.stats)]
+
+                seed_covered[batch] = True
+                for A, b, ellipsoid, _ in results:
+                    regions.append((np.array(A), np.array(b), ellipsoid.C, ellipsoid.d))
+                    region = cls.from_regions(regions[-1:])
+                    covered |= region.violation(samples)[:, 0] <= 0
+                    seed_covered |= region.violation(seeds)[:, 0] <= 0
+        finally:
+            if pool is not None:
+                pool.close()
+
+        return cls.from_regions(regions)
+
+    @staticmethod
+    def occupied(index: ObstacleIndex, points: np.ndarray) -> np.ndarray:
+        """
+        Return for each point whether it lies in the bounding box of an obstacle.
+        """
+
+        inside = (points[:, None, :] >= index.lower[None]) & (points[:, None, :] <= index.upper[None])
+
+        return np.any(np.all(inside, axis=2), axis=1)
+
+
+if __name__ == "__main__":
+    from house import House
+
+    # Compute the library for the environment of arm_run.py, no gym environment is needed to generate the obstacles
+    house = House(None, robot_dim=np.array([0.3, 0.2]), scale=1.0, test_mode=True)
+    house.generate_walls()
+    house.generate_furniture()
+    library = RegionLibrary.build(house.Obstacles.getVertices(), seed=0)
+    library.save()
+    print("Stored {} regions in {}".format(len(library), LIBRARY_FILE))
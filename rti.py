@@ -0,0 +1,141 @@
+"""
+    Real-time iteration (RTI) of the MPC controllers. Instead of solving the problem to convergence at every control
+    step, a single SQP iteration is taken from the shifted previous solution. The iteration is split in two phases:
+    - the preparation phase, run between two control steps, linearizes the constraints and evaluates the Hessian of the
+      cost at the initial guess, which does not depend on the new state
+    - the feedback phase, run as soon as the new state is known, evaluates the constraints and the gradient of the cost
+      with the new parameters and solves one QP
+    The latency of a control step is then bounded by the solve of a single QP, at the price of a small loss in
+    optimality.
+"""
+
+import time
+import numpy as np
+from casadi import *
+from compiled_solver import SolverSolution
+
+QP_SOLVER = 'osqp'
+QP_OPTIONS = {"verbose": False,
+              "eps_abs": 1e-5,
+              "eps_rel": 1e-5,
+              "max_iter": 4000, # bounds the time of the feedback phase
+              "polish": False} # polishing prints a message at every solve
+
+
+class RTISolver:
+    """
+    Real-time iteration of an Opti problem. The Hessian is the Gauss-Newton approximation given by the Hessian of the
+    cost alone, which is exact for the quadratic costs of the controllers and keeps the QP convex. The initial guess,
+    the parameters and the bounds are read from the Opti object, so the problem is still updated with opti.set_value
+    and the guess is the one set by WarmStart.apply.
+    """
+
+    def __init__(self, opti: Opti, feedback_parameters: list, qp_solver: str = QP_SOLVER, qp_options: dict = QP_OPTIONS) -> None:
+        """
+        Args:
+            opti (Opti): optimization problem
+            feedback_parameters (list): parameters that may change between the preparation and the feedback phase,
+                e.g. the initial state and the goal. A change of any other parameter, e.g. the obstacle hyperplanes,
+                makes the feedback phase prepare again.
+            qp_solver (str, optional): CasADi conic plugin solving the QP. Defaults to QP_SOLVER.
+            qp_options (dict, optional): options of the QP solver. Defaults to QP_OPTIONS.
+        """
+
+        self.opti = opti
+        self.feedback_parameters = feedback_parameters
+        self.qp_solver = qp_solver
+        self.qp_options = qp_options
+        self.symbols = None # x, p and lam_g of the problem, reading them from Opti is slow
+        self.qp = None
+        self.reset()
+
+        pass
+
+    def reset(self):
+        """
+        Forget the last preparation, the next feedback phase prepares again.
+        """
+
+        self.x = None # linearization point
+        self.p = None # parameters of the preparation
+        self.lam_g = None
+        self.H = None
+        self.J = None
+        self.t_prepare = 0.0
+
+        pass
+
+    @property
+    def prepared(self) -> bool:
+        return self.x is not None
+
+    def build(self):
+        """
+        Build the functions of the two phases and the QP solver, the first time the problem is prepared, when all its
+        constraints are known.
+        """
+
+        self.symbols = {'x': self.opti.x, 'p': self.opti.p, 'lam_g': self.opti.lam_g}
+        x, p = self.symbols['x'], self.symbols['p']
+        H, grad = hessian(self.opti.f, x)
+        self.preparation = Function('rti_preparation', [x, p], [H, jacobian(self.opti.g, x)])
+        self.feedback_function = Function('rti_feedback', [x, p], [self.opti.g, grad])
+        self.bounds = Function('rti_bounds', [p], [self.opti.lbg, self.opti.ubg])
+        self.qp = conic('rti_qp', self.qp_solver, {'h': H.sparsity(), 'a': self.preparation.sparsity_out(1)},
+                        dict(print_time=False, **{self.qp_solver: self.qp_options}))
+
+        # Entries of p that the feedback phase can take as they are
+        self.fixed = np.ones(p.numel(), dtype=bool)
+        offset = 0
+        for primitive in p.primitives():
+            if any(is_equal(primitive, parameter) for parameter in self.feedback_parameters):
+                self.fixed[offset:offset + primitive.numel()] = False
+            offset += primitive.numel()
+
+        pass
+
+    def prepare(self):
+        """
+        Preparation phase: linearize the problem at the current initial guess of the Opti object.
+        """
+
+        start = time.perf_counter()
+        if self.qp is None:
+            self.build()
+        initial = self.opti.initial()
+        self.x = np.atleast_1d(self.opti.value(self.symbols['x'], initial))
+        self.lam_g = np.atleast_1d(self.opti.value(self.symbols['lam_g'], initial))
+        self.p = np.atleast_1d(self.opti.value(self.symbols['p']))
+        self.H, self.J = self.preparation(self.x, self.p)
+        self.t_prepare = time.perf_counter() - start
+
+        pass
+
+    def feedback(self) -> SolverSolution:
+        """
+        Feedback phase: solve the QP of the step from the linearization point with the current parameters of the Opti
+        object, preparing first if the problem was not prepared or if parameters other than the feedback ones changed.
+        Raises:
+            RuntimeError: if the QP solver does not succeed, like opti.solve
+        """
+
+        start = time.perf_counter()
+        p = np.atleast_1d(self.opti.value(self.symbols['p'])) if self.prepared else None
+        if not self.prepared or not np.array_equal(p[self.fixed], self.p[self.fixed]):
+            self.prepare()
+            p = self.p
+
+        g, grad = self.feedback_function(self.x, p)
+        lbg, ubg = self.bounds(p)
+        result = self.qp(h=self.H, g=grad, a=self.J, lba=lbg - g, uba=ubg - g, x0=0, lam_a0=self.lam_g)
+        stats = self.qp.stats()
+        if not stats['success']:
+            self.reset()
+            raise RuntimeError("RTI step failed, return_status of {} is '{}'".format(self.qp_solver, stats['return_status']))
+        x = self.x + result['x'].full().ravel()
+        lam_g = result['lam_a'].full().ravel()
+        stats = {'iter_count': 1, 'success': True, 'return_status': stats['return_status'],
+                 't_wall_prepare': self.t_prepare, 't_wall_feedback': time.perf_counter() - start}
+        self.reset() # the next step is linearized at the next initial guess
+
+        return SolverSolution(self, x, p, lam_g, stats)
@@ -0,0 +1,128 @@
+"""
+    Cache of converged solutions of the MPC controllers. The robots repeat the same transitions, e.g. through the
+    doorways, so a problem whose offset from the goal and set of active constraints were already seen can start from
+    the solution found then instead of from the shifted previous solution, a poor guess after a waypoint switch.
+"""
+
+from collections import OrderedDict
+import numpy as np
+
+CACHE_SIZE = 256 # maximum number of cached solutions, the least recently used one is evicted
+CACHE_RESOLUTION = 0.1 # quantization of state0 - goal in the keys
+CACHE_RADIUS = 0.5 # largest distance between the offsets from the goal of a problem and of the nearest cached solution
+ACTIVE_TOLERANCE = 1e-3 # smallest multiplier of an active inequality constraint
+
+
+def active_set(lam_g: np.ndarray, inequality: np.ndarray, tolerance: float = ACTIVE_TOLERANCE) -> bytes:
+    """
+    Return the set of active inequality constraints of a solution, packed into bytes so that it can be used as a key.
+    Args:
+        lam_g (np.ndarray): multipliers of the constraints
+        inequality (np.ndarray): mask of the inequality constraints, the equality constraints are always active
+        tolerance (float, optional): smallest multiplier of an active constraint. Defaults to ACTIVE_TOLERANCE.
+    """
+
+    return np.packbits(np.abs(np.atleast_1d(lam_g)[inequality]) > tolerance).tobytes()
+
+
+class SolutionCache:
+    """
+    LRU cache of solutions keyed by the quantized offset state0 - goal and by the active set of the solution. The
+    trajectories are stored relative to their initial state, so a cached solution is moved to the initial state of the
+    problem it is used for. A lookup returns the exact entry if there is one, otherwise the nearest entry with the same
+    active set, otherwise the nearest entry with any active set, as long as it is within the radius.
+    """
+
+    def __init__(self, capacity: int = CACHE_SIZE, resolution: float = CACHE_RESOLUTION,
+                 radius: float = CACHE_RADIUS) -> None:
+        """
+        Args:
+            capacity (int, optional): maximum number of cached solutions. Defaults to CACHE_SIZE.
+            resolution (float, optional): quantization of the offsets from the goal. Defaults to CACHE_RESOLUTION.
+            radius (float, optional): largest distance between the offsets from the goal of a problem and of the
+                solution used for it. Defaults to CACHE_RADIUS.
+        """
+
+        self.capacity = capacity
+        self.resolution = resolution
+        self.radius = radius
+        self.entries = OrderedDict() # (offset, active set) -> (offset, x, u, lam_g), from the least recently used
+        self.hits = 0
+        self.misses = 0
+
+        pass
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def key(self, offset: np.ndarray, active: bytes) -> tuple:
+        return tuple(np.round(offset / self.resolution).astype(int)), active
+
+    def store(self, state0: np.ndarray, goal: np.ndarray, x: np.ndarray, u: np.ndarray, lam_g: np.ndarray,
+              active: bytes):
+        """
+        Store a converged solution, evicting the least recently used one if the cache is full.
+        Args:
+            state0 (np.ndarray): initial state of the problem
+            goal (np.ndarray): goal of the problem
+            x (np.ndarray): states, one column per step
+            u (np.ndarray): inputs, one column per step
+            lam_g (np.ndarray): multipliers of the constraints
+            active (bytes): active set of the solution, see active_set
+        """
+
+        offset = np.asarray(state0, dtype=float) - goal
+        key = self.key(offset, active)
+        self.entries[key] = (offset, x - np.reshape(state0, (-1, 1)), u, lam_g)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+        pass
+
+    def lookup(self, state0: np.ndarray, goal: np.ndarray, active: bytes = None):
+        """
+        Return the cached solution nearest to a problem.
+        Args:
+            state0 (np.ndarray): initial state of the problem
+            goal (np.ndarray): goal of the problem
+            active (bytes, optional): expected active set, e.g. the one of the previous solution. Defaults to None.
+
+        Returns:
+            tuple: states moved to state0, inputs and multipliers, None if no solution is within the radius
+        """
+
+        offset = np.asarray(state0, dtype=float) - goal
+        key = self.key(offset, active)
+        if key not in self.entries:
+            key = self.nearest(offset, [k for k in self.entries if k[1] == active]) if active is not None else None
+            if key is None: # fall back to any active set
+                key = self.nearest(offset, list(self.entries))
+        if key is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        _, x, u, lam_g = self.entries[key]
+
+        return x + np.reshape(state0, (-1, 1)), u, lam_g
+
+    def nearest(self, offset: np.ndarray, keys: list) -> tuple:
+        """
+        Return the key of the entry nearest to an offset from the goal among the given ones, None if none is within
+        the radius.
+        """
+
+        if not keys:
+            return None
+        distances = np.linalg.norm([self.entries[k][0] - offset for k in keys], axis=1)
+        nearest = int(np.argmin(distances))
+
+        return keys[nearest] if distances[nearest] <= self.radius else None
+
+    def summary(self) -> dict:
+        """
+        Return the number of cached solutions, hits and misses.
+        """
+
+        return {'size': len(self.entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,147 @@
+"""
+    Instrumentation of the solves of the MPC controllers. Every solve is recorded with its wall time, number of
+    iterations, return status, constraint violation, objective and whether it was warm started, in a ring buffer of
+    fixed size; the records can be aggregated into percentiles, e.g. the p50 and p99 latencies used to tune the horizon
+    and the time step, and exported to CSV or JSON.
+"""
+
+import re
+import csv
+import json
+import numpy as np
+
+MAX_SOLVES = 10000 # capacity of the ring buffer, the oldest solves are overwritten
+PERCENTILES = (50, 90, 99)
+FIELDS = ('wall_time', 'iterations', 'violation', 'objective') # float columns, NaN when the solver does not report them
+RETURN_STATUS = re.compile(r"return_status is '([^']*)'") # in the errors of opti.solve, CompiledSolver and RTISolver
+
+
+class SolveStatistics:
+    """
+    Ring buffer of the statistics of the solves, stored column by column. The iterations, the constraint violation
+    and the objective are read from the stats of the solver, as returned by opti.stats(): IPOPT reports all of them,
+    the QP solvers (OSQP, RTISolver) only part of them.
+    """
+
+    def __init__(self, capacity: int = MAX_SOLVES) -> None:
+        """
+        Args:
+            capacity (int, optional): number of solves kept. Defaults to MAX_SOLVES.
+        """
+
+        self.capacity = capacity
+        for field in FIELDS:
+            setattr(self, '_' + field, np.full(capacity, np.nan))
+        self._success = np.zeros(capacity, dtype=bool)
+        self._warm = np.zeros(capacity, dtype=bool)
+        self._status = np.empty(capacity, dtype=object)
+        self.n_solves = 0 # total number of recorded solves, also the ones overwritten
+
+        pass
+
+    def __len__(self) -> int:
+        return min(self.n_solves, self.capacity)
+
+    def record(self, stats: dict, wall_time: float, warm: bool, objective: float = None):
+        """
+        Record a solve.
+        Args:
+            stats (dict): stats of the solver, e.g. opti.stats() or solution.stats()
+            wall_time (float): wall time of the solve in seconds
+            warm (bool): whether the solve was warm started
+            objective (float, optional): objective at the solution, if the stats do not report it. Defaults to None.
+        """
+
+        i = self.n_solves % self.capacity
+        iterations = stats.get('iter_count', -1)
+        history = stats.get('iterations', {}) # values of every IPOPT iteration
+        self._wall_time[i] = wall_time
+        self._iterations[i] = iterations if iterations >= 0 else np.nan
+        self._violation[i] = history['inf_pr'][-1] if history.get('inf_pr') else np.nan
+        self._objective[i] = history['obj'][-1] if history.get('obj') else (np.nan if objective is None else objective)
+        self._success[i] = stats.get('success', False)
+        self._warm[i] = warm
+        self._status[i] = stats.get('return_status', 'unknown')
+        self.n_solves += 1
+
+        pass
+
+    def record_failure(self, error: Exception, wall_time: float, warm: bool):
+        """
+        Record a solve that raised an error, taking the return status from its message.
+        """
+
+        status = RETURN_STATUS.search(str(error))
+        self.record({'success': False, 'return_status': status.group(1) if status else type(error).__name__},
+                    wall_time, warm)
+
+        pass
+
+    def records(self) -> dict:
+        """
+        Return the recorded solves from the oldest to the newest, as a dict of columns: wall_time, iterations,
+        violation, objective, success, warm and status.
+        """
+
+        order = np.arange(self.n_solves - len(self), self.n_solves) % self.capacity
+        columns = {field: getattr(self, '_' + field)[order] for field in FIELDS}
+        columns.update(success=self._success[order], warm=self._warm[order], status=self._status[order])
+
+        return columns
+
+    def percentiles(self, field: str = 'wall_time', percentiles: tuple = PERCENTILES) -> dict:
+        """
+        Return the percentiles of a float column over the recorded solves, ignoring the missing values,
+        e.g. {'p50': ..., 'p90': ..., 'p99': ...}. The values are None if nothing was recorded.
+        """
+
+        assert field in FIELDS, f"Unknown field {field}, expected one of {FIELDS}."
+        values = self.records()[field]
+        values = values[~np.isnan(values)]
+
+        return {'p{:g}'.format(q): float(np.percentile(values, q)) if len(values) > 0 else None for q in percentiles}
+
+    def summary(self) -> dict:
+        """
+        Return the number of solves, failures and warm starts, the count of every return status and the percentiles of
+        the wall time and of the iterations, split between cold and warm starts.
+        """
+
+        columns = self.records()
+        statuses, counts = np.unique(columns['status'].astype(str), return_counts=True)
+
+        def percentiles(values):
+            values = values[~np.isnan(values)]
+            return {'p{:g}'.format(q): float(np.percentile(values, q)) for q in PERCENTILES} if len(values) > 0 else None
+
+        return {'solves': self.n_solves, 'recorded': len(self), 'failures': int(np.sum(~columns['success'])),
+                'warm': int(np.sum(columns['warm'])), 'status': dict(zip(statuses.tolist(), counts.tolist())),
+                'wall_time': percentiles(columns['wall_time']),
+                'iterations': {start: percentiles(columns['iterations'][columns['warm'] == warm])
+                               for start, warm in (('cold', False), ('warm', True))}}
+
+    def to_csv(self, path: str):
+        """
+        Write the recorded solves to a CSV file, one row per solve, missing values as empty cells.
+        """
+
+        columns = self.records()
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(columns.keys())
+            for row in zip(*columns.values()):
+                writer.writerow(['' if isinstance(value, float) and np.isnan(value) else value for value in row])
+
+        pass
+
+    def to_json(self, path: str):
+        """
+        Write the summary and the recorded solves to a JSON file, missing values as null.
+        """
+
+        columns = {name: [None if isinstance(value, float) and np.isnan(value) else value for value in column.tolist()]
+                   for name, column in self.records().items()}
+        with open(path, 'w') as file:
+            json.dump({'summary': self.summary(), 'solves': columns}, file, indent=4)
+
+        pass
@@ -0,0 +1,229 @@
+"""
+    Benchmark of FreeSpace.update_free_space on synthetic fields of random boxes. Every field is a floor and a ceiling
+    with a number of boxes spread on a square whose side is chosen to obtain the requested density (boxes per square
+    meter). For each field the regions of a few random free seeds are computed and the time spent in every phase of IRIS
+    is recorded together with the number of iterations and the volume of the ellipsoid.
+
+    The results are written to a JSON and a CSV file. When a baseline is available the medians of every case are compared
+    with it and the script exits with a non-zero status if a case needs more iterations or more planes, or finds a
+    smaller region than the allowed tolerance. These metrics are deterministic for the seeded fields, so the committed
+    tests/benchmark/baseline.json holds on any machine. Wall-clock times of a few tens of milliseconds are too noisy to
+    gate on: the cases slower than the baseline by more than the time tolerance are only reported.
+
+    Usage:
+        python tests/benchmark_free_space.py --save-baseline   # store the reference results
+        python tests/benchmark_free_space.py                   # run and compare with the reference results
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from free_space import FreeSpace, ObstacleIndex
+
+N_OBSTACLES = [10, 50, 100, 200] # number of boxes of the fields
+DENSITIES = [0.1, 0.4] # boxes per square meter
+N_SEEDS = 5 # number of regions computed in every field
+N_REPEAT = 3 # every region is computed this many times and the fastest run is kept, to reduce the timing noise
+BOX_SIZE = (0.1, 0.6) # range of the half sides of the boxes
+BOX_HEIGHT = (0.3, 1.5) # range of the heights of the boxes
+CEILING = 1.6 # height of the ceiling
+TIME_TOLERANCE = 1.0 # relative increase of the median times with respect to the baseline that is reported
+VOLUME_TOLERANCE = 0.05 # allowed relative decrease of the median volume with respect to the baseline
+OUTPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark')
+BASELINE_FILE = os.path.join(OUTPUT_DIR, 'baseline.json')
+
+PHASES = ['time_hyperplanes', 'time_closest_point', 'time_ellipsoid', 'time']
+METRICS = PHASES + ['iterations', 'n_closest_point', 'n_planes', 'volume']
+
+
+def box(lower: np.ndarray, upper: np.ndarray) -> np.ndarray:
+    """
+    Vertices of an axis-aligned box, in the same order as ObstacleConstraintsGenerator.getVertices.
+    """
+
+    return np.array([[x, y, z] for z in (lower[2], upper[2])
+                     for x, y in ((upper[0], upper[1]), (lower[0], upper[1]), (lower[0], lower[1]), (upper[0], lower[1]))])
+
+
+def generate_field(n_obstacles: int, density: float, seed: int = 0) -> tuple:
+    """
+    Generate a field of random boxes between a floor and a ceiling.
+    Args:
+        n_obstacles (int): number of boxes
+        density (float): number of boxes per square meter
+        seed (int, optional): seed of the random generator. Defaults to 0.
+
+    Returns:
+        tuple: list of obstacles given as (8, 3) arrays of vertices and half of the side of the field
+    """
+
+    rng = np.random.default_rng(seed)
+    half_side = np.sqrt(n_obstacles / density) / 2
+    obstacles = [box(np.array([-half_side, -half_side, -0.1]), np.array([half_side, half_side, 0.])),
+                 box(np.array([-half_side, -half_side, CEILING]), np.array([half_side, half_side, CEILING + 0.1]))]
+    for _ in range(n_obstacles):
+        center = rng.uniform(-half_side, half_side, 2)
+        half_size = rng.uniform(*BOX_SIZE, 2)
+        height = rng.uniform(*BOX_HEIGHT)
+        obstacles.append(box(np.append(center - half_size, 0.), np.append(center + half_size, height)))
+
+    return obstacles, half_side
+
+
+def free_seeds(obstacles: list, half_side: float, n_seeds: int, seed: int = 0) -> np.ndarray:
+    """
+    Sample seeds in the field that are not inside the bounding box of any obstacle.
+    """
+
+    rng = np.random.default_rng(seed)
+    index = ObstacleIndex(obstacles)
+    seeds = []
+    while len(seeds) < n_seeds:
+        point = np.append(rng.uniform(-0.9 * half_side, 0.9 * half_side, 2), rng.uniform(0.1, CEILING - 0.1))
+        if not np.any(np.all((point >= index.lower) & (point <= index.upper), axis=1)):
+            seeds.append(point)
+
+    return np.array(seeds)
+
+
+def run_case(n_obstacles: int, density: float, n_seeds: int, n_repeat: int = N_REPEAT, **kwargs) -> list:
+    """
+    Compute the regions of n_seeds seeds in a field and return the statistics of every run, the times being the
+    minimum over n_repeat repetitions.
+    """
+
+    obstacles, half_side = generate_field(n_obstacles, density)
+    free_space = FreeSpace(obstacles, **kwargs)
+    runs = []
+    for i, seed in enumerate(free_seeds(obstacles, half_side, n_seeds)):
+        run = {'n_obstacles': n_obstacles, 'density': density, 'seed': i}
+        for _ in range(n_repeat):
+            free_space.update_free_space(seed)
+            for metric in METRICS:
+                value = free_space.stats.get(metric, 0)
+                run[metric] = min(run[metric], value) if metric in PHASES and metric in run else value
+        runs.append(run)
+
+    return runs
+
+
+def summarize(runs: list) -> dict:
+    """
+    Median of every metric for each (n_obstacles, density) case.
+    """
+
+    summary = {}
+    for run in runs:
+        key = "{}@{}".format(run['n_obstacles'], run['density'])
+        summary.setdefault(key, []).append([run[metric] for metric in METRICS])
+
+    return {key: dict(zip(METRICS, np.median(values, axis=0).tolist())) for key, values in summary.items()}
+
+
+def compare(summary: dict, baseline: dict, volume_tolerance: float = VOLUME_TOLERANCE) -> list:
+    """
+    Compare the deterministic medians with the baseline: iterations, planes and volume.
+    Returns:
+        list: description of every regression found
+    """
+
+    regressions = []
+    for key, medians in summary.items():
+        if key not in baseline:
+            continue
+        reference = baseline[key]
+        if medians['volume'] < reference['volume'] * (1 - volume_tolerance):
+            regressions.append("{}: volume {:.4f}, baseline {:.4f}".format(key, medians['volume'], reference['volume']))
+        for metric in ('iterations', 'n_planes'):
+            if medians[metric] > reference[metric]:
+                regressions.append("{}: {} {}, baseline {}".format(key, metric, medians[metric], reference[metric]))
+
+    return regressions
+
+
+def slowdowns(summary: dict, baseline: dict, time_tolerance: float = TIME_TOLERANCE) -> list:
+    """
+    Compare the median times with the baseline, for information only.
+    Returns:
+        list: description of every phase slower than the baseline by more than the tolerance
+    """
+
+    slower = []
+    for key, medians in summary.items():
+        if key not in baseline:
+            continue
+        for phase in PHASES:
+            if medians[phase] > baseline[key][phase] * (1 + time_tolerance):
+                slower.append("{}: {} {:.4f} s, baseline {:.4f} s".format(key, phase, medians[phase], baseline[key][phase]))
+
+    return slower
+
+
+def save_results(runs: list, summary: dict, output_dir: str):
+    """
+    Write every run to runs.csv and the runs together with the medians to results.json.
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, 'runs.csv'), 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=list(runs[0].keys()))
+        writer.writeheader()
+        writer.writerows(runs)
+    with open(os.path.join(output_dir, 'results.json'), 'w') as file:
+        json.dump({'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'summary': summary, 'runs': runs}, file, indent=2)
+
+    pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark FreeSpace.update_free_space on random box fields.")
+    parser.add_argument('--n-obstacles', type=int, nargs='+', default=N_OBSTACLES)
+    parser.add_argument('--densities', type=float, nargs='+', default=DENSITIES)
+    parser.add_argument('--n-seeds', type=int, default=N_SEEDS)
+    parser.add_argument('--n-repeat', type=int, default=N_REPEAT)
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help="store the medians as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=TIME_TOLERANCE, help="relative slowdown that is reported")
+    parser.add_argument('--volume-tolerance', type=float, default=VOLUME_TOLERANCE, help="allowed relative volume loss")
+    args = parser.parse_args()
+
+    runs = []
+    for n_obstacles in args.n_obstacles:
+        for density in args.densities:
+            case_runs = run_case(n_obstacles, density, args.n_seeds, args.n_repeat)
+            runs += case_runs
+            medians = summarize(case_runs)["{}@{}".format(n_obstacles, density)]
+            print("{:4d} obstacles, density {:.2f}: total {:.3f} s (hyperplanes {:.3f} s, closest point {:.3f} s, "
+                  "ellipsoid {:.3f} s), {:.0f} iterations, volume {:.3f}".format(
+                      n_obstacles, density, medians['time'], medians['time_hyperplanes'], medians['time_closest_point'],
+                      medians['time_ellipsoid'], medians['iterations'], medians['volume']))
+
+    summary = summarize(runs)
+    save_results(runs, summary, args.output_dir)
+    print("Results written to {}".format(args.output_dir))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w') as file:
+            json.dump(summary, file, indent=2)
+        print("Baseline written to {}".format(args.baseline))
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        for slower in slowdowns(summary, baseline, time_tolerance=args.tolerance):
+            print("SLOWER " + slower)
+        regressions = compare(summary, baseline, volume_tolerance=args.volume_tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if len(regressions) > 0:
+            sys.exit(1)
+        print("No regressions with respect to {}".format(args.baseline))
+    else:
+        print("No baseline found in {}, run with --save-baseline to store one".format(args.baseline))
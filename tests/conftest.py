@@ -0,0 +1,11 @@
+"""
+    Configuration of pytest: the modules are imported from the root of the repository and the scripts of this directory
+    that are not tests are not collected.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+collect_ignore = ['test_free_space.py'] # manual script importing the old package layout
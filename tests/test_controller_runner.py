@@ -0,0 +1,135 @@
+"""
+    Asynchronous execution of the MPC controller: the solver only takes the latest state, the simulation loop never
+    waits for an action, and stopping the runner or a failing solve are seen by the simulation loop.
+"""
+
+import time
+import threading
+import numpy as np
+import pytest
+
+from controller_runner import ControllerRunner
+
+TIMEOUT = 5.0 # seconds to wait for the solver thread before failing
+
+
+class BlockingSolve:
+    """
+    Solve function returning the state as the action, which waits for a release before each solve.
+    """
+
+    def __init__(self) -> None:
+        self.states = []
+        self.started = threading.Semaphore(0)
+        self.release = threading.Semaphore(0)
+        self.done = threading.Semaphore(0)
+
+        pass
+
+    def __call__(self, state: np.ndarray, goal: np.ndarray) -> np.ndarray:
+        self.states.append(state[0])
+        self.started.release()
+        assert self.release.acquire(timeout=TIMEOUT), "The solve was never released."
+        self.done.release()
+
+        return state + goal
+
+    def step(self):
+        """
+        Wait for the next solve to start, let it finish, and wait for its action to be published.
+        """
+
+        assert self.started.acquire(timeout=TIMEOUT), "No solve started."
+        self.release.release()
+        assert self.done.acquire(timeout=TIMEOUT)
+
+        pass
+
+
+def wait_for_action(runner: ControllerRunner, expected: float):
+    """
+    Wait until the published action is the expected one.
+    """
+
+    for _ in range(int(TIMEOUT / 0.001)):
+        action = runner.action()
+        if action is not None and action[0] == expected:
+            return
+        time.sleep(0.001)
+    pytest.fail(f"The action {expected} was never published.")
+
+
+def test_stale_states_are_dropped():
+    solve = BlockingSolve()
+    with ControllerRunner(solve) as runner:
+        runner.submit(np.array([1.0]), np.zeros(1), 0)
+        assert solve.started.acquire(timeout=TIMEOUT)
+        for tick in (1, 2, 3): # published while the first solve runs
+            runner.submit(np.array([tick + 1.0]), np.zeros(1), tick)
+        solve.release.release()
+        assert solve.done.acquire(timeout=TIMEOUT)
+        solve.step()
+        wait_for_action(runner, 4.0)
+        assert runner.action(5)[0] == 4.0
+
+    assert solve.states == [1.0, 4.0], "The solver did not take the latest state."
+    summary = runner.summary()
+    assert summary['solves'] == 2 and summary['skipped'] == 2
+    assert summary['action_age']['max'] == 2 # the action of tick 3 read at tick 5
+
+
+def test_action_before_the_first_solve():
+    solve = BlockingSolve()
+    with ControllerRunner(solve, n_dofs=3) as runner:
+        runner.submit(np.ones(3), np.ones(3), 0)
+        assert solve.started.acquire(timeout=TIMEOUT)
+        np.testing.assert_array_equal(runner.action(0), np.zeros(3)) # does not wait for the running solve
+        assert runner.age() is None
+        solve.release.release()
+        assert solve.done.acquire(timeout=TIMEOUT)
+        wait_for_action(runner, 2.0)
+        np.testing.assert_array_equal(runner.action(1), 2.0 * np.ones(3))
+
+    assert ControllerRunner(solve).action() is None
+
+
+def test_stop_joins_the_thread():
+    solve = BlockingSolve()
+    runner = ControllerRunner(solve).start()
+    thread = runner._thread
+    runner.submit(np.array([1.0]), np.zeros(1), 0)
+    assert solve.started.acquire(timeout=TIMEOUT)
+
+    stopper = threading.Thread(target=runner.stop)
+    stopper.start()
+    stopper.join(0.05)
+    assert stopper.is_alive(), "stop did not wait for the running solve."
+    solve.release.release()
+    stopper.join(TIMEOUT)
+    assert not stopper.is_alive() and not thread.is_alive()
+    assert runner.summary()['solves'] == 1
+
+    runner.stop() # stopping twice does nothing
+    runner.start().stop() # and the runner can be restarted
+    assert not runner._thread
+
+
+def test_solve_exception_reaches_the_simulation_loop():
+    def solve(state, goal):
+        if state[0] > 1.0:
+            raise RuntimeError("solver crashed")
+        return state
+
+    runner = ControllerRunner(solve).start()
+    runner.submit(np.array([1.0]), np.zeros(1), 0)
+    wait_for_action(runner, 1.0)
+    runner.submit(np.array([2.0]), np.zeros(1), 1)
+    runner._thread.join(TIMEOUT)
+
+    assert not runner._thread.is_alive(), "The solver thread keeps running after the error."
+    with pytest.raises(RuntimeError, match="solver crashed"):
+        runner.action(2)
+    with pytest.raises(RuntimeError):
+        runner.action(3)
+    runner.stop()
+    assert runner.summary()['failures'] == 1
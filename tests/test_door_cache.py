@@ -0,0 +1,86 @@
+"""
+    Cache of the obstacle data per door configuration of the house: keys independent of the order of the door states,
+    LRU eviction, and entries that stay valid when the doors of the house move but not when walls or furniture change.
+"""
+
+import numpy as np
+import pytest
+
+house = pytest.importorskip('house') # requires gym and MotionPlanningEnv
+from house import House, DoorStateCache
+
+ROBOT_DIM = np.array([0.3, 0.2])
+
+
+class Env:
+    """
+    Environment that does not draw anything.
+    """
+
+    def add_shapes(self, **kwargs):
+        pass
+
+
+@pytest.fixture
+def house_with_doors() -> House:
+    house = House(Env(), robot_dim=ROBOT_DIM, scale=1.0)
+    house.generate_walls()
+    house.generate_doors()
+    return house
+
+
+def states(house: House, open_rooms: set) -> dict:
+    return {room: room in open_rooms for room in house._doors}
+
+
+def test_key_does_not_depend_on_the_order_of_the_rooms(house_with_doors):
+    cache = house_with_doors.door_cache
+    is_open = states(house_with_doors, {'kitchen', 'outdoor'})
+    reordered = dict(reversed(list(is_open.items())))
+    only_open = {'outdoor': True, 'kitchen': True}
+
+    assert cache.mask(is_open) == cache.mask(reordered) == cache.mask(only_open)
+    constraints = cache.get(is_open, 'constraints')
+    assert cache.get(reordered, 'constraints') is constraints
+    assert cache.get(only_open, 'constraints') is constraints
+    assert (cache.hits, cache.misses, len(cache)) == (2, 1, 1)
+
+
+def test_least_recently_used_configuration_is_evicted(house_with_doors):
+    cache = DoorStateCache(house_with_doors, max_size=2)
+    rooms = list(house_with_doors._doors)
+    first, second, third = ({room: True} for room in rooms[:3])
+
+    cache.get(first, 'vertices')
+    cache.get(second, 'vertices')
+    cache.get(first, 'vertices') # the second configuration becomes the least recently used
+    cache.get(third, 'vertices')
+
+    assert len(cache) == 2
+    misses = cache.misses
+    cache.get(first, 'vertices')
+    assert cache.misses == misses, "The most recently used configuration was evicted."
+    cache.get(second, 'vertices')
+    assert cache.misses == misses + 1, "The least recently used configuration was kept."
+
+
+def test_entries_follow_the_version_of_the_house(house_with_doors):
+    cache = house_with_doors.door_cache
+    is_open = states(house_with_doors, {'bathroom'})
+    b, A = cache.get(is_open, 'constraints')
+
+    # moving the doors of the house does not change the data of a configuration
+    house_with_doors.set_door_obstacles(house_with_doors.Obstacles, states(house_with_doors, set(house_with_doors._doors)))
+    assert cache.get(is_open, 'constraints')[0] is b
+    house_with_doors.set_door_obstacles(house_with_doors.Obstacles, is_open)
+    b_live, A_live = house_with_doors.Obstacles.generateConstraintsCylinder()
+    np.testing.assert_allclose(b, b_live)
+    np.testing.assert_allclose(A, A_live)
+
+    # new furniture invalidates every configuration
+    cache.get(states(house_with_doors, set()), 'vertices')
+    house_with_doors.add_furniture_box('box', [0.5, 0.5], [0.4, 0.4, 0.4])
+    b_new, _ = cache.get(is_open, 'constraints')
+    assert len(cache) == 1, "The configurations computed before the furniture changed were kept."
+    assert len(b_new) == len(b) + 4
+    np.testing.assert_allclose(b_new, house_with_doors.Obstacles.generateConstraintsCylinder()[0])
@@ -0,0 +1,64 @@
+"""
+    Maximum volume inscribed ellipsoid of the barrier method, checked against the conic formulation solved by cvxpy,
+    and its warm start from a previous solution.
+"""
+
+import numpy as np
+import pytest
+import cvxpy as cp
+
+from free_space import max_volume_inscribed_ellipsoid
+
+
+def polytope(dim: int, n_planes: int, seed: int = 0) -> tuple:
+    """
+    Random polytope containing the origin, bounded by a box.
+    """
+
+    rng = np.random.default_rng(seed)
+    A = np.vstack((np.eye(dim), -np.eye(dim), rng.normal(size=(n_planes, dim))))
+    b = np.concatenate((rng.uniform(1., 3., 2 * dim), rng.uniform(0.5, 2., n_planes)))
+    return A, b
+
+
+def cvxpy_ellipsoid(A: np.ndarray, b: np.ndarray) -> tuple:
+    dim = A.shape[1]
+    C = cp.Variable((dim, dim), PSD=True)
+    d = cp.Variable(dim)
+    constraints = [cp.norm(C @ A[i]) + A[i] @ d <= b[i] for i in range(len(b))]
+    cp.Problem(cp.Maximize(cp.log_det(C)), constraints).solve()
+    return C.value, d.value
+
+
+@pytest.mark.parametrize('dim, n_planes', [(2, 6), (3, 10)])
+def test_max_volume_inscribed_ellipsoid_matches_cvxpy(dim, n_planes):
+    A, b = polytope(dim, n_planes)
+    C, d, iterations = max_volume_inscribed_ellipsoid(A, b, 0.1 * np.eye(dim), np.zeros(dim))
+    C_ref, d_ref = cvxpy_ellipsoid(A, b)
+
+    assert iterations > 0
+    assert abs(np.linalg.slogdet(C)[1] - np.linalg.slogdet(C_ref)[1]) < 1e-3
+    np.testing.assert_allclose(C, C_ref, atol=1e-2)
+    np.testing.assert_allclose(d, d_ref, atol=1e-2)
+    assert np.all(np.linalg.norm(A @ C, axis=1) + A @ d <= b + 1e-9), "The ellipsoid is not inside the polytope."
+
+
+@pytest.mark.parametrize('dim, n_planes', [(2, 6), (3, 10)])
+def test_warm_start_takes_fewer_steps(dim, n_planes):
+    A, b = polytope(dim, n_planes)
+    C, d, cold = max_volume_inscribed_ellipsoid(A, b, 0.1 * np.eye(dim), np.zeros(dim))
+
+    # same polytope, and a new hyperplane close to the ellipsoid as added by an iteration of IRIS
+    a = np.ones(dim) / np.sqrt(dim)
+    for A_warm, b_warm in ((A, b), (np.vstack((A, a)), np.append(b, np.linalg.norm(C @ a) + a @ d + 0.05))):
+        _, _, cold = max_volume_inscribed_ellipsoid(A_warm, b_warm, 0.1 * np.eye(dim), np.zeros(dim))
+        C_warm, d_warm, warm = max_volume_inscribed_ellipsoid(A_warm, b_warm, C, d)
+        C_ref, _ = cvxpy_ellipsoid(A_warm, b_warm)
+
+        assert warm < cold, f"Warm start took {warm} Newton steps, cold start {cold}."
+        assert abs(np.linalg.slogdet(C_warm)[1] - np.linalg.slogdet(C_ref)[1]) < 1e-3
+
+
+def test_max_volume_inscribed_ellipsoid_outside_center():
+    A, b = polytope(3, 0)
+    assert max_volume_inscribed_ellipsoid(A, b, np.eye(3), np.array([5., 0., 0.])) is None
@@ -0,0 +1,49 @@
+"""
+    Condensed formulation of the MPC: the states expressed as a function of the initial state and of the inputs must be
+    the ones of the single integrator rolled out step by step.
+"""
+
+import numpy as np
+import pytest
+from casadi import MX, Function
+
+from mpc_constraints import DENSE_CONDENSING_HORIZON, condensed_states, prediction_matrix
+
+N_DOFS = 3
+DT = 0.1
+
+
+def integrator(state0: np.ndarray, u: np.ndarray, dt: float) -> np.ndarray:
+    x = [state0]
+    for k in range(u.shape[1]):
+        x.append(x[-1] + dt * u[:, k])
+    return np.stack(x, axis=1)
+
+
+def evaluate(state0: np.ndarray, u: np.ndarray, method: str) -> np.ndarray:
+    state0_symbol = MX.sym('state0', N_DOFS, 1)
+    u_symbol = MX.sym('u', N_DOFS, u.shape[1])
+    states = Function('states', [state0_symbol, u_symbol], [condensed_states(state0_symbol, u_symbol, DT, method)])
+    return states(state0, u).full()
+
+
+@pytest.mark.parametrize('method', ['dense', 'sparse', None])
+@pytest.mark.parametrize('N', [1, 10, DENSE_CONDENSING_HORIZON + 5])
+def test_condensed_states_match_integrator(method, N):
+    rng = np.random.default_rng(N)
+    state0 = rng.normal(size=N_DOFS)
+    u = rng.normal(size=(N_DOFS, N))
+
+    x = evaluate(state0, u, method)
+    assert x.shape == (N_DOFS, N + 1)
+    np.testing.assert_allclose(x, integrator(state0, u, DT), atol=1e-12)
+
+
+def test_prediction_matrix():
+    u = np.random.default_rng(0).normal(size=(N_DOFS, 4))
+    np.testing.assert_allclose(u @ prediction_matrix(4, DT), integrator(np.zeros(N_DOFS), u, DT), atol=1e-12)
+
+
+def test_unknown_condensing_method():
+    with pytest.raises(AssertionError):
+        condensed_states(MX.sym('state0', N_DOFS, 1), MX.sym('u', N_DOFS, 4), DT, 'banded')
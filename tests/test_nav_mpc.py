@@ -0,0 +1,52 @@
+"""
+    Linear obstacle mode of the navigation MPC: a base that starts closer than CLEARANCE1 to a hyperplane has to move
+    away from it, the problem must not become infeasible because of the fixed initial state, and a failed solve falls
+    back to the shifted previous solution instead of stopping the simulation.
+"""
+
+import numpy as np
+import pytest
+
+model = pytest.importorskip('model') # requires gym_envs_urdf
+from nav_MPC import MPController, CLEARANCE1
+
+ROBOT_DIM = np.array([0.3, 0.2]) # height and radius of the base, as in nav_run.py
+A = np.array([[1., 0.]]) # wall x <= 0.25, the base at the origin is inside its clearance band
+B = np.array([0.25])
+
+
+@pytest.mark.parametrize('solver', ['ipopt', 'osqp'])
+@pytest.mark.parametrize('condensed', [False, True])
+def test_start_inside_the_clearance(solver, condensed):
+    controller = MPController(model.Model(dim=ROBOT_DIM), (4, 2), obstacle_mode='linear', solver=solver,
+                              condensed=condensed)
+    state0 = np.zeros(7)
+    controller.add_obstacle_avoidance_constraints(A, B, state0[:2])
+    controller.opti.set_value(controller.state0, state0)
+
+    action = controller.solve_MPC(np.zeros(7)) # the goal is the initial state
+    x = controller.opti.debug.value(controller.x)
+    assert controller.statistics.summary()['failures'] == 0
+    assert action[0] < 0, "The base does not move away from the wall."
+    assert np.all(x[0, 1:] <= B[0] - CLEARANCE1 + 1e-3), "The predicted positions are within the clearance."
+
+
+@pytest.mark.parametrize('solver', ['ipopt', 'osqp'])
+def test_failed_solve_falls_back_to_the_shifted_solution(solver):
+    controller = MPController(model.Model(dim=ROBOT_DIM), (4, 2), obstacle_mode='linear', solver=solver)
+    state0 = np.zeros(7)
+    goal = np.array([2., 1., 0., 0., 0., 0., 0.])
+    assert np.all(controller.fallback_action() == 0), "Without a solution the base should stand still."
+
+    controller.add_obstacle_avoidance_constraints(A, B + 10., state0[:2])
+    controller.opti.set_value(controller.state0, state0)
+    controller.solve_MPC(goal)
+    inputs = controller.warm_start.prev_solution_u.copy()
+
+    # x <= -1 and x >= 1, infeasible at every step
+    controller.set_obstacle_constraints(np.array([[1., 0.], [-1., 0.]]), np.array([-1., -1.]) + CLEARANCE1)
+    for k in (1, 2):
+        np.testing.assert_allclose(controller.solve_MPC(goal), inputs[:, k])
+    summary = controller.statistics.summary()
+    assert summary['solves'] == 3 and summary['failures'] == 2
+    assert 'unknown' not in summary['status'], f"The return status of the failures is missing: {summary['status']}."
@@ -0,0 +1,89 @@
+"""
+    Selection of the K surfaces nearest to the base passed to the navigation MPC: the KD-tree query must return the same
+    surfaces as a scan of all of them, one facing surface per obstacle, padded with inactive rows.
+"""
+
+import numpy as np
+
+from ObstacleConstraintGenerator import ObstacleConstraintsGenerator, INACTIVE_OFFSET, SIDES, SURFACE_RADIUS
+from obstacle_table import WALL, FURNITURE
+
+ROBOT_DIM = np.array([0.3, 0.2])
+
+
+def obstacles(boxes: list) -> ObstacleConstraintsGenerator:
+    """
+    Generator with the given boxes (x, y, half width, half length) as furnitures, and a long wall.
+    """
+
+    generator = ObstacleConstraintsGenerator(robot_dim=ROBOT_DIM, scale=1.0)
+    generator.addObstacle(WALL, x=0.0, y=-6.0, width=12.0, length=0.1, height=2.0)
+    for x, y, half_width, half_length in boxes:
+        generator.addObstacle(FURNITURE, x=x, y=y, width=2*half_width, length=2*half_length, height=1.0)
+    generator.generateConstraintsCylinder()
+
+    return generator
+
+
+def scan(generator: ObstacleConstraintsGenerator, pos: np.ndarray, K: int, radius: float = SURFACE_RADIUS) -> list:
+    """
+    Rows of the surfaces nearest to the position found by checking every surface.
+    """
+
+    best = {} # obstacle -> (separation, distance, row)
+    for row in range(len(generator.constraints)):
+        normal = generator.normals[row]
+        separation = generator.constraints[row] - normal @ pos
+        tangent = np.array([-normal[1], normal[0]])
+        point = generator.surfaces[row, 0]
+        along = np.clip((pos - point) @ tangent, -generator.surface_lengths[row], generator.surface_lengths[row])
+        distance = np.linalg.norm(pos - point - along * tangent)
+        if separation >= 0 and distance <= radius and separation > best.get(row // SIDES, (-1,))[0]:
+            best[row // SIDES] = (separation, distance, row)
+
+    return [row for _, _, row in sorted(best.values(), key=lambda value: value[1])[:K]]
+
+
+def test_nearest_surfaces_match_a_scan():
+    rng = np.random.default_rng(0)
+    boxes = [(x, y, w, l) for x, y, w, l in zip(rng.uniform(-5, 5, 30), rng.uniform(-5, 5, 30),
+                                                rng.uniform(0.1, 0.6, 30), rng.uniform(0.1, 0.6, 30))]
+    generator = obstacles(boxes)
+    lower = np.array([[x - w, y - l] for x, y, w, l in boxes])
+    upper = np.array([[x + w, y + l] for x, y, w, l in boxes])
+
+    n_checked = 0
+    for pos in rng.uniform(-5, 5, size=(200, 2)):
+        if np.any(np.all((pos >= lower) & (pos <= upper), axis=1)): # inside an obstacle
+            continue
+        A, b = generator.nearestSurfaces(pos, 5)
+        rows = scan(generator, pos, 5)
+        np.testing.assert_allclose(A[:len(rows)], generator.normals[rows])
+        np.testing.assert_allclose(b[:len(rows)], generator.constraints[rows])
+        assert np.all(b[len(rows):] == INACTIVE_OFFSET)
+        n_checked += 1
+    assert n_checked > 100
+
+
+def test_one_facing_surface_per_obstacle():
+    generator = obstacles([(2.0, 2.0, 0.5, 0.5)])
+    pos = np.array([0.0, 1.0]) # left of the box and below its top side
+
+    A, b = generator.nearestSurfaces(pos, 4)
+    np.testing.assert_allclose(A[0], [1.0, 0.0]) # the left side, the farthest plane separating the position from the box
+    assert b[0] == 1.5
+    assert np.all(A[:, None, :] @ pos[:, None] <= b[:, None, None]), "A surface does not face the position."
+    np.testing.assert_allclose(A[1:], 0.0)
+
+
+def test_padding_with_inactive_rows():
+    generator = obstacles([(2.0, 2.0, 0.5, 0.5)])
+
+    A, b = generator.nearestSurfaces(np.array([0.0, 1.0]), 6)
+    assert A.shape == (6, 2) and b.shape == (6,)
+    np.testing.assert_allclose(A[1:], 0.0)
+    np.testing.assert_allclose(b[1:], INACTIVE_OFFSET)
+
+    A, b = generator.nearestSurfaces(np.array([30.0, 30.0]), 3) # nothing within the radius
+    np.testing.assert_allclose(A, 0.0)
+    np.testing.assert_allclose(b, INACTIVE_OFFSET)
@@ -0,0 +1,99 @@
+"""
+    Culling of the obstacles of the free space computation with ObstacleIndex: the index finds the same obstacles as a
+    check of every bounding box, including the large obstacles kept out of the KD-tree, culling does not change the
+    hyperplanes of the obstacles inside the culling box, and the culled regions stay free of every obstacle.
+"""
+
+import numpy as np
+import pytest
+
+import free_space
+from free_space import FreeSpace, ObstacleIndex, Ellipsoid, CHECK_TOLLERANCE
+from benchmark_free_space import box, generate_field, free_seeds, CEILING
+
+N_OBSTACLES = 60
+DENSITY = 0.4
+
+
+def field(dim: int, seed: int) -> tuple:
+    """
+    Field of random boxes with a floor, a ceiling and four walls along its sides, or their footprints in 2D.
+    """
+
+    obstacles, half_side = generate_field(N_OBSTACLES, DENSITY, seed)
+    side = half_side + 0.1
+    for lower, upper in (((-side, -side), (side, -half_side)), ((-side, half_side), (side, side)),
+                         ((-side, -side), (-half_side, side)), ((half_side, -side), (side, side))):
+        obstacles.append(box(np.array(lower + (0.,)), np.array(upper + (CEILING,))))
+    if dim == 2:
+        obstacles = [obs[:4, :2] for obs in obstacles[2:]] # the floor and the ceiling would cover the whole field
+
+    return obstacles, half_side
+
+
+def ellipsoids(obstacles: list, half_side: float, n: int, seed: int) -> list:
+    """
+    Random ellipsoids centered in free points of the field, with semi-axes between 0.1 and 0.5.
+    """
+
+    rng = np.random.default_rng(seed)
+    dim = np.shape(obstacles[0])[-1]
+    if dim == 2: # extrude the footprints between the floor and the ceiling
+        obstacles = [np.vstack((np.hstack((obs, np.zeros((4, 1)))), np.hstack((obs, np.full((4, 1), CEILING)))))
+                     for obs in obstacles]
+    centers = free_seeds(obstacles, half_side, n, seed)
+    result = []
+    for center in centers:
+        rotation, _ = np.linalg.qr(rng.normal(size=(dim, dim)))
+        result.append(Ellipsoid(center[:dim], rotation @ np.diag(rng.uniform(0.1, 0.5, dim)) @ rotation.T))
+
+    return result
+
+
+@pytest.mark.parametrize('dim', [2, 3])
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_query_box_matches_a_check_of_every_obstacle(dim, seed):
+    obstacles, half_side = field(dim, seed)
+    index = ObstacleIndex(obstacles)
+    lower = np.array([np.min(obs, axis=0) for obs in obstacles])
+    upper = np.array([np.max(obs, axis=0) for obs in obstacles])
+    assert index.large.size >= 4, "The walls should be kept out of the KD-tree."
+
+    rng = np.random.default_rng(seed)
+    for _ in range(200):
+        center = rng.uniform(-1.2 * half_side, 1.2 * half_side, dim)
+        half_size = rng.uniform(0.05, half_side)
+        expected = np.flatnonzero(np.all((lower <= center + half_size) & (upper >= center - half_size), axis=1))
+        assert index.query_box(center, half_size) == expected.tolist()
+
+
+@pytest.mark.parametrize('dim', [2, 3])
+def test_culling_box_covering_the_field_keeps_the_hyperplanes(dim, monkeypatch):
+    obstacles, half_side = field(dim, 0)
+    culled = FreeSpace(obstacles, cull=True)
+    full = FreeSpace(obstacles, cull=False)
+    monkeypatch.setattr(free_space, 'CULL_RADIUS', 4 * half_side)
+
+    for ellipsoid in ellipsoids(obstacles, half_side, 10, 0):
+        culled.ellipsoid = full.ellipsoid = ellipsoid
+        culled.separating_hyperplanes()
+        full.separating_hyperplanes()
+
+        # the same hyperplanes in the same order, followed by the faces of the culling box
+        assert len(culled.A) == len(full.A) + 2 * dim
+        np.testing.assert_array_equal(culled.A[:len(full.A)], full.A)
+        np.testing.assert_array_equal(culled.b[:len(full.b)], full.b)
+
+
+@pytest.mark.parametrize('dim', [2, 3])
+def test_culled_regions_are_free(dim):
+    obstacles, half_side = field(dim, 1)
+    culled = FreeSpace(obstacles, cull=True, remove_redundant=False)
+
+    for ellipsoid in ellipsoids(obstacles, half_side, 5, 1):
+        A, b = culled.update_free_space(ellipsoid.d)
+        A, b = np.array(A), np.array(b)
+        for i, obs in enumerate(obstacles):
+            # some hyperplane keeps every vertex of the obstacle on its outer side
+            separated = np.all(obs @ A.T >= b - CHECK_TOLLERANCE, axis=0)
+            assert np.any(separated), f"Obstacle {i} intersects the region of the seed {ellipsoid.d}."
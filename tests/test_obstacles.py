@@ -0,0 +1,76 @@
+"""
+    Incremental updates of the obstacles: after moving some of them, the constraints and the vertices of the generator
+    must be the same as the ones computed from scratch, and every change must be recorded in the version.
+"""
+
+import numpy as np
+
+from ObstacleConstraintGenerator import ObstacleConstraintsGenerator
+from obstacle_table import WALL, DOOR, FURNITURE, KNOB
+
+ROBOT_DIM = np.array([0.3, 0.2])
+N_DOORS = 3
+
+
+def house_obstacles() -> ObstacleConstraintsGenerator:
+    obstacles = ObstacleConstraintsGenerator(robot_dim=ROBOT_DIM, scale=1.0)
+    for i in range(4):
+        obstacles.addObstacle(WALL, x=2.0*i, y=0.0, width=2.0, length=0.1, height=2.0)
+    for i in range(N_DOORS):
+        obstacles.addObstacle(DOOR, x=2.0*i + 1.0, y=1.0, width=0.8, length=0.05, height=2.0)
+        obstacles.addObstacle(KNOB, x=2.0*i + 1.3, y=1.1, z=1.0, width=0.05, length=0.05, height=0.05)
+    obstacles.addObstacle(FURNITURE, x=1.0, y=3.0, width=1.0, length=0.5, height=0.8)
+
+    return obstacles
+
+
+def open_doors(obstacles: ObstacleConstraintsGenerator):
+    """
+    Open every door and move its knob, in the order of House.set_door_obstacles.
+    """
+
+    for i in range(N_DOORS):
+        obstacles.updateDoor(i, x=2.0*i + 1.4, y=1.4, theta=0.5*np.pi)
+        obstacles.updateObstacle(KNOB, i, x=2.0*i + 1.5, y=1.7, theta=0.5*np.pi)
+
+
+def test_multi_door_update_patches_vertices():
+    obstacles = house_obstacles()
+    obstacles.getVertices()
+    patched = []
+    set_vertices = obstacles.setVertices
+    obstacles.setVertices = lambda vertices, offsets: patched.append(offsets) or set_vertices(vertices, offsets)
+    open_doors(obstacles)
+
+    assert len(patched) == N_DOORS, f"{len(patched)} of the {N_DOORS} door updates patched the vertices."
+    vertices = obstacles.getVertices()
+    assert len(patched) == N_DOORS, "The patched vertices were computed again."
+    reference = ObstacleConstraintsGenerator(robot_dim=ROBOT_DIM, scale=1.0)
+    reference.table = obstacles.table.take(np.arange(len(obstacles.table)))
+    np.testing.assert_allclose(vertices, reference.getVertices())
+
+
+def test_multi_door_update_patches_constraints():
+    obstacles = house_obstacles()
+    obstacles.generateConstraintsCylinder()
+    open_doors(obstacles)
+    reference = obstacles.copy()
+
+    np.testing.assert_allclose(obstacles.constraints, reference.generateConstraintsCylinder()[0])
+
+
+def test_changes_are_recorded():
+    obstacles = house_obstacles()
+    assert obstacles.changedSince(0) == [(WALL, i) for i in range(4)] + \
+        [(category, i) for i in range(N_DOORS) for category in (DOOR, KNOB)] + [(FURNITURE, 0)]
+
+    version = obstacles.version
+    obstacles.generateConstraintsCylinder()
+    obstacles.addObstacle(FURNITURE, x=3.0, y=3.0, width=1.0, length=0.5, height=0.8)
+    obstacles.updateDoor(1, x=3.4, y=1.4, theta=0.5*np.pi)
+    assert obstacles.changedSince(version) == [(FURNITURE, 1), (DOOR, 1)]
+    assert obstacles.updateDoor(1, x=3.4, y=1.4, theta=0.5*np.pi) is False # unchanged, no new version
+    assert obstacles.changedSince(version) == [(FURNITURE, 1), (DOOR, 1)]
+
+    np.testing.assert_allclose(obstacles.generateConstraintsCylinder()[0],
+                               obstacles.copy().generateConstraintsCylinder()[0])
@@ -0,0 +1,76 @@
+"""
+    Hyperplanes passed to the MPC controllers as parameters of fixed size: normalized rows, whose offsets are distances,
+    so that the clearances are kept in meters, and neutral padded rows that never constrain the robot.
+"""
+
+import numpy as np
+import pytest
+from casadi import Opti, sumsqr
+
+from free_space import PAD_OFFSET, pad_hyperplanes
+from mpc_constraints import add_hyperplane_constraints
+
+CLEARANCE = 0.3
+N_PLANES = 4
+
+
+def closest_feasible(A: list, b: list, target: np.ndarray, clearance: float = CLEARANCE) -> tuple:
+    """
+    Point closest to the target that keeps the clearance from the padded hyperplanes, and the multipliers of the rows.
+    """
+
+    opti = Opti()
+    p = opti.variable(len(target), 1)
+    A_param = opti.parameter(N_PLANES, len(target))
+    b_param = opti.parameter(N_PLANES, 1)
+    add_hyperplane_constraints(opti, A_param, b_param, p, clearance)
+    opti.minimize(sumsqr(p - target))
+    A_padded, b_padded = pad_hyperplanes(A, b, N_PLANES)
+    opti.set_value(A_param, A_padded)
+    opti.set_value(b_param, b_padded)
+    opti.solver('ipopt', dict(print_time=False), dict(print_level=0, tol=1e-10))
+    solution = opti.solve()
+
+    return solution.value(p), solution.value(opti.lam_g)
+
+
+def test_pad_hyperplanes_normalizes_and_pads():
+    A, b = pad_hyperplanes([[2., 0.], [0., -4.], [0., 0.]], [2., 4., 1.], 5)
+
+    np.testing.assert_allclose(A, [[1., 0.], [0., -1.], [0., 0.], [0., 0.], [0., 0.]])
+    np.testing.assert_allclose(b, [1., 1., 1., PAD_OFFSET, PAD_OFFSET])
+
+
+def test_pad_hyperplanes_keeps_the_closest():
+    A, b = pad_hyperplanes([[1., 0.], [-1., 0.], [0., 1.]], [1., 3., 2.], 2, pos=np.array([0.5, 0.]))
+
+    np.testing.assert_allclose(A, [[1., 0.], [0., 1.]])
+    np.testing.assert_allclose(b, [1., 2.])
+    with pytest.raises(AssertionError):
+        pad_hyperplanes([[1., 0.], [-1., 0.], [0., 1.]], [1., 3., 2.], 2)
+
+
+@pytest.mark.parametrize('scale', [0.1, 1., 25.])
+def test_clearance_is_a_distance(scale):
+    # the wall x + y <= 2, given with a normal of arbitrary length as returned by FreeSpace.tangent_plane
+    normal = np.array([1., 1.]) / np.sqrt(2)
+    p, _ = closest_feasible([scale * np.array([1., 1.])], [scale * 2.], np.array([3., 3.]))
+
+    assert 2. / np.sqrt(2) - normal @ p == pytest.approx(CLEARANCE, abs=1e-6)
+
+
+def test_padded_rows_stay_inactive():
+    target = np.array([-50., 80.]) # far from the origin, but well within PAD_OFFSET
+    p, lam_g = closest_feasible([[1., 0.]], [1.], target)
+
+    np.testing.assert_allclose(p, target, atol=1e-6)
+    np.testing.assert_allclose(lam_g, 0., atol=1e-8)
+
+
+def test_arm_clearances_fit_between_floor_and_ceiling():
+    arm_MPC = pytest.importorskip('arm_MPC') # requires gym_envs_urdf
+    from ObstacleConstraintGenerator import CEILING_HEIGHT
+
+    height = arm_MPC.d1 + arm_MPC.offset_z # height of the center of the first sphere, which does not move vertically
+    assert height - arm_MPC.CLEARANCE1 >= 0., "The first sphere cannot keep its clearance from the floor."
+    assert height + arm_MPC.CLEARANCE1 <= CEILING_HEIGHT, "The first sphere cannot keep its clearance from the ceiling."
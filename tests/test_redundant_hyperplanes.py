@@ -0,0 +1,55 @@
+"""
+    Reduction of the hyperplanes of the free space regions: only the facets of the region are kept, or the hyperplanes
+    closest to the robot when their number is limited.
+"""
+
+import numpy as np
+
+from free_space import FreeSpace
+
+
+def cube(half_side: float = 1.) -> tuple:
+    A = np.vstack((np.eye(3), -np.eye(3)))
+    return A, half_side * np.ones(6)
+
+
+def normalized(A: list, b: list) -> set:
+    return {tuple(np.round(np.append(a, offset) / np.linalg.norm(a), 6)) for a, offset in zip(A, b)}
+
+
+def test_remove_redundant_hyperplanes():
+    A, b = cube()
+    corner = np.array([1., 1., 0.]) / np.sqrt(2) # cuts the edge x = y = 1 of the cube
+    free_space = FreeSpace([], pos0=np.zeros(3))
+    free_space.A = list(A) + [2 * np.eye(3)[0], np.eye(3)[1], np.ones(3), corner]
+    free_space.b = list(b) + [2., 1.5, 10., 1.2]
+    free_space.remove_redundant_hyperplanes()
+
+    expected = normalized(np.vstack((A, corner)), np.append(b, 1.2))
+    assert len(free_space.A) == len(expected), f"{len(free_space.A)} hyperplanes kept, expected {len(expected)}."
+    assert normalized(free_space.A, free_space.b) == expected
+
+
+def test_remove_redundant_hyperplanes_keeps_the_region():
+    rng = np.random.default_rng(0)
+    A = rng.normal(size=(30, 3))
+    b = rng.uniform(0.5, 2., 30)
+    free_space = FreeSpace([], pos0=np.zeros(3))
+    free_space.A, free_space.b = list(A), list(b)
+    free_space.remove_redundant_hyperplanes()
+
+    assert len(free_space.b) < len(b)
+    points = rng.uniform(-3., 3., size=(10000, 3))
+    inside = np.all(points @ A.T <= b, axis=1)
+    inside_reduced = np.all(points @ np.array(free_space.A).T <= np.array(free_space.b), axis=1)
+    np.testing.assert_array_equal(inside_reduced, inside)
+
+
+def test_closest_hyperplanes():
+    A, b = cube()
+    free_space = FreeSpace([], pos0=np.zeros(3))
+    free_space.A = list(3 * A) # the distances do not depend on the scale of the normals
+    free_space.b = list(3 * b)
+    free_space.closest_hyperplanes(np.array([0.8, -0.5, 0.]), 2)
+
+    assert normalized(free_space.A, free_space.b) == normalized(A[[0, 4]], b[[0, 4]])
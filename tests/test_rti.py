@@ -0,0 +1,73 @@
+"""
+    Real-time iteration of an Opti problem: a step taken from a converged solution stays at that solution, and a step of
+    a linear-quadratic problem reaches its solution from any initial guess.
+"""
+
+import numpy as np
+import pytest
+from casadi import Opti, cos, sin, sumsqr, vertcat
+
+from rti import RTISolver
+
+N = 10 # horizon
+DT = 0.2
+TOLERANCE = 1e-4 # accuracy of the QP solver, QP_OPTIONS
+
+
+def unicycle(linear: bool = False) -> tuple:
+    """
+    Reach a goal with a unicycle, or with a point mass if linear, with bounded inputs and a wall at x = 1.5.
+    """
+
+    opti = Opti()
+    x = opti.variable(3, N + 1)
+    u = opti.variable(2, N)
+    state0 = opti.parameter(3)
+    goal = opti.parameter(3)
+
+    opti.subject_to(x[:, 0] == state0)
+    for k in range(N):
+        if linear:
+            velocity = vertcat(u[0, k], u[1, k], 0)
+        else:
+            velocity = vertcat(u[0, k] * cos(x[2, k]), u[0, k] * sin(x[2, k]), u[1, k])
+        opti.subject_to(x[:, k + 1] == x[:, k] + DT * velocity)
+    opti.subject_to(opti.bounded(-1, u, 1))
+    opti.subject_to(x[0, :] <= 1.5)
+    opti.minimize(sumsqr(x - goal) + 0.1 * sumsqr(u))
+    opti.solver('ipopt', dict(print_time=False), dict(print_level=0, sb='yes', tol=1e-10))
+
+    return opti, x, u, state0, goal
+
+
+def test_step_from_a_converged_solution():
+    opti, x, u, state0, goal = unicycle()
+    opti.set_value(state0, [0., 0., 0.3])
+    opti.set_value(goal, [2., 1., 0.])
+    solution = opti.solve()
+    assert np.max(solution.value(x)[0]) == pytest.approx(1.5, abs=1e-6), "The wall should be active."
+
+    opti.set_initial(solution.value_variables())
+    opti.set_initial(opti.lam_g, solution.value(opti.lam_g))
+    rti = RTISolver(opti, [state0, goal])
+    rti.prepare()
+    step = rti.feedback()
+
+    assert step.stats()['success'] and not rti.prepared
+    np.testing.assert_allclose(step.value(x), solution.value(x), atol=TOLERANCE)
+    np.testing.assert_allclose(step.value(u), solution.value(u), atol=TOLERANCE)
+
+
+def test_step_of_a_linear_quadratic_problem():
+    opti, x, u, state0, goal = unicycle(linear=True)
+    opti.set_value(goal, [2., 1., 0.])
+    rti = RTISolver(opti, [state0, goal])
+    opti.set_value(state0, [0., 0., 0.])
+    rti.prepare() # at the zero initial guess, before the state is known
+
+    opti.set_value(state0, [0.5, -0.5, 0.])
+    step = rti.feedback()
+    solution = opti.solve()
+
+    np.testing.assert_allclose(step.value(x), solution.value(x), atol=TOLERANCE)
+    np.testing.assert_allclose(step.value(u), solution.value(u), atol=TOLERANCE)
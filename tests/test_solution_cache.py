@@ -0,0 +1,76 @@
+"""
+    LRU eviction and lookup of the SolutionCache of the MPC controllers.
+"""
+
+import numpy as np
+
+from solution_cache import SolutionCache, active_set
+
+GOAL = np.array([1., 2.])
+
+
+def solution(state0: np.ndarray, value: float) -> tuple:
+    """
+    States starting at state0, inputs and multipliers filled with a value identifying the solution.
+    """
+
+    x = np.reshape(state0, (-1, 1)) + value * np.ones((2, 4))
+    x[:, 0] = state0
+    return x, value * np.ones((2, 3)), value * np.ones(5)
+
+
+def store(cache: SolutionCache, offset: list, value: float, active: bytes = b'\x00'):
+    state0 = GOAL + np.asarray(offset, dtype=float)
+    cache.store(state0, GOAL, *solution(state0, value), active)
+
+
+def test_active_set():
+    lam_g = np.array([0., 1., -2e-3, 1e-4, 5.])
+    inequality = np.array([True, True, True, True, False])
+    assert active_set(lam_g, inequality) == np.packbits([False, True, True, False]).tobytes()
+
+
+def test_lookup_moves_the_solution_to_the_initial_state():
+    cache = SolutionCache()
+    store(cache, [0.5, 0.], 1.)
+    state0 = GOAL + np.array([0.52, 0.01]) # same quantized offset
+
+    x, u, lam_g = cache.lookup(state0, GOAL, b'\x00')
+    np.testing.assert_allclose(x[:, 0], state0)
+    np.testing.assert_allclose(x - x[:, :1], solution(np.zeros(2), 1.)[0])
+    np.testing.assert_allclose(u, 1.)
+    assert cache.summary() == {'size': 1, 'hits': 1, 'misses': 0}
+
+
+def test_lookup_prefers_the_same_active_set():
+    cache = SolutionCache(radius=1.)
+    store(cache, [0.3, 0.], 1., b'\x01')
+    store(cache, [0.6, 0.], 2., b'\x02')
+
+    assert cache.lookup(GOAL + [0.4, 0.], GOAL, b'\x02')[1][0, 0] == 2. # farther, but with the same active set
+    assert cache.lookup(GOAL + [0.4, 0.], GOAL, b'\x03')[1][0, 0] == 1. # no match, the nearest one
+    assert cache.lookup(GOAL + [0.4, 0.], GOAL)[1][0, 0] == 1.
+    assert cache.lookup(GOAL + [3., 0.], GOAL, b'\x01') is None # beyond the radius
+    assert cache.summary() == {'size': 2, 'hits': 3, 'misses': 1}
+
+
+def test_least_recently_used_is_evicted():
+    cache = SolutionCache(capacity=2)
+    store(cache, [0., 0.], 1.)
+    store(cache, [1., 0.], 2.)
+    cache.lookup(GOAL, GOAL, b'\x00') # the first solution becomes the most recently used
+    store(cache, [2., 0.], 3.)
+
+    assert len(cache) == 2
+    assert cache.lookup(GOAL + [1., 0.], GOAL, b'\x00') is None, "The least recently used solution was kept."
+    assert cache.lookup(GOAL, GOAL, b'\x00')[1][0, 0] == 1.
+    assert cache.lookup(GOAL + [2., 0.], GOAL, b'\x00')[1][0, 0] == 3.
+
+
+def test_store_replaces_the_same_key():
+    cache = SolutionCache()
+    store(cache, [0.5, 0.], 1.)
+    store(cache, [0.51, 0.], 2.)
+
+    assert len(cache) == 1
+    assert cache.lookup(GOAL + [0.5, 0.], GOAL, b'\x00')[1][0, 0] == 2.
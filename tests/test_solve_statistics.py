@@ -0,0 +1,68 @@
+"""
+    Ring buffer and percentiles of the SolveStatistics of the MPC controllers.
+"""
+
+import json
+import numpy as np
+import pytest
+
+from solve_statistics import SolveStatistics
+
+IPOPT_STATS = {'iter_count': 12, 'success': True, 'return_status': 'Solve_Succeeded',
+               'iterations': {'inf_pr': [1., 1e-7], 'obj': [3., 2.5]}}
+
+
+def test_percentiles():
+    statistics = SolveStatistics()
+    wall_times = np.random.default_rng(0).uniform(0.01, 0.1, 200)
+    for wall_time in wall_times:
+        statistics.record(IPOPT_STATS, wall_time, warm=True)
+
+    percentiles = statistics.percentiles()
+    assert list(percentiles) == ['p50', 'p90', 'p99']
+    for q in (50, 90, 99):
+        assert percentiles[f'p{q}'] == pytest.approx(np.percentile(wall_times, q))
+    assert statistics.percentiles('iterations', (50,)) == {'p50': 12.}
+
+
+def test_percentiles_ignore_missing_values():
+    statistics = SolveStatistics()
+    assert statistics.percentiles() == {'p50': None, 'p90': None, 'p99': None}
+
+    statistics.record({'success': True}, 0.2, warm=False) # no iterations reported, e.g. by a QP solver
+    statistics.record(IPOPT_STATS, 0.1, warm=True)
+    assert statistics.percentiles('iterations') == {'p50': 12., 'p90': 12., 'p99': 12.}
+    assert statistics.percentiles('violation', (50,)) == {'p50': 1e-7}
+    with pytest.raises(AssertionError):
+        statistics.percentiles('status')
+
+
+def test_ring_buffer_keeps_the_last_solves():
+    statistics = SolveStatistics(capacity=3)
+    for i in range(5):
+        statistics.record(dict(IPOPT_STATS, iter_count=i), float(i), warm=i > 0)
+
+    records = statistics.records()
+    assert len(statistics) == 3 and statistics.n_solves == 5
+    np.testing.assert_array_equal(records['wall_time'], [2., 3., 4.])
+    np.testing.assert_array_equal(records['iterations'], [2., 3., 4.])
+    assert statistics.percentiles(percentiles=(0, 100)) == {'p0': 2., 'p100': 4.}
+
+
+def test_summary_and_failures(tmp_path):
+    statistics = SolveStatistics()
+    statistics.record(IPOPT_STATS, 0.1, warm=False)
+    statistics.record(IPOPT_STATS, 0.05, warm=True)
+    statistics.record_failure(RuntimeError("Error in Opti::solve: return_status is 'Maximum_Iterations_Exceeded'"),
+                              0.3, warm=True)
+    statistics.record_failure(ValueError("no status"), 0.01, warm=False)
+
+    summary = statistics.summary()
+    assert summary['solves'] == 4 and summary['failures'] == 2 and summary['warm'] == 2
+    assert summary['status'] == {'Maximum_Iterations_Exceeded': 1, 'Solve_Succeeded': 2, 'ValueError': 1}
+    assert summary['iterations']['cold'] == {'p50': 12., 'p90': 12., 'p99': 12.}
+
+    statistics.to_json(tmp_path / 'statistics.json')
+    with open(tmp_path / 'statistics.json') as file:
+        written = json.load(file)
+    assert written['solves']['iterations'] == [12., 12., None, None]
@@ -0,0 +1,41 @@
+"""
+    Closed-loop regression of the warm start of the arm MPC: the actions of the controller, with the loose tolerances it
+    uses online, must stay close to the ones of the same problem solved to convergence, on the first cold solve as well
+    as on the warm solves that follow.
+"""
+
+import numpy as np
+import pytest
+
+model = pytest.importorskip('model') # requires gym_envs_urdf
+from arm_MPC import ArmMPController
+
+ROBOT_DIM = np.array([0.3, 0.2]) # height and radius of the base, as in nav_run.py
+GOAL = np.array([1., .5, 0., .3, -.5, .4, 0.])
+A = np.vstack((np.eye(3), -np.eye(3)))[:5] # box of half side 3 around the origin, open at the bottom
+B = 3 * np.ones(5)
+N_STEPS = 10
+COLD_TOLERANCE = 1e-2 # largest difference from the converged action on the first solve
+WARM_TOLERANCE = 1e-1 # largest difference from the converged action on the warm solves
+
+
+def converged_controller() -> ArmMPController:
+    controller = ArmMPController(model.Model(dim=ROBOT_DIM), warm_start=False)
+    controller.opti.solver('ipopt', dict(print_time=False), dict(print_level=0, tol=1e-10))
+
+    return controller
+
+
+def test_arm_warm_start_closed_loop():
+    controller = ArmMPController(model.Model(dim=ROBOT_DIM), warm_start=True)
+    reference = converged_controller()
+    state = np.zeros(7)
+    errors = []
+    for _ in range(N_STEPS):
+        action = controller.solve_MPC(state, GOAL, A, B)
+        errors.append(np.max(np.abs(action - reference.solve_MPC(state, GOAL, A, B))))
+        state = state + controller.dt * action
+
+    assert errors[0] < COLD_TOLERANCE, f"Cold solve {errors[0]} away from the converged action."
+    assert max(errors) < WARM_TOLERANCE, f"Warm solves up to {max(errors)} away from the converged actions."
+    assert controller.warm_start.summary()['warm']['solves'] == N_STEPS - 1
@@ -0,0 +1,163 @@
+"""
+    Warm start of the MPC controllers. After every solve the optimal trajectories are shifted by one step and, together
+    with the multipliers of the constraints, used as the initial guess of the next solve. IPOPT is told to keep the
+    guess only on the warm solves: on a cold solve, which starts from zero, these options make it stop at a point far
+    from the optimum with the loose tolerances of the controllers.
+"""
+
+from casadi import *
+import numpy as np
+
+# IPOPT options that make it start from the given primal and dual guess instead of pushing it inside the bounds, only
+# used on warm solves
+WARM_START_OPTIONS = {"warm_start_init_point": "yes",
+                      "warm_start_bound_push": 1e-6,
+                      "warm_start_slack_bound_push": 1e-6,
+                      "warm_start_mult_bound_push": 1e-6,
+                      "mu_init": 1e-3}
+
+
+class WarmStart:
+    """
+    Initial guess of an Opti problem built from the previous solution: the states and the inputs are shifted by one step
+    and the last column is repeated, the other variables and the multipliers lam_g are reused as they are. The number of
+    iterations of every solve is recorded, split between cold and warm starts, to measure the gain. If the problem is
+    solved by IPOPT, its options are switched to WARM_START_OPTIONS when a guess is set and back when it is not.
+    """
+
+    def __init__(self, opti: Opti, x: MX, u: MX, enabled: bool = True, ipopt_options: tuple = None) -> None:
+        """
+        Args:
+            opti (Opti): optimization problem
+            x (MX): state variables, one column per step, or their expression in the condensed formulation
+            u (MX): input variables, one column per step
+            enabled (bool, optional): if False the guess is never set, the iterations are still recorded.
+                Defaults to True.
+            ipopt_options (tuple, optional): options (p_opts, s_opts) of the cold IPOPT solver of the problem, which is
+                set here. Defaults to None, in which case the solver of the problem is left as it is.
+        """
+
+        self.opti = opti
+        self.x = x
+        self.u = u
+        self.enabled = enabled
+        self.iterations = {'cold': [], 'warm': []} # iterations of every solve
+        self.lam_g_symbol = None # multipliers of the constraints, read once all the constraints are added
+        self.ipopt_options = ipopt_options
+        self.warm_options = None # whether the solver of the problem has the warm start options
+        self.configure(False)
+        self.reset()
+
+        pass
+
+    def reset(self):
+        """
+        Forget the previous solution, e.g. when the goal changes abruptly, so that the next solve is a cold start.
+        """
+
+        self.variables = None
+        self.prev_solution_x = None
+        self.prev_solution_u = None
+        self.lam_g = None
+
+        pass
+
+    def configure(self, warm: bool):
+        """
+        Set the IPOPT solver of the problem with or without the warm start options, if it is not already set so.
+        Changing the options rebuilds the solver at the next solve, which happens only when the controller switches
+        between cold and warm solves.
+        """
+
+        if self.ipopt_options is None or self.warm_options == warm:
+            return
+        p_opts, s_opts = self.ipopt_options
+        self.opti.solver('ipopt', p_opts, dict(s_opts, **WARM_START_OPTIONS) if warm else s_opts)
+        self.warm_options = warm
+
+        pass
+
+    @property
+    def available(self) -> bool:
+        return self.enabled and self.variables is not None
+
+    def apply(self) -> bool:
+        """
+        Set the initial guess of the problem from the previous solution.
+        Returns:
+            bool: whether a guess was set
+        """
+
+        self.configure(self.available)
+        if not self.available:
+            return False
+        self.opti.set_initial(self.variables)
+        if self.x.is_symbolic(): # the states are not variables in the condensed formulation
+            self.opti.set_initial(self.x, self.shift(self.prev_solution_x))
+        self.opti.set_initial(self.u, self.shift(self.prev_solution_u))
+        self.opti.set_initial(self.lam_g_symbol, self.lam_g)
+
+        return True
+
+    def load(self, x: np.ndarray, u: np.ndarray, lam_g: np.ndarray):
+        """
+        Set the initial guess of the problem from another solution, e.g. one of a SolutionCache, instead of the
+        previous one. The other variables keep their guess.
+        """
+
+        self.configure(True)
+        if self.x.is_symbolic():
+            self.opti.set_initial(self.x, x)
+        self.opti.set_initial(self.u, u)
+        if self.lam_g_symbol is not None:
+            self.opti.set_initial(self.lam_g_symbol, lam_g)
+
+        pass
+
+    def update(self, solution: OptiSol, warm: bool):
+        """
+        Store a solution for the next warm start and record the number of iterations it took.
+        Args:
+            solution (OptiSol): solution returned by opti.solve()
+            warm (bool): whether the solve was warm started
+        """
+
+        if self.lam_g_symbol is None:
+            self.lam_g_symbol = self.opti.lam_g
+        iterations = solution.stats().get('iter_count', -1)
+        if iterations >= 0: # not reported by every solver
+            self.iterations['warm' if warm else 'cold'].append(iterations)
+        self.variables = solution.value_variables()
+        self.prev_solution_x = np.reshape(solution.value(self.x), self.x.shape)
+        self.prev_solution_u = np.reshape(solution.value(self.u), self.u.shape)
+        self.lam_g = solution.value(self.lam_g_symbol)
+
+        pass
+
+    def advance(self):
+        """
+        Shift the stored solution by one step without a new solve, e.g. after a failed solve, so that it stays aligned
+        with the time of the next one.
+        """
+
+        if self.prev_solution_x is not None:
+            self.prev_solution_x = self.shift(self.prev_solution_x)
+            self.prev_solution_u = self.shift(self.prev_solution_u)
+
+        pass
+
+    @staticmethod
+    def shift(trajectory: np.ndarray) -> np.ndarray:
+        """
+        Drop the first column of a trajectory and repeat the last one.
+        """
+
+        return np.hstack((trajectory[:, 1:], trajectory[:, -1:]))
+
+    def summary(self) -> dict:
+        """
+        Return the number of cold and warm solves and their mean number of iterations.
+        """
+
+        return {start: {'solves': len(iterations), 'mean_iterations': float(np.mean(iterations)) if iterations else None}
+                for start, iterations in self.iterations.items()}